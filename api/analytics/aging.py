@@ -3,6 +3,7 @@ from django.utils import timezone
 from api.models import Invoice, InvoiceStatus
 from decimal import Decimal
 from django.core.cache import cache
+from api import metrics
 
 
 class AgingAnalytics:
@@ -16,9 +17,11 @@ class AgingAnalytics:
         cached_data = cache.get(cache_key)
 
         if cached_data is not None:
-            print("analytics aging cache is found")
+            metrics.cache_hit("aging_buckets")
             return cached_data
 
+        timer = metrics.cache_miss("aging_buckets")
+
         today = timezone.now().date()
 
         unpaid = Invoice.objects.filter(
@@ -44,6 +47,8 @@ class AgingAnalytics:
                 else:
                     buckets["60_plus_days"] += inv.total_ttc
 
+        timer.stop()
+
         cache.set(cache_key, buckets, timeout=60 * 5)
 
         return buckets
@@ -55,10 +60,10 @@ class AgingAnalytics:
         cached_data = cache.get(cache_key)
 
         if cached_data is not None:
-            print("analytics dso cache is found")
+            metrics.cache_hit("dso")
             return cached_data
 
-        print("analytics dso cache is not found")
+        timer = metrics.cache_miss("dso")
 
         ninety_days_ago = timezone.now() - timezone.timedelta(days=90)
 
@@ -74,6 +79,8 @@ class AgingAnalytics:
 
         dso = (total_receivables / total_sales) * 90
 
+        timer.stop()
+
         cache.set(cache_key, {"dso": round(dso, 1)}, timeout=60 * 5)
 
         return round(dso, 1)
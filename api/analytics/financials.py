@@ -4,6 +4,7 @@ from django.utils import timezone
 from decimal import Decimal
 from api.models import Invoice, Expense, Payment, InvoiceStatus
 from django.core.cache import cache
+from api import metrics
 import json
 
 
@@ -16,10 +17,10 @@ class FinancialAnalytics:
         cached_data = cache.get(cache_key)
 
         if cached_data is not None:
-            print("kpi analytics cache is found")
+            metrics.cache_hit("kpi")
             return cached_data
 
-        print("kpi summary analytics is not found")
+        timer = metrics.cache_miss("kpi")
 
         revenue_data = Invoice.objects.filter(
             created_by__company=self.company,
@@ -44,6 +45,8 @@ class FinancialAnalytics:
             "invoice_count": revenue_data["count"],
         }
 
+        timer.stop()
+
         cache.set(cache_key, results, timeout=60 * 10)
         return results
 
@@ -54,10 +57,10 @@ class FinancialAnalytics:
         cached_data = cache.get(cache_key)
 
         if cached_data is not None:
-            print("analytics revenue growth data is found")
+            metrics.cache_hit("revenue_growth")
             return cached_data
 
-        print("analytics revenue growth is not found")
+        timer = metrics.cache_miss("revenue_growth")
 
         qs = (
             Invoice.objects.filter(
@@ -72,6 +75,8 @@ class FinancialAnalytics:
 
         results = [{"month": row["month"], "revenue": row["revenue"]} for row in qs]
 
+        timer.stop()
+
         cache.set(cache_key, results, timeout=60 * 5)
 
         return results
@@ -83,11 +88,10 @@ class FinancialAnalytics:
         cached_data = cache.get(cache_key)
 
         if cached_data is not None:
-            print("expense breakdown is found")
-
+            metrics.cache_hit("expense_breakdown")
             return cached_data
 
-        print("expense breakdown is not found")
+        timer = metrics.cache_miss("expense_breakdown")
 
         qs = (
             Expense.objects.filter(chantier__department__company=self.company)
@@ -104,6 +108,8 @@ class FinancialAnalytics:
             for row in qs
         ]
 
+        timer.stop()
+
         cache.set(cache_key, results, timeout=60 * 5)
 
         return results
@@ -115,10 +121,10 @@ class FinancialAnalytics:
         cached_data = cache.get(cache_key)
 
         if cached_data is not None:
-            print("chantier profitability cache found")
+            metrics.cache_hit("chantier_profitability")
             return cached_data
 
-        print("chantier profitability cache not found")
+        timer = metrics.cache_miss("chantier_profitability")
 
         qs = (
             self.company.departments.all()
@@ -142,6 +148,8 @@ class FinancialAnalytics:
             for row in qs
         ]
 
+        timer.stop()
+
         cache.set(cache_key, results, timeout=60 * 5)
 
         return results
@@ -2,6 +2,7 @@ from django.db.models import Sum, F, Count, Q
 from api.models import Attendance, Chantier, Employee
 from decimal import Decimal
 from django.core.cache import cache
+from api import metrics
 
 
 class LaborAnalytics:
@@ -15,10 +16,10 @@ class LaborAnalytics:
         cached_data = cache.get(cache_key)
 
         if cached_data is not None:
-            print("analytics labor intensity cache is found")
+            metrics.cache_hit("labor_intensity")
             return cached_data
 
-        print("analytics labor intensity cache is not found")
+        timer = metrics.cache_miss("labor_intensity")
 
         qs = (
             Attendance.objects.filter(chantier__department__company=self.company)
@@ -39,6 +40,8 @@ class LaborAnalytics:
             for row in qs
         ]
 
+        timer.stop()
+
         cache.set(cache_key, results, timeout=60 * 5)
 
         return results
@@ -49,10 +52,10 @@ class LaborAnalytics:
         cached_data = cache.get(cache_key)
 
         if cached_data is not None:
-            print("analytics project efficiency cache is found")
+            metrics.cache_hit("project_efficiency")
             return cached_data
 
-        print("analytics project efficiency cache is not found")
+        timer = metrics.cache_miss("project_efficiency")
 
         qs = Chantier.objects.filter(department__company=self.company).annotate(
             total_revenue=Sum("invoices__total_ttc"),
@@ -77,5 +80,7 @@ class LaborAnalytics:
 
         results.sort(key=lambda x: x["revenue_per_hour"], reverse=True)
 
+        timer.stop()
+
         cache.set(cache_key, results, timeout=60 * 5)
         return results
@@ -2,6 +2,7 @@ from django.db.models import Sum
 from api.models import Invoice, Expense, InvoiceStatus
 from decimal import Decimal
 from django.core.cache import cache
+from api import metrics
 
 
 class TaxAnalytics:
@@ -15,10 +16,10 @@ class TaxAnalytics:
         cached_data = cache.get(cache_key)
 
         if cached_data is not None:
-            print("analytics tva forecast cache is found")
+            metrics.cache_hit("tva_forecast")
             return cached_data
 
-        print("analytics tva forecast cache is not found")
+        timer = metrics.cache_miss("tva_forecast")
 
         collected_tva = Invoice.objects.filter(
             created_by__company=self.company, status=InvoiceStatus.PAID
@@ -36,6 +37,8 @@ class TaxAnalytics:
             "net_tva_payable": max(0, collected_tva - estimated_recoverable),
         }
 
+        timer.stop()
+
         cache.set(cache_key, results, timeout=60 * 5)
 
         return results
@@ -0,0 +1,99 @@
+import calendar
+from datetime import date, timedelta
+
+from django.db.models import Sum, Count, Q
+from django.core.cache import cache
+
+from api.models import Attendance
+from api import metrics
+
+
+def timesheet_cache_key(chantier_id, year, month):
+    return f"analytics:timesheet:{chantier_id}:{year}-{month:02d}"
+
+
+class AttendanceTimesheet:
+    """
+    Employee x day hours matrix for one chantier and month, built from a single
+    grouped query over Attendance.
+    """
+
+    def __init__(self, chantier, year, month):
+        self.chantier = chantier
+        self.year = year
+        self.month = month
+
+    def get_matrix(self):
+
+        cache_key = timesheet_cache_key(self.chantier.id, self.year, self.month)
+
+        cached_data = cache.get(cache_key)
+
+        if cached_data is not None:
+            metrics.cache_hit("timesheet")
+            return cached_data
+
+        timer = metrics.cache_miss("timesheet")
+
+        first_day = date(self.year, self.month, 1)
+        days_in_month = calendar.monthrange(self.year, self.month)[1]
+        dates = [first_day + timedelta(days=offset) for offset in range(days_in_month)]
+
+        rows = (
+            Attendance.objects.filter(
+                chantier=self.chantier,
+                date__gte=first_day,
+                date__lte=dates[-1],
+            )
+            .values(
+                "employee_id",
+                "employee__user__first_name",
+                "employee__user__last_name",
+                "date",
+            )
+            .annotate(
+                hours=Sum("hours_worked"),
+                presences=Count("id", filter=Q(present=True)),
+            )
+            .order_by("employee__user__last_name", "employee_id", "date")
+        )
+
+        employees = []
+        hours = []
+        presence = []
+        index_by_employee = {}
+
+        for row in rows:
+            position = index_by_employee.get(row["employee_id"])
+            if position is None:
+                position = index_by_employee[row["employee_id"]] = len(employees)
+                employees.append(
+                    {
+                        "id": row["employee_id"],
+                        "full_name": f"{row['employee__user__first_name']} {row['employee__user__last_name']}",
+                    }
+                )
+                hours.append([0.0] * days_in_month)
+                presence.append(0)
+
+            day_index = row["date"].day - 1
+            hours[position][day_index] = float(row["hours"] or 0)
+            if row["presences"]:
+                presence[position] |= 1 << day_index
+
+        results = {
+            "chantier": self.chantier.id,
+            "month": f"{self.year}-{self.month:02d}",
+            "dates": [day.isoformat() for day in dates],
+            "employees": employees,
+            "hours": hours,
+            "presence": presence,
+            "total_hours": [round(sum(row), 2) for row in hours],
+            "days_present": [bin(bitmap).count("1") for bitmap in presence],
+        }
+
+        timer.stop()
+
+        cache.set(cache_key, results, timeout=60 * 10)
+
+        return results
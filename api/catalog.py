@@ -0,0 +1,115 @@
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from api.models import Client, Department, Item
+from api.search import TOKEN, normalise
+
+
+# Collections the forms load whole, keyed by model; each has a version per company
+CATALOGS = {Item: "items", Client: "clients", Department: "departments"}
+
+
+# Match tiers, best first: code prefix, name prefix, prefix of a later word in the name
+CODE, NAME, WORD = range(3)
+FIELDS = ("id", "code", "name", "unit", "unit_price", "tax_rate")
+
+
+def catalog_version_key(catalog, company_id):
+    return f"catalog_version_{catalog}_{company_id}"
+
+
+def _new_version():
+    # A random token rather than a counter, so an evicted key cannot come
+    # back equal to a version some process or browser still holds
+    return {"token": uuid.uuid4().hex, "modified": int(time.time())}
+
+
+def catalog_version(catalog, company_id):
+    """``{"token", "modified"}`` of a company's collection, replaced on every write."""
+    return cache.get_or_set(catalog_version_key(catalog, company_id), _new_version, timeout=None)
+
+
+def bump_catalog_version(catalog, company_id):
+    cache.set(catalog_version_key(catalog, company_id), _new_version(), timeout=None)
+
+
+def _terms(value):
+    """Accent-free lowercase words, so "CIM-01" and "cim 01" index alike."""
+    return TOKEN.findall(normalise(value))
+
+
+class _PrefixIndex:
+    """Sorted ``(term, item_id)`` pairs per tier; a prefix is a bisect plus a short scan."""
+
+    def __init__(self, rows):
+        self.items = {row[0]: dict(zip(FIELDS, row)) for row in rows}
+        tiers = ([], [], [])
+        for item_id, code, name, *_ in rows:
+            if code:
+                tiers[CODE].append((" ".join(_terms(code)), item_id))
+            words = _terms(name)
+            tiers[NAME].append((" ".join(words), item_id))
+            tiers[WORD].extend(
+                (" ".join(words[start:]), item_id) for start in range(1, len(words))
+            )
+        self.tiers = [sorted(tier) for tier in tiers]
+
+    def lookup(self, prefix, limit):
+        found = []
+        seen = set()
+        for tier in self.tiers:
+            position = bisect_left(tier, (prefix,))
+            while position < len(tier) and tier[position][0].startswith(prefix):
+                item_id = tier[position][1]
+                if item_id not in seen:
+                    seen.add(item_id)
+                    found.append(self.items[item_id])
+                    if len(found) == limit:
+                        return found
+                position += 1
+        return found
+
+
+class ItemCatalog:
+    """
+    Per-process prefix index of each company's items for typeahead. The
+    index is built with one query and reused until an item write bumps the
+    company's "items" version in the shared cache, so a warm lookup costs a
+    cache read and no database query; the least recently used companies are
+    dropped past ITEM_CATALOG_MAX_COMPANIES.
+    """
+
+    _indexes = OrderedDict()
+    _lock = threading.Lock()
+
+    @classmethod
+    def autocomplete(cls, company_id, query, limit=10):
+        prefix = " ".join(_terms(query))
+        if not prefix:
+            return []
+        return cls._index(company_id).lookup(prefix, limit)
+
+    @classmethod
+    def _index(cls, company_id):
+        version = catalog_version(CATALOGS[Item], company_id)["token"]
+        with cls._lock:
+            cached = cls._indexes.get(company_id)
+            if cached and cached[0] == version:
+                cls._indexes.move_to_end(company_id)
+                return cached[1]
+
+        index = _PrefixIndex(
+            list(Item.objects.filter(company_id=company_id).values_list(*FIELDS))
+        )
+        with cls._lock:
+            cls._indexes[company_id] = (version, index)
+            cls._indexes.move_to_end(company_id)
+            while len(cls._indexes) > settings.ITEM_CATALOG_MAX_COMPANIES:
+                cls._indexes.popitem(last=False)
+        return index
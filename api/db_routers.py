@@ -0,0 +1,64 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+_read_from_replica = ContextVar("read_from_replica", default=False)
+
+
+def replica_alias():
+    """The configured replica alias, or None when only the primary exists."""
+    alias = settings.REPLICA_DATABASE
+    return alias if alias in connections.databases else None
+
+
+@contextmanager
+def use_replica():
+    """Send reads inside the block to the replica (a no-op without one)."""
+    token = _read_from_replica.set(True)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Force reads inside the block back to the primary."""
+    token = _read_from_replica.set(False)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Writes always go to the primary. Reads go to the replica only inside
+    use_replica() (set per request by ReplicaRoutingMiddleware, or by a task),
+    and never while the primary is inside a transaction, so a block that
+    writes and then reads back sees its own rows.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _read_from_replica.get():
+            return None
+
+        alias = replica_alias()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == settings.REPLICA_DATABASE:
+            return False
+        return None
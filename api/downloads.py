@@ -0,0 +1,143 @@
+import mimetypes
+import os
+import re
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+SALT = "api.downloads"
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+
+def invoice_pdf_name(invoice_number):
+    """Path of an invoice PDF relative to MEDIA_ROOT."""
+    return f"invoices/facture_{invoice_number.replace('/', '_')}.pdf"
+
+
+def link_expiry(max_age=None):
+    """
+    Expiry of a link issued now and valid for at least ``max_age`` seconds,
+    rounded up to DOWNLOAD_LINK_ROUNDING so the same document gets the same
+    URL for a while and browsers can reuse it.
+    """
+    max_age = settings.DOWNLOAD_LINK_MAX_AGE if max_age is None else max_age
+    step = settings.DOWNLOAD_LINK_ROUNDING
+    return -(-(int(time.time()) + max_age) // step) * step
+
+
+def download_token(name, max_age=None):
+    """Signed token for MEDIA_ROOT/``name``, valid until link_expiry(max_age)."""
+    expires = link_expiry(max_age)
+    # Signer rather than signing.dumps(), which adds a timestamp and would
+    # make every token unique
+    return signing.Signer(salt=SALT).sign_object({"f": name, "e": expires})
+
+
+def download_url(name, request=None, max_age=None):
+    path = reverse("download", args=[download_token(name, max_age)])
+    if request is not None:
+        return request.build_absolute_uri(path)
+    return f"{settings.PUBLIC_BASE_URL}{path}"
+
+
+def read_download_token(token):
+    """``(name, expires)`` of a valid token, or None if forged, expired or unsafe."""
+    try:
+        data = signing.Signer(salt=SALT).unsign_object(token)
+    except signing.BadSignature:
+        return None
+
+    name = os.path.normpath(data.get("f", ""))
+    if data.get("e", 0) < time.time() or os.path.isabs(name) or name.startswith(".."):
+        return None
+    return name, data["e"]
+
+
+def _file_range(path, start, length):
+    with open(path, "rb") as handle:
+        handle.seek(start)
+        while length > 0:
+            chunk = handle.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _byte_range(request, etag, size):
+    """
+    ``(start, end)`` of a single satisfiable Range, "unsatisfiable", or None
+    to send the whole file (no Range, a stale If-Range or several ranges).
+    """
+    header = request.META.get("HTTP_RANGE", "").strip()
+    if_range = request.META.get("HTTP_IF_RANGE")
+    match = RANGE.match(header)
+    if not match or (if_range and if_range != etag) or match.groups() == ("", ""):
+        return None
+
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(size - int(last), 0), size - 1
+    if start >= size or start > end:
+        return "unsatisfiable"
+    return start, end
+
+
+def serve_media_file(request, name, cache_control, content_type=None):
+    """
+    MEDIA_ROOT/``name`` with ETag/Last-Modified from the file, answering
+    revalidations with 304 and single byte ranges with 206. With
+    SENDFILE_HEADER set the body is left to the web server (X-Accel-Redirect
+    for nginx, X-Sendfile for Apache), which also handles ranges. The content
+    type is guessed from the extension unless given. None when the file does
+    not exist.
+    """
+    content_type = content_type or mimetypes.guess_type(name)[0] or "application/octet-stream"
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    byte_range = None
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None and settings.SENDFILE_HEADER:
+        response = HttpResponse(content_type=content_type)
+        response[settings.SENDFILE_HEADER] = (
+            path
+            if settings.SENDFILE_HEADER == "X-Sendfile"
+            else f"{settings.SENDFILE_URL_PREFIX}{name}"
+        )
+    elif response is None:
+        byte_range = _byte_range(request, etag, stat.st_size)
+        if byte_range == "unsatisfiable":
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{stat.st_size}"
+        elif byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _file_range(path, start, end - start + 1), status=206, content_type=content_type
+            )
+            response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+            response["Content-Length"] = end - start + 1
+        else:
+            response = FileResponse(open(path, "rb"), content_type=content_type)
+
+    if response.status_code in (200, 206):
+        response["Content-Disposition"] = f'inline; filename="{os.path.basename(name)}"'
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Cache-Control"] = cache_control
+    response["Accept-Ranges"] = "bytes"
+    return response
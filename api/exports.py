@@ -0,0 +1,137 @@
+import csv
+
+from django.conf import settings
+from openpyxl import Workbook
+
+from api.db_routers import use_replica
+from api.models import Expense, Invoice, Payment
+
+
+# Leading characters that make Excel or LibreOffice evaluate a cell as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _safe_cell(value):
+    """Text a spreadsheet would run as a formula, quoted so it shows as typed."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+class Export:
+    """
+    A flat, company-scoped table read with values_list().iterator(), so rows
+    are streamed from the database instead of loaded as model instances.
+    """
+
+    def __init__(self, name, date_field, columns, queryset):
+        self.name = name
+        self.date_field = date_field
+        self.columns = columns
+        self._queryset = queryset
+
+    @property
+    def header(self):
+        return [label for label, _ in self.columns]
+
+    def filename(self, start=None, end=None, extension="csv"):
+        period = "_".join(str(day) for day in (start, end) if day)
+        return f"{self.name}{'_' + period if period else ''}.{extension}"
+
+    def rows(self, company, start=None, end=None):
+        queryset = self._queryset(company)
+        if start:
+            queryset = queryset.filter(**{f"{self.date_field}__gte": start})
+        if end:
+            queryset = queryset.filter(**{f"{self.date_field}__lte": end})
+
+        lookups = [lookup for _, lookup in self.columns]
+        # Routing is applied here because a streamed body is consumed after
+        # the request middleware has returned
+        with use_replica():
+            yield from queryset.order_by(self.date_field, "id").values_list(
+                *lookups
+            ).iterator(chunk_size=settings.DB_ITERATOR_CHUNK_SIZE)
+
+    def stream_csv(self, company, start=None, end=None):
+        writer = csv.writer(_Echo())
+        # BOM so Excel opens accented client names as UTF-8
+        yield "\ufeff" + writer.writerow(self.header)
+        for row in self.rows(company, start, end):
+            yield writer.writerow([_safe_cell(value) for value in row])
+
+    def write_xlsx(self, handle, company, start=None, end=None):
+        """Write an XLSX workbook to ``handle`` in write-only mode; return the row count."""
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet(self.name)
+        sheet.append(self.header)
+
+        count = 0
+        for row in self.rows(company, start, end):
+            sheet.append([_safe_cell(value) for value in row])
+            count += 1
+
+        workbook.save(handle)
+        return count
+
+
+EXPORTS = {
+    export.name: export
+    for export in [
+        Export(
+            "invoices",
+            "issued_date",
+            [
+                ("invoice_number", "invoice_number"),
+                ("issued_date", "issued_date"),
+                ("due_date", "due_date"),
+                ("client", "client__company_name"),
+                ("client_ice", "client__ice"),
+                ("chantier", "chantier__name"),
+                ("status", "status"),
+                ("subtotal", "subtotal"),
+                ("discount_amount", "discount_amount"),
+                ("total_ht", "total_ht"),
+                ("tax_amount", "tax_amount"),
+                ("total_ttc", "total_ttc"),
+                ("remaining_balance", "remaining_balance"),
+                ("payment_method", "payment_method"),
+                ("payment_date", "payment_date"),
+            ],
+            lambda company: Invoice.objects.filter(created_by__company=company),
+        ),
+        Export(
+            "payments",
+            "payment_date",
+            [
+                ("payment_date", "payment_date"),
+                ("invoice_number", "invoice__invoice_number"),
+                ("client", "invoice__client__company_name"),
+                ("amount", "amount"),
+                ("payment_method", "payment_method"),
+                ("reference", "reference"),
+            ],
+            lambda company: Payment.objects.filter(invoice__created_by__company=company),
+        ),
+        Export(
+            "expenses",
+            "expense_date",
+            [
+                ("expense_date", "expense_date"),
+                ("title", "title"),
+                ("category", "category"),
+                ("amount", "amount"),
+                ("chantier", "chantier__name"),
+                ("description", "description"),
+            ],
+            lambda company: Expense.objects.filter(chantier__department__company=company),
+        ),
+    ]
+}
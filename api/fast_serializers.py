@@ -0,0 +1,169 @@
+from rest_framework import serializers
+
+from api.serializers import InvoiceSerializer, QuoteSerializer, POSerializer
+
+
+# Fields whose to_representation() is the identity for values the database
+# already returns in the right Python type.
+_PASSTHROUGH_FIELDS = (
+    serializers.CharField,
+    serializers.EmailField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.ChoiceField,
+)
+
+
+class _RowProxy:
+    """Attribute access over a ``.values()`` row, for SerializerMethodFields."""
+
+    __slots__ = ("_row",)
+
+    def __init__(self, row):
+        self._row = row
+
+    def __getattr__(self, name):
+        try:
+            return self._row[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class _Plan:
+    """
+    A serializer's readable fields compiled once into ``.values()`` lookups
+    and per-field converters. Rendering a row is then a loop over plain
+    tuples instead of a full Field.get_attribute()/to_representation() pass.
+    """
+
+    def __init__(self, serializer, method_field_sources):
+        model = serializer.Meta.model
+        self.model = model
+        self.lookups = {"pk"}
+        self.fields = []
+        self.children = []
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+
+            if isinstance(field, serializers.ListSerializer):
+                relation = model._meta.get_field(field.source)
+                child = _Plan(field.child, {})
+                self.children.append((name, relation.field.attname, child))
+                self.fields.append((name, None, None, None))
+                continue
+
+            if isinstance(field, serializers.SerializerMethodField):
+                sources = method_field_sources.get(name, ())
+                self.lookups.update(sources)
+                method = getattr(serializer, field.method_name)
+                self.fields.append((name, None, None, method))
+                continue
+
+            if isinstance(field, (serializers.BaseSerializer, serializers.ManyRelatedField)):
+                raise TypeError(
+                    f"{type(serializer).__name__}.{name} cannot be rendered from values()."
+                )
+
+            guard = None
+            if isinstance(field, serializers.RelatedField):
+                lookup = model._meta.get_field(field.source).attname
+                converter = None
+            else:
+                lookup = "__".join(field.source_attrs)
+                converter = None if type(field) in _PASSTHROUGH_FIELDS else field.to_representation
+                if len(field.source_attrs) > 1:
+                    # DRF omits a dotted field when the relation is null.
+                    guard = model._meta.get_field(field.source_attrs[0]).attname
+                    self.lookups.add(guard)
+
+            self.lookups.add(lookup)
+            self.fields.append((name, lookup, guard, converter))
+
+    def render(self, rows, children_by_parent):
+        output = []
+        for row in rows:
+            data = {}
+            for name, lookup, guard, converter in self.fields:
+                if lookup is None:
+                    if converter is None:
+                        data[name] = children_by_parent[name].get(row["pk"], [])
+                    else:
+                        data[name] = converter(_RowProxy(row))
+                    continue
+
+                if guard is not None and row[guard] is None:
+                    continue
+
+                value = row[lookup]
+                if value is None or converter is None:
+                    data[name] = value
+                else:
+                    data[name] = converter(value)
+            output.append(data)
+        return output
+
+    def fetch(self, queryset):
+        rows = list(queryset.prefetch_related(None).values(*self.lookups))
+
+        children_by_parent = {}
+        if self.children:
+            parent_ids = [row["pk"] for row in rows]
+            for name, fk_attname, child in self.children:
+                child_rows = list(
+                    child.model._default_manager.filter(
+                        **{f"{fk_attname}__in": parent_ids}
+                    ).values(fk_attname, *child.lookups)
+                )
+                grouped = {}
+                for child_row, data in zip(child_rows, child.render(child_rows, {})):
+                    grouped.setdefault(child_row[fk_attname], []).append(data)
+                children_by_parent[name] = grouped
+
+        return self.render(rows, children_by_parent)
+
+
+class ValuesListSerializer:
+    """
+    Read-only list rendering that produces the exact output of
+    ``serializer_class(queryset, many=True).data`` from ``.values()`` rows:
+    one query for the parents plus one per nested ``many=True`` serializer.
+
+    ``method_field_sources`` lists the columns each SerializerMethodField reads
+    from ``obj``; the method itself is reused unchanged.
+    """
+
+    serializer_class = None
+    method_field_sources = {}
+
+    def __init__(self, queryset, context=None):
+        self.queryset = queryset
+        self.context = context or {}
+
+    @classmethod
+    def supports(cls, request):
+        """Expanded relations need model instances; only ?fields= is handled here."""
+        _, expanded = cls.serializer_class.get_field_selection(request)
+        return not expanded
+
+    @property
+    def data(self):
+        serializer = self.serializer_class(context=self.context)
+        plan = _Plan(serializer, self.method_field_sources)
+        return plan.fetch(self.queryset)
+
+
+class InvoiceValuesSerializer(ValuesListSerializer):
+    serializer_class = InvoiceSerializer
+    method_field_sources = {"download_url": ("invoice_number",)}
+
+
+class QuoteValuesSerializer(ValuesListSerializer):
+    serializer_class = QuoteSerializer
+    method_field_sources = {"download_url": ("quote_number",)}
+
+
+class POValuesSerializer(ValuesListSerializer):
+    serializer_class = POSerializer
+    method_field_sources = {"download_url": ("po_number",)}
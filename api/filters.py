@@ -0,0 +1,151 @@
+import django_filters
+from django.db.models import Q
+from django.utils import timezone
+
+from api.models import (
+    User,
+    Department,
+    Client,
+    Employee,
+    EmployeeEOSB,
+    EmployeeWorkingContract,
+    Chantier,
+    ChantierAssignment,
+    Attendance,
+    Item,
+    Expense,
+    Payment,
+)
+
+
+# Every filter below maps to a foreign key or a column indexed in
+# api.models, so filtered list queries stay index scans on large tenants.
+
+
+class DepartmentFilter(django_filters.FilterSet):
+    class Meta:
+        model = Department
+        fields = {"name": ["exact"]}
+
+
+class DepartmentAdminFilter(django_filters.FilterSet):
+    class Meta:
+        model = User
+        fields = {"role": ["exact"], "email": ["exact"]}
+
+
+class ClientFilter(django_filters.FilterSet):
+    class Meta:
+        model = Client
+        fields = {
+            "ice": ["exact"],
+            "company_name": ["exact"],
+        }
+
+
+class EmployeeFilter(django_filters.FilterSet):
+    class Meta:
+        model = Employee
+        fields = {
+            "cin": ["exact"],
+            "hire_date": ["exact", "gte", "lte"],
+        }
+
+
+class EmployeeEOSBFilter(django_filters.FilterSet):
+    class Meta:
+        model = EmployeeEOSB
+        fields = {
+            "employee": ["exact"],
+            "exit_date": ["exact", "gte", "lte"],
+        }
+
+
+class EmployeeWorkingContractFilter(django_filters.FilterSet):
+    class Meta:
+        model = EmployeeWorkingContract
+        fields = {
+            "employee": ["exact"],
+            "contract_end_date": ["exact", "gte", "lte", "isnull"],
+        }
+
+
+class ChantierFilter(django_filters.FilterSet):
+    status = django_filters.ChoiceFilter(
+        choices=[
+            ("NOT_STARTED", "NOT_STARTED"),
+            ("IN_PROGRESS", "IN_PROGRESS"),
+            ("COMPLETED", "COMPLETED"),
+        ],
+        method="filter_status",
+    )
+
+    class Meta:
+        model = Chantier
+        fields = {
+            "department": ["exact"],
+            "client": ["exact"],
+            "start_date": ["exact", "gte", "lte"],
+            "end_date": ["exact", "gte", "lte"],
+        }
+
+    def filter_status(self, queryset, name, value):
+        # Same rules as Chantier.status, expressed on the indexed dates
+        today = timezone.now().date()
+
+        if value == "NOT_STARTED":
+            return queryset.filter(start_date__gt=today)
+        if value == "COMPLETED":
+            return queryset.filter(end_date__lt=today)
+        return queryset.filter(start_date__lte=today).filter(
+            Q(end_date__isnull=True) | Q(end_date__gte=today)
+        )
+
+
+class ChantierAssignmentFilter(django_filters.FilterSet):
+    class Meta:
+        model = ChantierAssignment
+        fields = {
+            "chantier": ["exact"],
+            "employee": ["exact"],
+            "is_active": ["exact"],
+        }
+
+
+class AttendanceFilter(django_filters.FilterSet):
+    class Meta:
+        model = Attendance
+        fields = {
+            "date": ["exact", "gte", "lte"],
+            "chantier": ["exact"],
+            "employee": ["exact"],
+        }
+
+
+class ItemFilter(django_filters.FilterSet):
+    class Meta:
+        model = Item
+        fields = {
+            "code": ["exact"],
+            "name": ["exact"],
+        }
+
+
+class ExpenseFilter(django_filters.FilterSet):
+    class Meta:
+        model = Expense
+        fields = {
+            "chantier": ["exact"],
+            "category": ["exact"],
+            "expense_date": ["exact", "gte", "lte"],
+        }
+
+
+class PaymentFilter(django_filters.FilterSet):
+    class Meta:
+        model = Payment
+        fields = {
+            "invoice": ["exact"],
+            "payment_method": ["exact"],
+            "payment_date": ["exact", "gte", "lte"],
+        }
@@ -0,0 +1,98 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from api.models import IdempotencyKey
+
+
+HEADER = "Idempotency-Key"
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, cls=DjangoJSONEncoder, sort_keys=True)
+    raw = f"{request.method} {request.get_full_path()} {body}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _claim(request, scope, key, fingerprint):
+    """Return (record, created); an expired record is replaced by a fresh claim."""
+    expires_before = timezone.now() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+    lookup = {"user": request.user, "scope": scope, "key": key}
+
+    IdempotencyKey.objects.filter(created_at__lt=expires_before, **lookup).delete()
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(request_hash=fingerprint, **lookup), True
+    except IntegrityError:
+        return IdempotencyKey.objects.get(**lookup), False
+
+
+def idempotent(scope):
+    """
+    Honour an Idempotency-Key header on an APIView handler. The first
+    successful (2xx) response is stored and replayed for retries with the same
+    key and payload; a retry that arrives while the first attempt is still
+    running gets 409, and reusing a key for a different payload gets 422.
+    Failed attempts release the key so the client can retry.
+
+    Apply it outside @transaction.atomic so the claim is committed before the
+    handler runs and concurrent retries can see it.
+    """
+
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return handler(view, request, *args, **kwargs)
+
+            if len(key) > 255:
+                return Response(
+                    {"detail": f"{HEADER} must be at most 255 characters."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            fingerprint = request_fingerprint(request)
+            record, created = _claim(request, scope, key, fingerprint)
+
+            if not created:
+                if record.request_hash != fingerprint:
+                    return Response(
+                        {"detail": f"{HEADER} was already used with a different request."},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                if record.response_status is None:
+                    return Response(
+                        {"detail": f"A request with this {HEADER} is still being processed."},
+                        status=status.HTTP_409_CONFLICT,
+                    )
+                response = Response(record.response_body, status=record.response_status)
+                response["Idempotent-Replayed"] = "true"
+                return response
+
+            try:
+                response = handler(view, request, *args, **kwargs)
+            except Exception:
+                record.delete()
+                raise
+
+            if status.is_success(response.status_code):
+                record.response_status = response.status_code
+                record.response_body = response.data
+                record.save(update_fields=["response_status", "response_body"])
+            else:
+                record.delete()
+
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,382 @@
+import csv
+import datetime
+import io
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from openpyxl import load_workbook
+
+from api.models import (
+    Chantier,
+    Client,
+    Invoice,
+    InvoiceItem,
+    InvoiceStatus,
+    Item,
+    SearchKind,
+)
+from api.ledger import ClientLedger
+from api.search import SearchIndex
+from api.services import InvoiceCalculator
+from api.signals import clear_company_analytics
+
+
+# One row per invoice line; consecutive rows sharing invoice_ref form one invoice
+COLUMNS = [
+    "invoice_ref",
+    "invoice_number",
+    "issued_date",
+    "due_date",
+    "client",
+    "chantier",
+    "status",
+    "subject",
+    "project_description",
+    "item_code",
+    "item_name",
+    "unit",
+    "quantity",
+    "unit_price",
+    "tax_rate",
+]
+REQUIRED_COLUMNS = {"invoice_ref", "issued_date", "client", "quantity"}
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y")
+
+
+class ImportFileError(Exception):
+    """The file itself cannot be read (wrong format, missing columns)."""
+
+
+def _normalise_header(header):
+    return [str(name or "").strip().lower().replace(" ", "_") for name in header]
+
+
+def read_rows(file, file_format):
+    """
+    Yield ``(row_number, {column: value})`` from a CSV or XLSX file without
+    loading it all into memory. Row numbers match what a spreadsheet shows.
+    """
+    if file_format == "xlsx":
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            yield from _with_header(rows)
+        finally:
+            workbook.close()
+    elif file_format == "csv":
+        text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+        sample = text.read(4096)
+        text.seek(0)
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t") if sample else csv.excel
+        yield from _with_header(csv.reader(text, dialect))
+    else:
+        raise ImportFileError(f"Unsupported format: {file_format}")
+
+
+def _with_header(rows):
+    header = _normalise_header(next(rows, None) or [])
+    missing = REQUIRED_COLUMNS - set(header)
+    if missing:
+        raise ImportFileError(f"Missing columns: {', '.join(sorted(missing))}")
+
+    for row_number, values in enumerate(rows, start=2):
+        if not any(value not in (None, "") for value in values):
+            continue
+        yield row_number, dict(zip(header, values))
+
+
+class InvoiceImporter:
+    """
+    Turns parsed rows into invoices for one company. Clients, items and
+    chantiers are resolved from maps loaded once; valid invoices are buffered
+    and written with bulk_create every ``batch_size`` invoices, with their
+    numbers allocated as a block. Invalid invoices are skipped and reported
+    per row.
+    """
+
+    def __init__(self, user, batch_size=500, max_errors=1000):
+        self.user = user
+        self.company = user.company
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.progress = None
+        self._pending = []
+
+        self._load_lookups()
+
+    def _load_lookups(self):
+        clients = Client.objects.filter(company=self.company).only("id", "ice", "company_name")
+        self.clients = {}
+        for client in clients:
+            self.clients.setdefault(client.ice.strip(), client.id)
+            self.clients.setdefault(client.company_name.strip().lower(), client.id)
+
+        self.items = {
+            item.code.strip().lower(): item
+            for item in Item.objects.filter(company=self.company).exclude(code__isnull=True)
+        }
+        self.chantiers = {
+            name.strip().lower(): chantier_id
+            for chantier_id, name in Chantier.objects.filter(
+                department__company=self.company
+            ).values_list("id", "name")
+        }
+        self.statuses = {
+            value.lower(): value for value in InvoiceStatus.values
+        } | {label.lower(): value for value, label in InvoiceStatus.choices}
+
+    def run(self, rows, progress=None):
+        """Import every row; ``progress(report)`` is called after each batch."""
+        self.progress = progress
+        ref, group = None, []
+        for row_number, row in rows:
+            row_ref = str(row.get("invoice_ref") or "").strip()
+            if group and row_ref != ref:
+                self._add_invoice(ref, group)
+                group = []
+            ref = row_ref
+            group.append((row_number, row))
+
+        if group:
+            self._add_invoice(ref, group)
+        self._flush()
+
+        if self.created:
+            clear_company_analytics(self.company.id)
+
+        return self.report()
+
+    def report(self):
+        return {
+            "created": self.created,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+    def _add_invoice(self, ref, group):
+        first_row_number, header = group[0]
+        errors = []
+
+        if not ref:
+            errors.append("invoice_ref is required")
+
+        client_key = str(header.get("client") or "").strip()
+        client_id = self.clients.get(client_key) or self.clients.get(client_key.lower())
+        if client_id is None:
+            errors.append(f"Unknown client: {client_key or '(empty)'}")
+
+        chantier_id = None
+        chantier_name = str(header.get("chantier") or "").strip()
+        if chantier_name:
+            chantier_id = self.chantiers.get(chantier_name.lower())
+            if chantier_id is None:
+                errors.append(f"Unknown chantier: {chantier_name}")
+
+        status = InvoiceStatus.DRAFT
+        status_value = str(header.get("status") or "").strip()
+        if status_value:
+            status = self.statuses.get(status_value.lower())
+            if status is None:
+                errors.append(f"Unknown status: {status_value}")
+
+        issued_date = self._date(header.get("issued_date"), "issued_date", errors, required=True)
+        due_date = self._date(header.get("due_date"), "due_date", errors)
+
+        lines = []
+        for row_number, row in group:
+            line_errors = []
+            line = self._line(row, line_errors)
+            if line_errors:
+                errors.extend(f"row {row_number}: {message}" for message in line_errors)
+            else:
+                lines.append(line)
+
+        if errors:
+            self._error(first_row_number, ref, errors)
+            return
+
+        totals = InvoiceCalculator.get_line_totals(lines)
+        invoice = Invoice(
+            invoice_number=str(header.get("invoice_number") or "").strip(),
+            client_id=client_id,
+            chantier_id=chantier_id,
+            created_by=self.user,
+            status=status,
+            Subject=header.get("subject") or None,
+            project_description=header.get("project_description") or None,
+            issued_date=issued_date,
+            due_date=due_date,
+            subtotal=totals["subtotal"],
+            discount_percentage=totals["discount_percentage"],
+            discount_amount=totals["discount_amount"],
+            total_ht=totals["total_ht"],
+            tax_rate=totals["tax_rate"],
+            tax_amount=totals["tax_amount"],
+            total_ttc=totals["total_ttc"],
+            remaining_balance=(
+                Decimal("0") if status == InvoiceStatus.PAID else totals["total_ttc"]
+            ),
+            amount_in_words=InvoiceCalculator.get_amount_in_words(totals["total_ttc"]),
+        )
+        self._pending.append((first_row_number, ref, invoice, lines))
+
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+
+    def _line(self, row, errors):
+        item = None
+        code = str(row.get("item_code") or "").strip()
+        if code:
+            item = self.items.get(code.lower())
+            if item is None:
+                errors.append(f"Unknown item code: {code}")
+                return None
+
+        quantity = self._decimal(row.get("quantity"), "quantity", errors)
+        unit_price = self._decimal(
+            row.get("unit_price"), "unit_price", errors, default=item.unit_price if item else None
+        )
+        tax_rate = self._decimal(
+            row.get("tax_rate"), "tax_rate", errors, default=item.tax_rate if item else Decimal("0")
+        )
+        name = str(row.get("item_name") or "").strip() or (item.name if item else "")
+        unit = str(row.get("unit") or "").strip() or (item.unit if item else "")
+
+        if not name:
+            errors.append("item_name is required without a known item_code")
+        if not unit:
+            errors.append("unit is required without a known item_code")
+        if errors:
+            return None
+
+        line = InvoiceItem(
+            item=item,
+            item_code=item.code if item else None,
+            item_name=name,
+            item_description=item.description if item else None,
+            unit=unit,
+            quantity=quantity,
+            unit_price=unit_price,
+            tax_rate=tax_rate,
+        )
+        line.compute_amounts()
+        return line
+
+    def _date(self, value, field, errors, required=False):
+        if value in (None, ""):
+            if required:
+                errors.append(f"{field} is required")
+            return None
+        if isinstance(value, datetime.datetime):
+            return value.date()
+        if isinstance(value, datetime.date):
+            return value
+
+        for date_format in DATE_FORMATS:
+            try:
+                return datetime.datetime.strptime(str(value).strip(), date_format).date()
+            except ValueError:
+                continue
+        errors.append(f"{field} is not a date: {value}")
+        return None
+
+    def _decimal(self, value, field, errors, default=None):
+        if value in (None, ""):
+            if default is None:
+                errors.append(f"{field} is required")
+            return default
+        try:
+            return Decimal(str(value).strip().replace(" ", "").replace(",", "."))
+        except InvalidOperation:
+            errors.append(f"{field} is not a number: {value}")
+            return None
+
+    def _error(self, row_number, ref, messages):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row_number, "invoice_ref": ref, "errors": messages})
+
+    def _flush(self):
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, []
+
+        # Numbers given in the file must be unique within the batch...
+        seen = set()
+        batch = []
+        for row_number, ref, invoice, lines in pending:
+            number = invoice.invoice_number
+            if number and number in seen:
+                self._error(row_number, ref, [f"invoice_number already exists: {number}"])
+                continue
+            seen.add(number)
+            batch.append((row_number, ref, invoice, lines))
+
+        unnumbered = [invoice for _, _, invoice, _ in batch if not invoice.invoice_number]
+        for attempt in range(3):
+            # ...and against the database, checked again before a retry in
+            # case a concurrent create took one of them
+            batch = self._without_taken_numbers(batch)
+            try:
+                with transaction.atomic():
+                    self._insert([(invoice, lines) for _, _, invoice, lines in batch], unnumbered)
+                break
+            except IntegrityError:
+                # A concurrent create took an allocated or a file number; retry
+                # with a fresh block, reporting the rows whose number is gone
+                if attempt == 2:
+                    raise
+                for invoice in unnumbered:
+                    invoice.invoice_number = ""
+                for _, _, invoice, lines in batch:
+                    invoice.pk = None
+                    invoice._state.adding = True
+                    for line in lines:
+                        line.pk = None
+                        line._state.adding = True
+
+        self.created += len(batch)
+        if self.progress:
+            self.progress(self.report())
+
+    def _without_taken_numbers(self, batch):
+        """Report the rows whose file-given invoice_number exists; return the others."""
+        given = [invoice.invoice_number for _, _, invoice, _ in batch if invoice.invoice_number]
+        taken = set(
+            Invoice.objects.filter(invoice_number__in=given).values_list("invoice_number", flat=True)
+        )
+        kept = []
+        for row_number, ref, invoice, lines in batch:
+            if invoice.invoice_number in taken:
+                self._error(
+                    row_number, ref, [f"invoice_number already exists: {invoice.invoice_number}"]
+                )
+                continue
+            kept.append((row_number, ref, invoice, lines))
+        return kept
+
+    def _insert(self, batch, unnumbered):
+        numbers = Invoice.allocate_invoice_numbers(
+            [invoice.issued_date for invoice in unnumbered]
+        )
+        for invoice, number in zip(unnumbered, numbers):
+            invoice.invoice_number = number
+
+        invoices = Invoice.objects.bulk_create([invoice for invoice, _ in batch])
+
+        lines = []
+        for invoice, invoice_lines in zip(invoices, (lines for _, lines in batch)):
+            for line in invoice_lines:
+                line.invoice = invoice
+                lines.append(line)
+        InvoiceItem.objects.bulk_create(lines, batch_size=1000)
+        ClientLedger.post_invoices(invoices)
+        SearchIndex.reindex(
+            SearchKind.INVOICE, Invoice.objects.filter(id__in=[invoice.id for invoice in invoices])
+        )
@@ -0,0 +1,303 @@
+import datetime
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from api.models import Client, ClientLedgerEntry, Invoice, LedgerEntryKind, Payment
+
+
+ZERO = Decimal("0")
+CENT = Decimal("0.01")
+
+# Invoice fields the ledger entry is built from; saves touching none of them are skipped
+INVOICE_FIELDS = frozenset({"client", "client_id", "issued_date", "total_ttc", "invoice_number"})
+
+
+def _money(value):
+    return Decimal(value or 0).quantize(CENT)
+
+
+class ClientLedger:
+    """
+    Per-client account with a running balance: a debit for every invoice, a
+    credit for every payment and manual credits. Posting or changing an
+    amount reads the previous balance, writes the entry and shifts the
+    balance of later entries with a single UPDATE, so the cost does not grow
+    with the client's history; statements are range reads on
+    (client, entry_date, id). Every posting locks the client row first, so
+    concurrent postings for one client apply one after the other instead of
+    both reading the same previous balance.
+    """
+
+    @staticmethod
+    def post_invoice(invoice, created=False):
+        return ClientLedger._post(
+            {"invoice": invoice},
+            {
+                "kind": LedgerEntryKind.INVOICE,
+                "client_id": invoice.client_id,
+                "entry_date": invoice.issued_date,
+                "reference": invoice.invoice_number,
+                "debit": _money(invoice.total_ttc),
+                "credit": ZERO,
+            },
+            created,
+        )
+
+    @staticmethod
+    def post_payment(payment, created=False):
+        return ClientLedger._post(
+            {"payment": payment},
+            {
+                "kind": LedgerEntryKind.PAYMENT,
+                "client_id": payment.invoice.client_id,
+                "entry_date": payment.payment_date,
+                "reference": payment.reference or payment.invoice.invoice_number,
+                "debit": ZERO,
+                "credit": _money(payment.amount),
+            },
+            created,
+        )
+
+    @staticmethod
+    def post_credit(client, amount, entry_date, reference=None):
+        return ClientLedger._append(
+            {},
+            {
+                "kind": LedgerEntryKind.CREDIT,
+                "client_id": client.id,
+                "entry_date": entry_date,
+                "reference": reference,
+                "debit": ZERO,
+                "credit": _money(amount),
+            },
+        )
+
+    @staticmethod
+    def post_invoices(invoices):
+        """Entries for invoices written with bulk_create, which sends no signals."""
+        entries = ClientLedgerEntry.objects.bulk_create(
+            [ClientLedger._invoice_entry(invoice) for invoice in invoices],
+            batch_size=settings.LEDGER_BATCH_SIZE,
+        )
+        ClientLedger.rebalance(ClientLedger._earliest_dates(entries))
+
+    @staticmethod
+    def rebalance(from_dates):
+        """
+        Recompute running balances from ``{client_id: date}`` onwards: one
+        query for the opening balances, one for the entries after them and
+        one bulk update per chunk of clients.
+        """
+        client_ids = list(from_dates)
+        with transaction.atomic():
+            ClientLedger._lock(client_ids)
+            for start in range(0, len(client_ids), settings.LEDGER_BATCH_SIZE):
+                chunk = {
+                    client_id: from_dates[client_id]
+                    for client_id in client_ids[start : start + settings.LEDGER_BATCH_SIZE]
+                }
+                ClientLedger._rebalance_chunk(chunk)
+
+    @staticmethod
+    def rebuild(clients):
+        """Drop and repost every entry of ``clients`` from their invoices and payments."""
+        client_ids = list(clients.values_list("id", flat=True))
+        for start in range(0, len(client_ids), settings.LEDGER_BATCH_SIZE):
+            chunk = client_ids[start : start + settings.LEDGER_BATCH_SIZE]
+            ClientLedgerEntry.objects.filter(client_id__in=chunk).delete()
+
+            entries = [
+                ClientLedger._invoice_entry(invoice)
+                for invoice in Invoice.objects.filter(client_id__in=chunk).only(
+                    "id", "client_id", "issued_date", "invoice_number", "total_ttc"
+                )
+            ]
+            entries.extend(
+                ClientLedgerEntry(
+                    client_id=client_id,
+                    kind=LedgerEntryKind.PAYMENT,
+                    payment_id=payment_id,
+                    entry_date=payment_date,
+                    reference=reference or invoice_number,
+                    credit=amount,
+                )
+                for payment_id, client_id, payment_date, reference, invoice_number, amount in (
+                    Payment.objects.filter(invoice__client_id__in=chunk).values_list(
+                        "id",
+                        "invoice__client_id",
+                        "payment_date",
+                        "reference",
+                        "invoice__invoice_number",
+                        "amount",
+                    )
+                )
+            )
+            ClientLedgerEntry.objects.bulk_create(entries, batch_size=settings.LEDGER_BATCH_SIZE)
+            ClientLedger.rebalance({client_id: datetime.date.min for client_id in chunk})
+        return len(client_ids)
+
+    @staticmethod
+    def balance_before(client_id, day):
+        """Balance carried into ``day`` (zero before the first entry)."""
+        if day is None:
+            return ZERO
+        return ClientLedger._last_balance(
+            ClientLedgerEntry.objects.filter(client_id=client_id, entry_date__lt=day)
+        )
+
+    @staticmethod
+    def balance_at(client_id, day=None):
+        """Balance at the end of ``day``, or the current balance."""
+        entries = ClientLedgerEntry.objects.filter(client_id=client_id)
+        if day is not None:
+            entries = entries.filter(entry_date__lte=day)
+        return ClientLedger._last_balance(entries)
+
+    @staticmethod
+    def _last_balance(entries):
+        balance = (
+            entries.order_by("-entry_date", "-id").values_list("balance", flat=True).first()
+        )
+        return balance if balance is not None else ZERO
+
+    @staticmethod
+    def _invoice_entry(invoice):
+        return ClientLedgerEntry(
+            client_id=invoice.client_id,
+            kind=LedgerEntryKind.INVOICE,
+            invoice_id=invoice.id,
+            entry_date=invoice.issued_date,
+            reference=invoice.invoice_number,
+            debit=_money(invoice.total_ttc),
+        )
+
+    @staticmethod
+    def _earliest_dates(entries):
+        dates = {}
+        for entry in entries:
+            if entry.client_id not in dates or entry.entry_date < dates[entry.client_id]:
+                dates[entry.client_id] = entry.entry_date
+        return dates
+
+    @staticmethod
+    def _lock(client_ids):
+        """Lock the clients' rows until the transaction ends, in id order to avoid deadlocks."""
+        list(
+            Client.objects.select_for_update()
+            .filter(pk__in=client_ids)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+
+    @staticmethod
+    @transaction.atomic
+    def _post(lookup, values, created=False):
+        entry = None if created else ClientLedgerEntry.objects.filter(**lookup).first()
+        client_ids = {values["client_id"]}
+        if entry is not None:
+            client_ids.add(entry.client_id)
+        # Both clients in one call so they are locked in id order; the entry
+        # is then read again in case a concurrent posting changed it meanwhile
+        ClientLedger._lock(client_ids)
+        if entry is not None:
+            entry = ClientLedgerEntry.objects.filter(pk=entry.pk).first()
+        if entry is None:
+            return ClientLedger._insert(lookup, values)
+
+        changed = [field for field, value in values.items() if getattr(entry, field) != value]
+        if not changed:
+            return entry
+
+        if entry.client_id != values["client_id"] or entry.entry_date != values["entry_date"]:
+            # The entry moves: rebalance both where it was and where it lands
+            from_dates = {entry.client_id: entry.entry_date}
+            for field in changed:
+                setattr(entry, field, values[field])
+            entry.save(update_fields=changed)
+
+            from_dates[entry.client_id] = min(
+                from_dates.get(entry.client_id, entry.entry_date), entry.entry_date
+            )
+            ClientLedger.rebalance(from_dates)
+            return entry
+
+        delta = (values["debit"] - values["credit"]) - (entry.debit - entry.credit)
+        for field in changed:
+            setattr(entry, field, values[field])
+        entry.balance += delta
+        entry.save(update_fields=changed + (["balance"] if delta else []))
+        ClientLedger._shift(
+            entry.client_id,
+            Q(entry_date__gt=entry.entry_date) | Q(entry_date=entry.entry_date, id__gt=entry.id),
+            delta,
+        )
+        return entry
+
+    @staticmethod
+    @transaction.atomic
+    def _append(lookup, values):
+        ClientLedger._lock([values["client_id"]])
+        return ClientLedger._insert(lookup, values)
+
+    @staticmethod
+    def _insert(lookup, values):
+        """A new entry sorts last on its date, so only later dates need shifting."""
+        delta = values["debit"] - values["credit"]
+        entry = ClientLedgerEntry(**lookup, **values)
+        entry.balance = ClientLedger.balance_at(entry.client_id, entry.entry_date) + delta
+        entry.save()
+        ClientLedger._shift(entry.client_id, Q(entry_date__gt=entry.entry_date), delta)
+        return entry
+
+    @staticmethod
+    def _shift(client_id, after, delta):
+        if delta:
+            ClientLedgerEntry.objects.filter(after, client_id=client_id).update(
+                balance=F("balance") + delta
+            )
+
+    @staticmethod
+    def _rebalance_chunk(from_dates):
+        before = reduce(
+            or_,
+            (Q(client_id=client_id, entry_date__lt=day) for client_id, day in from_dates.items()),
+        )
+        after = reduce(
+            or_,
+            (Q(client_id=client_id, entry_date__gte=day) for client_id, day in from_dates.items()),
+        )
+
+        balances = dict(
+            ClientLedgerEntry.objects.filter(before)
+            .annotate(
+                position=Window(
+                    RowNumber(),
+                    partition_by=[F("client_id")],
+                    order_by=[F("entry_date").desc(), F("id").desc()],
+                )
+            )
+            .filter(position=1)
+            .values_list("client_id", "balance")
+        )
+
+        changed = []
+        for entry in (
+            ClientLedgerEntry.objects.filter(after)
+            .order_by("client_id", "entry_date", "id")
+            .only("id", "client_id", "debit", "credit", "balance")
+        ):
+            balance = balances.get(entry.client_id, ZERO) + entry.debit - entry.credit
+            balances[entry.client_id] = balance
+            if entry.balance != balance:
+                entry.balance = balance
+                changed.append(entry)
+
+        ClientLedgerEntry.objects.bulk_update(
+            changed, ["balance"], batch_size=settings.LEDGER_BATCH_SIZE
+        )
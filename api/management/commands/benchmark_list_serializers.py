@@ -0,0 +1,133 @@
+import datetime
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from api.fast_serializers import InvoiceValuesSerializer
+from api.models import CompanyProfile, Client, Invoice, InvoiceItem, User, UserRole
+from api.renderers import ORJSONRenderer
+from api.serializers import InvoiceSerializer
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare InvoiceSerializer against the values() fast path (and DRF's JSON "
+        "renderer against orjson) on synthetic invoices. Everything is created "
+        "inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--invoices", type=int, default=2000)
+        parser.add_argument("--lines", type=int, default=5)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._seed(options["invoices"], options["lines"])
+                self._run(options["repeat"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _seed(self, invoice_count, line_count):
+        company = CompanyProfile.objects.create(
+            name="Benchmark",
+            address="-",
+            phone="+212600000000",
+            email="benchmark@example.com",
+            ice="000000000000000",
+        )
+        user = User.objects.create_user(
+            email="benchmark-list-serializers@example.com",
+            password=None,
+            first_name="Bench",
+            last_name="Mark",
+            role=UserRole.COMPANY_ADMIN,
+            company=company,
+        )
+        client = Client.objects.create(
+            company=company,
+            company_name="Client benchmark",
+            contact_name="-",
+            ice="000000000000000",
+            phone="+212600000001",
+        )
+
+        invoices = Invoice.objects.bulk_create(
+            Invoice(
+                invoice_number=f"BENCH-{index:07d}",
+                client=client,
+                created_by=user,
+                issued_date=datetime.date(2026, 1, 1),
+                subtotal=Decimal("100.00"),
+                total_ttc=Decimal("120.00"),
+                amount_in_words="CENT VINGT DIRHAMS TTC",
+            )
+            for index in range(invoice_count)
+        )
+        InvoiceItem.objects.bulk_create(
+            (
+                InvoiceItem(
+                    invoice=invoice,
+                    item_name="Ciment",
+                    unit="sac",
+                    quantity=Decimal("2"),
+                    unit_price=Decimal("10.50"),
+                    subtotal=Decimal("21.00"),
+                    tax_rate=Decimal("20"),
+                )
+                for invoice in invoices
+                for _ in range(line_count)
+            ),
+            batch_size=1000,
+        )
+
+        self.queryset = Invoice.objects.filter(client=client).order_by("-created_at")
+        self.stdout.write(f"Seeded {invoice_count} invoices x {line_count} lines")
+
+    def _run(self, repeat):
+        request = APIRequestFactory().get("/api/invoices")
+        request.query_params = request.GET
+        context = {"request": request}
+
+        def model_serializer():
+            queryset = InvoiceSerializer.setup_eager_loading(self.queryset, request)
+            return InvoiceSerializer(queryset, many=True, context=context).data
+
+        def values_serializer():
+            return InvoiceValuesSerializer(self.queryset, context=context).data
+
+        slow = self._time(model_serializer, repeat)
+        fast = self._time(values_serializer, repeat)
+        self._report("serialize: InvoiceSerializer", slow)
+        self._report("serialize: InvoiceValuesSerializer", fast, baseline=slow)
+
+        data = values_serializer()
+        json_render = self._time(lambda: JSONRenderer().render(data), repeat)
+        orjson_render = self._time(lambda: ORJSONRenderer().render(data), repeat)
+        self._report("render: JSONRenderer", json_render)
+        self._report("render: ORJSONRenderer", orjson_render, baseline=json_render)
+
+    def _time(self, func, repeat):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - started)
+        return statistics.median(samples)
+
+    def _report(self, label, seconds, baseline=None):
+        line = f"{label:<40} {seconds * 1000:9.1f} ms"
+        if baseline:
+            line += f"  ({baseline / seconds:.1f}x faster)"
+        self.stdout.write(line)
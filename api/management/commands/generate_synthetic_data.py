@@ -0,0 +1,377 @@
+import datetime
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import (
+    User,
+    UserRole,
+    CompanyProfile,
+    Department,
+    Client,
+    Chantier,
+    ChantierAssignment,
+    Employee,
+    Attendance,
+    Item,
+    Invoice,
+    InvoiceItem,
+    InvoiceStatus,
+    Expense,
+    ExpenseCategory,
+    Payment,
+    PaymentMethod,
+)
+from api.ledger import ClientLedger
+from api.catalog import CATALOGS, bump_catalog_version
+from api.search import SearchIndex
+from api.signals import clear_company_analytics
+
+
+CENT = Decimal("0.01")
+RETENTION_RATE = Decimal("10.0")
+TAX_RATE = Decimal("20.0")
+
+MATERIALS = [
+    ("CIM", "Ciment CPJ45", "sac", "85.00"),
+    ("SAB", "Sable de rivière", "m3", "220.00"),
+    ("GRV", "Gravette 15/25", "m3", "260.00"),
+    ("FER", "Fer à béton HA12", "barre", "95.00"),
+    ("BRQ", "Brique 8 trous", "unité", "2.40"),
+    ("PLT", "Plâtre", "sac", "45.00"),
+    ("CRL", "Carrelage 60x60", "m2", "130.00"),
+    ("PNT", "Peinture façade", "pot", "480.00"),
+    ("TUB", "Tube PVC 110", "ml", "38.00"),
+    ("MOE", "Main d'oeuvre qualifiée", "jour", "350.00"),
+]
+CITIES = ["Casablanca", "Rabat", "Tanger", "Marrakech", "Agadir", "Fès", "Meknès", "Oujda"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic companies with clients, chantiers, employees, "
+        "attendance, invoices (with lines), payments, expenses, client ledgers and "
+        "search entries using bulk_create. "
+        "Every company admin logs in as admin@synthetic-<n>.test."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--companies", type=int, default=1)
+        parser.add_argument("--clients", type=int, default=50)
+        parser.add_argument("--chantiers", type=int, default=10)
+        parser.add_argument("--employees", type=int, default=100)
+        parser.add_argument("--attendance-days", type=int, default=30)
+        parser.add_argument("--invoices", type=int, default=1000)
+        parser.add_argument("--lines", type=int, default=5, help="Lines per invoice")
+        parser.add_argument(
+            "--paid-ratio",
+            type=float,
+            default=0.6,
+            help="Share of invoices with payments (a third of them partial)",
+        )
+        parser.add_argument("--expenses", type=int, default=500)
+        parser.add_argument("--password", default="synthetic-pass")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        # Hash once: PBKDF2 per user would dominate the run
+        self.password = make_password(options["password"])
+        self.today = timezone.now().date()
+
+        first = CompanyProfile.objects.filter(email__endswith="@synthetic.test").count()
+
+        for number in range(first + 1, first + options["companies"] + 1):
+            started = timezone.now()
+            with transaction.atomic():
+                company = self._generate_company(number, options)
+            clear_company_analytics(company.id)
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Company #{company.id} ({company.name}) generated in "
+                    f"{(timezone.now() - started).total_seconds():.1f}s"
+                )
+            )
+
+    def _generate_company(self, number, options):
+        company = CompanyProfile.objects.create(
+            name=f"Synthetic BTP {number}",
+            address=self.random.choice(CITIES),
+            phone="+212522000000",
+            email=f"contact-{number}@synthetic.test",
+            ice=f"{number:015d}",
+        )
+        admin = User.objects.create(
+            email=f"admin@synthetic-{number}.test",
+            password=self.password,
+            first_name="Admin",
+            last_name=f"Synthetic {number}",
+            role=UserRole.COMPANY_ADMIN,
+            company=company,
+        )
+        department = Department.objects.create(name="Travaux", company=company)
+        hr_admin = User.objects.create(
+            email=f"rh@synthetic-{number}.test",
+            password=self.password,
+            first_name="RH",
+            last_name=f"Synthetic {number}",
+            role=UserRole.HR_ADMIN,
+            company=company,
+            department=department,
+        )
+
+        clients = self._bulk(
+            Client,
+            (
+                Client(
+                    company=company,
+                    company_name=f"Client {number}-{index:04d}",
+                    contact_name=f"Contact {index}",
+                    ice=f"{number:05d}{index:010d}",
+                    phone="+212600000000",
+                    email=f"client{index}@synthetic-{number}.test",
+                    address=self.random.choice(CITIES),
+                )
+                for index in range(options["clients"])
+            ),
+        )
+        items = self._bulk(
+            Item,
+            (
+                Item(
+                    company=company,
+                    code=code,
+                    name=name,
+                    unit=unit,
+                    unit_price=Decimal(price),
+                    tax_rate=TAX_RATE,
+                )
+                for code, name, unit, price in MATERIALS
+            ),
+        )
+        chantiers = self._bulk(
+            Chantier,
+            (
+                Chantier(
+                    name=f"Chantier {number}-{index:03d}",
+                    location=self.random.choice(CITIES),
+                    department=department,
+                    client=self.random.choice(clients) if clients else None,
+                    start_date=self.today - datetime.timedelta(days=self.random.randint(30, 720)),
+                    end_date=(
+                        self.today + datetime.timedelta(days=self.random.randint(-60, 365))
+                        if self.random.random() < 0.7
+                        else None
+                    ),
+                )
+                for index in range(options["chantiers"])
+            ),
+        )
+        Chantier.responsible.through.objects.bulk_create(
+            Chantier.responsible.through(chantier_id=chantier.id, user_id=hr_admin.id)
+            for chantier in chantiers
+        )
+
+        employees = self._generate_workforce(number, company, chantiers, options)
+        invoices = self._generate_invoices(number, admin, clients, chantiers, items, options)
+        self._generate_expenses(admin, chantiers, options)
+        # bulk_create skips the signals that keep the ledger in step
+        ClientLedger.rebuild(Client.objects.filter(company=company))
+        SearchIndex.rebuild(company)
+        for catalog in CATALOGS.values():
+            bump_catalog_version(catalog, company.id)
+
+        self.stdout.write(
+            f"  {len(clients)} clients, {len(chantiers)} chantiers, "
+            f"{len(employees)} employees, {len(invoices)} invoices"
+        )
+        return company
+
+    def _generate_workforce(self, number, company, chantiers, options):
+        users = self._bulk(
+            User,
+            (
+                User(
+                    email=f"employe{index}@synthetic-{number}.test",
+                    password=self.password,
+                    first_name="Employé",
+                    last_name=f"{number}-{index:05d}",
+                    role=UserRole.EMPLOYEE,
+                    company=company,
+                )
+                for index in range(options["employees"])
+            ),
+        )
+        employees = self._bulk(
+            Employee,
+            (
+                Employee(
+                    cin=f"SYN{number:03d}{index:06d}",
+                    job_title=self.random.choice(["Maçon", "Ferrailleur", "Coffreur", "Chef d'équipe"]),
+                    user=user,
+                    hire_date=self.today - datetime.timedelta(days=self.random.randint(30, 2000)),
+                )
+                for index, user in enumerate(users)
+            ),
+        )
+        if not chantiers:
+            return employees
+
+        placement = {employee.id: self.random.choice(chantiers) for employee in employees}
+        self._bulk(
+            ChantierAssignment,
+            (
+                ChantierAssignment(employee=employee, chantier=placement[employee.id])
+                for employee in employees
+            ),
+        )
+
+        days = [
+            self.today - datetime.timedelta(days=offset)
+            for offset in range(options["attendance_days"])
+        ]
+        self._bulk(
+            Attendance,
+            (
+                Attendance(
+                    employee=employee,
+                    chantier=placement[employee.id],
+                    date=day,
+                    present=present,
+                    hours_worked=Decimal("8.00") if present else Decimal("0"),
+                )
+                for employee in employees
+                for day in days
+                if day.weekday() != 6
+                for present in [self.random.random() < 0.9]
+            ),
+        )
+        return employees
+
+    def _generate_invoices(self, number, admin, clients, chantiers, items, options):
+        if not clients:
+            return []
+
+        lines_per_invoice = options["lines"]
+        invoices = []
+        lines = []
+
+        for index in range(options["invoices"]):
+            issued = self.today - datetime.timedelta(days=self.random.randint(0, 365))
+            invoice_lines = [
+                self._line(self.random.choice(items)) for _ in range(lines_per_invoice)
+            ]
+            subtotal = sum(line.subtotal for line in invoice_lines)
+            discount_amount = (subtotal * RETENTION_RATE / 100).quantize(CENT)
+            total_ht = subtotal - discount_amount
+            tax_amount = (total_ht * TAX_RATE / 100).quantize(CENT)
+
+            invoices.append(
+                Invoice(
+                    invoice_number=f"SYN-{number}-{index:06d}",
+                    client=self.random.choice(clients),
+                    chantier=self.random.choice(chantiers) if chantiers else None,
+                    created_by=admin,
+                    status=InvoiceStatus.COMPLETED,
+                    subtotal=subtotal,
+                    discount_percentage=RETENTION_RATE,
+                    discount_amount=discount_amount,
+                    total_ht=total_ht,
+                    tax_rate=TAX_RATE,
+                    tax_amount=tax_amount,
+                    total_ttc=total_ht + tax_amount,
+                    remaining_balance=total_ht + tax_amount,
+                    issued_date=issued,
+                    due_date=issued + datetime.timedelta(days=self.random.choice([30, 60, 90])),
+                )
+            )
+            lines.append(invoice_lines)
+
+        invoices = self._bulk(Invoice, invoices)
+        for invoice, invoice_lines in zip(invoices, lines):
+            for line in invoice_lines:
+                line.invoice = invoice
+        self._bulk(InvoiceItem, (line for invoice_lines in lines for line in invoice_lines))
+
+        payments = []
+        paid = []
+        for invoice in invoices:
+            if self.random.random() >= options["paid_ratio"]:
+                continue
+
+            partial = self.random.random() < 1 / 3
+            amount = (
+                (invoice.total_ttc * Decimal(self.random.randint(20, 80)) / 100).quantize(CENT)
+                if partial
+                else invoice.total_ttc
+            )
+            payments.append(
+                Payment(
+                    invoice=invoice,
+                    amount=amount,
+                    payment_method=self.random.choice(PaymentMethod.values),
+                    payment_date=invoice.issued_date
+                    + datetime.timedelta(days=self.random.randint(0, 90)),
+                    created_by=admin,
+                )
+            )
+            invoice.remaining_balance = invoice.total_ttc - amount
+            invoice.status = InvoiceStatus.PARTIALLY_PAID if partial else InvoiceStatus.PAID
+            if not partial:
+                invoice.payment_method = payments[-1].payment_method
+                invoice.payment_date = payments[-1].payment_date
+            paid.append(invoice)
+
+        self._bulk(Payment, payments)
+        Invoice.objects.bulk_update(
+            paid,
+            ["remaining_balance", "status", "payment_method", "payment_date"],
+            batch_size=self.batch_size,
+        )
+        return invoices
+
+    def _line(self, item):
+        quantity = Decimal(self.random.randint(1, 50))
+        subtotal = quantity * item.unit_price
+        tax_amount = (subtotal * item.tax_rate / 100).quantize(CENT)
+        return InvoiceItem(
+            item=item,
+            item_code=item.code,
+            item_name=item.name,
+            unit=item.unit,
+            quantity=quantity,
+            unit_price=item.unit_price,
+            subtotal=subtotal,
+            tax_rate=item.tax_rate,
+            tax_amount=tax_amount,
+            total=subtotal + tax_amount,
+        )
+
+    def _generate_expenses(self, admin, chantiers, options):
+        if not chantiers:
+            return []
+
+        return self._bulk(
+            Expense,
+            (
+                Expense(
+                    chantier=self.random.choice(chantiers),
+                    title=f"Dépense {index:05d}",
+                    category=self.random.choice(ExpenseCategory.values),
+                    amount=Decimal(self.random.randint(100, 50000)),
+                    expense_date=self.today - datetime.timedelta(days=self.random.randint(0, 365)),
+                    created_by=admin,
+                )
+                for index in range(options["expenses"])
+            ),
+        )
+
+    def _bulk(self, model, objects):
+        return model.objects.bulk_create(list(objects), batch_size=self.batch_size)
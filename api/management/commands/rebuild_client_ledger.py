@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.ledger import ClientLedger
+from api.models import Client
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild client ledger entries and running balances from invoices and "
+        "payments, e.g. after bulk writes that bypassed the signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", type=int, help="Company id (default: every company)")
+        parser.add_argument("--client", type=int, action="append", help="Client id; repeatable")
+
+    def handle(self, *args, **options):
+        clients = Client.objects.order_by("id")
+        if options["company"]:
+            clients = clients.filter(company_id=options["company"])
+        if options["client"]:
+            clients = clients.filter(id__in=options["client"])
+
+        with transaction.atomic():
+            count = ClientLedger.rebuild(clients)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the ledger of {count} clients"))
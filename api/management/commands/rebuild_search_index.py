@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import CompanyProfile
+from api.search import SearchIndex
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the search entries of invoices, clients, chantiers and items, "
+        "e.g. after bulk writes that bypassed the signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", type=int, help="Company id (default: every company)")
+
+    def handle(self, *args, **options):
+        companies = CompanyProfile.objects.order_by("id")
+        if options["company"]:
+            companies = companies.filter(id=options["company"])
+
+        for company in companies:
+            with transaction.atomic():
+                count = SearchIndex.rebuild(company)
+            self.stdout.write(f"Company #{company.id}: {count} entries")
+
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt"))
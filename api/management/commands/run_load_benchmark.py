@@ -0,0 +1,277 @@
+import datetime
+import json
+import math
+import platform
+import random
+import statistics
+import time
+from contextlib import nullcontext
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.throttling import SimpleRateThrottle
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api import metrics
+from api.models import User, UserRole, Invoice, Chantier, Client, Item
+from api.signals import clear_company_analytics
+from api.tasks import generate_invoice_pdf_task
+from base.celery import app as celery_app
+
+
+SCENARIOS = [
+    "invoice_list",
+    "invoice_create",
+    "dashboard_cold",
+    "dashboard_warm",
+    "executive_dashboard_cold",
+    "advanced_dashboard_cold",
+    "attendance_sheet",
+    "invoice_pdf",
+]
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return None
+    rank = max(math.ceil(fraction * len(samples)) - 1, 0)
+    return samples[rank]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the main endpoints in-process with a real JWT and write a JSON report "
+        "of throughput, latency percentiles and queries per request. Celery runs "
+        "eagerly, so invoice creation includes its PDF render. Run it against data "
+        "from generate_synthetic_data; write scenarios add rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Email of a company admin (default: first synthetic admin)")
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument(
+            "--scenarios",
+            default=",".join(SCENARIOS),
+            help="Comma-separated subset of: " + ", ".join(SCENARIOS),
+        )
+        parser.add_argument("--output", default="benchmark-report.json")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--keep-throttling",
+            action="store_true",
+            help="Leave DRF throttles active (they cap runs at a few hundred requests)",
+        )
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options["scenarios"].split(",") if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+        self.user = self._get_user(options["user"])
+        self.company = self.user.company
+        self.random = random.Random(options["seed"])
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}"
+        )
+        self._load_fixtures()
+
+        eager = celery_app.conf.task_always_eager
+        celery_app.conf.task_always_eager = True
+        throttling = (
+            mock.patch.object(SimpleRateThrottle, "allow_request", return_value=True)
+            if not options["keep_throttling"]
+            else nullcontext()
+        )
+
+        results = {}
+        try:
+            with throttling:
+                for name in scenarios:
+                    self.stdout.write(f"{name} ...")
+                    results[name] = self._run(
+                        getattr(self, f"scenario_{name}"),
+                        options["iterations"],
+                        options["warmup"],
+                    )
+                    self._print(name, results[name])
+        finally:
+            celery_app.conf.task_always_eager = eager
+
+        report = {
+            "generated_at": timezone.now().isoformat(),
+            "environment": {
+                "python": platform.python_version(),
+                "database": connection.vendor,
+                "debug": settings.DEBUG,
+                "celery_eager": True,
+            },
+            "company": self.company.id,
+            "dataset": {
+                "invoices": Invoice.objects.filter(created_by__company=self.company).count(),
+                "clients": len(self.clients),
+                "chantiers": len(self.chantiers),
+            },
+            "iterations": options["iterations"],
+            "warmup": options["warmup"],
+            "scenarios": results,
+        }
+
+        with open(options["output"], "w") as handle:
+            json.dump(report, handle, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def _get_user(self, email):
+        users = User.objects.select_related("company").filter(
+            role=UserRole.COMPANY_ADMIN, company__isnull=False
+        )
+        user = (
+            users.filter(email=email).first()
+            if email
+            else users.filter(email__startswith="admin@synthetic-").order_by("id").first()
+        )
+        if user is None:
+            raise CommandError(
+                "No company admin found; run generate_synthetic_data or pass --user."
+            )
+        return user
+
+    def _load_fixtures(self):
+        self.clients = list(Client.objects.filter(company=self.company).values_list("id", flat=True))
+        self.items = list(Item.objects.filter(company=self.company))
+        self.chantiers = list(
+            Chantier.objects.filter(department__company=self.company).prefetch_related(
+                "employee_assignments"
+            )
+        )
+        self.invoice_ids = list(
+            Invoice.objects.filter(created_by__company=self.company)
+            .order_by("-id")
+            .values_list("id", flat=True)[:200]
+        )
+
+        if not (self.clients and self.items and self.chantiers and self.invoice_ids):
+            raise CommandError(
+                f"Company #{self.company.id} needs clients, items, chantiers and invoices."
+            )
+
+    def _run(self, scenario, iterations, warmup):
+        for _ in range(warmup):
+            scenario()
+
+        latencies = []
+        queries = []
+        errors = 0
+        started = time.perf_counter()
+
+        for _ in range(iterations):
+            query_count, _ = metrics.query_stats()
+            request_started = time.perf_counter()
+            ok = scenario()
+            latencies.append(time.perf_counter() - request_started)
+            queries.append(metrics.query_stats()[0] - query_count)
+            if not ok:
+                errors += 1
+
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+
+        return {
+            "requests": iterations,
+            "errors": errors,
+            "total_seconds": round(elapsed, 3),
+            "throughput_per_second": round(iterations / elapsed, 2) if elapsed else None,
+            "latency_ms": {
+                "min": round(latencies[0] * 1000, 2),
+                "mean": round(statistics.fmean(latencies) * 1000, 2),
+                "p50": round(percentile(latencies, 0.50) * 1000, 2),
+                "p90": round(percentile(latencies, 0.90) * 1000, 2),
+                "p95": round(percentile(latencies, 0.95) * 1000, 2),
+                "p99": round(percentile(latencies, 0.99) * 1000, 2),
+                "max": round(latencies[-1] * 1000, 2),
+            },
+            "queries": {
+                "mean": round(statistics.fmean(queries), 1),
+                "max": max(queries),
+            },
+        }
+
+    def _print(self, name, result):
+        latency = result["latency_ms"]
+        self.stdout.write(
+            f"  {result['throughput_per_second']}/s  p50 {latency['p50']} ms  "
+            f"p95 {latency['p95']} ms  p99 {latency['p99']} ms  "
+            f"{result['queries']['mean']} queries  {result['errors']} errors"
+        )
+
+    # -- scenarios: each performs one operation and returns True on success --
+
+    def scenario_invoice_list(self):
+        return self.client.get("/api/invoices").status_code == 200
+
+    def scenario_invoice_create(self):
+        payload = {
+            "client": self.random.choice(self.clients),
+            "chantier": self.random.choice(self.chantiers).id,
+            "issued_date": timezone.now().date().isoformat(),
+            "items": [
+                {
+                    "item_id": item.id,
+                    "item_name": item.name,
+                    "unit": item.unit,
+                    "quantity": str(self.random.randint(1, 20)),
+                    "unit_price": str(item.unit_price),
+                    "tax_rate": str(item.tax_rate),
+                }
+                for item in self.random.sample(self.items, min(5, len(self.items)))
+            ],
+        }
+        return self.client.post("/api/invoices", payload, format="json").status_code == 201
+
+    def scenario_dashboard_cold(self):
+        clear_company_analytics(self.company.id)
+        return self.client.get("/api/dashboard/data").status_code == 200
+
+    def scenario_dashboard_warm(self):
+        return self.client.get("/api/dashboard/data").status_code == 200
+
+    def scenario_executive_dashboard_cold(self):
+        clear_company_analytics(self.company.id)
+        return self.client.get("/api/dashboard/executive").status_code == 200
+
+    def scenario_advanced_dashboard_cold(self):
+        clear_company_analytics(self.company.id)
+        return self.client.get("/api/dashboard/advanced").status_code == 200
+
+    def scenario_attendance_sheet(self):
+        chantier = self.random.choice(self.chantiers)
+        day = timezone.now().date() - datetime.timedelta(days=self.random.randint(0, 60))
+        payload = {
+            "chantier": chantier.id,
+            "date": day.isoformat(),
+            "entries": [
+                {
+                    "employee": assignment.employee_id,
+                    "present": present,
+                    "hours_worked": "8.00" if present else "0",
+                }
+                for assignment in chantier.employee_assignments.all()
+                for present in [self.random.random() < 0.9]
+            ],
+        }
+        return (
+            self.client.post("/api/attendances/sheet/", payload, format="json").status_code
+            == 200
+        )
+
+    def scenario_invoice_pdf(self):
+        result = generate_invoice_pdf_task.apply(args=[self.random.choice(self.invoice_ids)])
+        return result.successful()
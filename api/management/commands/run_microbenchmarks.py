@@ -0,0 +1,246 @@
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from weasyprint import HTML
+
+from api.models import CompanyProfile, Client, Invoice, InvoiceItem, User, UserRole
+from api.services import EmailSending, InvoiceCalculator
+from api.tasks import render_invoice_html
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the hot service functions (totals, line math, legal amount text, "
+        "email preparation, invoice HTML and PDF rendering) on a fixed fixture, "
+        "append the results to a history file and compare them with the previous run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--history",
+            default=os.path.join(settings.BASE_DIR, "benchmarks", "microbenchmarks.json"),
+        )
+        parser.add_argument("--rounds", type=int, default=7)
+        parser.add_argument(
+            "--min-time",
+            type=float,
+            default=0.2,
+            help="Minimum seconds per round; loops per round are calibrated to reach it",
+        )
+        parser.add_argument("--lines", type=int, default=20, help="Lines on the fixture invoice")
+        parser.add_argument("--only", help="Comma-separated benchmark names")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=10.0,
+            help="Median slowdown (percent) reported as a regression",
+        )
+        parser.add_argument("--fail-on-regression", action="store_true")
+        parser.add_argument("--no-save", action="store_true")
+
+    def handle(self, *args, **options):
+        self.options = options
+        results = {}
+
+        try:
+            with transaction.atomic():
+                invoice = self._fixture(options["lines"])
+                for name, func in self._benchmarks(invoice):
+                    results[name] = self._measure(func)
+                    self.stdout.write(
+                        f"{name:<22} median {results[name]['median_us']:>12.1f} us  "
+                        f"min {results[name]['min_us']:>12.1f} us  "
+                        f"({results[name]['loops']} loops x {options['rounds']})"
+                    )
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        history = self._load_history(options["history"])
+        regressions = self._compare(history[-1]["results"] if history else {}, results)
+
+        if not options["no_save"]:
+            history.append(
+                {
+                    "timestamp": timezone.now().isoformat(),
+                    "revision": self._revision(),
+                    "python": platform.python_version(),
+                    "results": results,
+                }
+            )
+            os.makedirs(os.path.dirname(options["history"]) or ".", exist_ok=True)
+            with open(options["history"], "w") as handle:
+                json.dump(history, handle, indent=2)
+
+        if regressions and options["fail_on_regression"]:
+            raise CommandError(f"Regressions: {', '.join(regressions)}")
+
+    def _fixture(self, line_count):
+        company = CompanyProfile.objects.create(
+            name="Microbenchmark SARL",
+            address="12 Bd Zerktouni, Casablanca",
+            phone="+212522000000",
+            email="bench@example.com",
+            ice="001234567000089",
+        )
+        user = User.objects.create_user(
+            email="microbenchmark@example.com",
+            password=None,
+            first_name="Bench",
+            last_name="Mark",
+            role=UserRole.COMPANY_ADMIN,
+            company=company,
+        )
+        client = Client.objects.create(
+            company=company,
+            company_name="Client Benchmark",
+            contact_name="Mme Benchmark",
+            ice="009876543000012",
+            phone="+212600000000",
+            email="client@example.com",
+        )
+        invoice = Invoice.objects.create(
+            client=client,
+            created_by=user,
+            issued_date=datetime.date(2026, 1, 15),
+            due_date=datetime.date(2026, 2, 15),
+        )
+        for index in range(line_count):
+            InvoiceItem.objects.create(
+                invoice=invoice,
+                item_name=f"Article {index}",
+                unit="u",
+                quantity=Decimal(index % 7 + 1),
+                unit_price=Decimal("149.90"),
+                tax_rate=Decimal("20"),
+            )
+
+        totals = InvoiceCalculator.get_totals(invoice)
+        for field, value in totals.items():
+            setattr(invoice, field, value)
+        invoice.amount_in_words = InvoiceCalculator.get_amount_in_words(invoice.total_ttc)
+        invoice.save()
+
+        # Lines are prefetched so the numbers measure Python work, not the database
+        return (
+            Invoice.objects.select_related("client", "created_by__company")
+            .prefetch_related("invoice_items")
+            .get(pk=invoice.pk)
+        )
+
+    def _benchmarks(self, invoice):
+        line = InvoiceItem(
+            quantity=Decimal("12.50"), unit_price=Decimal("149.90"), tax_rate=Decimal("20")
+        )
+        html = render_invoice_html(invoice)
+        email = EmailSending(invoice)
+
+        benchmarks = [
+            ("invoice_totals", lambda: InvoiceCalculator.get_totals(invoice)),
+            ("invoice_item_math", line.compute_amounts),
+            (
+                "amount_in_words",
+                lambda: InvoiceCalculator.get_amount_in_words(Decimal("1234567.89")),
+            ),
+            (
+                "prepare_email",
+                lambda: email._prepare_email(
+                    "Reminder", "invoice_reminder.html", {"days_left": 3}
+                ),
+            ),
+            ("invoice_pdf_html", lambda: render_invoice_html(invoice)),
+            (
+                "invoice_pdf_render",
+                lambda: HTML(string=html, base_url=settings.BASE_DIR).write_pdf(),
+            ),
+        ]
+
+        only = self.options["only"]
+        if only:
+            wanted = {name.strip() for name in only.split(",")}
+            benchmarks = [(name, func) for name, func in benchmarks if name in wanted]
+        return benchmarks
+
+    def _measure(self, func):
+        func()
+
+        loops = 1
+        while True:
+            started = time.perf_counter()
+            for _ in range(loops):
+                func()
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.options["min_time"] or loops >= 1_000_000:
+                break
+            loops *= 10 if elapsed < self.options["min_time"] / 10 else 2
+
+        samples = [elapsed / loops]
+        for _ in range(self.options["rounds"] - 1):
+            started = time.perf_counter()
+            for _ in range(loops):
+                func()
+            samples.append((time.perf_counter() - started) / loops)
+
+        return {
+            "loops": loops,
+            "min_us": round(min(samples) * 1e6, 3),
+            "median_us": round(statistics.median(samples) * 1e6, 3),
+            "mean_us": round(statistics.fmean(samples) * 1e6, 3),
+            "stdev_us": round(statistics.pstdev(samples) * 1e6, 3),
+        }
+
+    def _load_history(self, path):
+        if not os.path.exists(path):
+            return []
+        with open(path) as handle:
+            return json.load(handle)
+
+    def _compare(self, previous, results):
+        regressions = []
+        if not previous:
+            return regressions
+
+        self.stdout.write("")
+        self.stdout.write("Compared with the previous run (median):")
+        for name, result in results.items():
+            if name not in previous:
+                continue
+            before = previous[name]["median_us"]
+            change = (result["median_us"] - before) / before * 100 if before else 0.0
+            line = f"  {name:<22} {before:>12.1f} -> {result['median_us']:>12.1f} us  {change:+6.1f}%"
+
+            if change > self.options["threshold"]:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(line + "  REGRESSION"))
+            elif change < -self.options["threshold"]:
+                self.stdout.write(self.style.SUCCESS(line))
+            else:
+                self.stdout.write(line)
+
+        return regressions
+
+    def _revision(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
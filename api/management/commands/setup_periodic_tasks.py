@@ -74,8 +74,25 @@ class Command(BaseCommand):
             },
         )
 
+        daily_schedule, _ = CrontabSchedule.objects.get_or_create(
+            minute="0",
+            hour="5",
+            day_of_week="*",
+            day_of_month="*",
+            month_of_year="*",
+        )
+
+        PeriodicTask.objects.update_or_create(
+            name="Recurring Invoices",
+            defaults={
+                "crontab": daily_schedule,
+                "task": "api.tasks.generate_recurring_invoices_task",
+            },
+        )
+
         self.stdout.write(
             self.style.SUCCESS(
-                "Testing tasks (General & Pre-Due) are active every 5 minutes."
+                "Testing tasks (General & Pre-Due) are active every 5 minutes; "
+                "recurring invoices are generated daily at 05:00."
             )
         )
@@ -0,0 +1,243 @@
+import socket
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class MetricsRegistry:
+    """
+    Process-local counters and histograms rendered in the Prometheus text
+    exposition format. Every Gunicorn/Celery worker keeps its own registry;
+    use the StatsD sink when the numbers must be aggregated across workers.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._histograms = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] += value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {
+                    "buckets": [0] * len(self.buckets),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["buckets"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                key: {**value, "buckets": list(value["buckets"])}
+                for key, value in self._histograms.items()
+            }
+        return counters, histograms
+
+    def render(self):
+        counters, histograms = self.snapshot()
+        lines = []
+
+        seen = set()
+        for (name, labels), value in sorted(counters.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), histogram in sorted(histograms.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {name} histogram")
+                seen.add(name)
+            for bound, count in zip(self.buckets, histogram["buckets"]):
+                bucket_labels = labels + (("le", _format_value(bound)),)
+                lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+            inf_labels = labels + (("le", "+Inf"),)
+            lines.append(
+                f"{name}_bucket{_format_labels(inf_labels)} {histogram['count']}"
+            )
+            lines.append(
+                f"{name}_sum{_format_labels(labels)} {_format_value(histogram['sum'])}"
+            )
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels
+    )
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class StatsdSink:
+    """Fire-and-forget UDP sink; a lost datagram never blocks a request."""
+
+    def __init__(self, host, port, prefix=""):
+        self.address = (host, int(port))
+        self.prefix = f"{prefix}." if prefix else ""
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+
+    def _name(self, name, labels):
+        parts = [self.prefix + name]
+        parts.extend(str(value).replace(".", "_") for _, value in sorted(labels.items()))
+        return ".".join(parts)
+
+    def _send(self, payload):
+        try:
+            self._socket.sendto(payload.encode(), self.address)
+        except OSError:
+            pass
+
+    def inc(self, name, value=1, **labels):
+        self._send(f"{self._name(name, labels)}:{value}|c")
+
+    def observe(self, name, value, **labels):
+        self._send(f"{self._name(name, labels)}:{value * 1000:.3f}|ms")
+
+
+registry = MetricsRegistry()
+
+_statsd = None
+if getattr(settings, "METRICS_STATSD_HOST", None):
+    _statsd = StatsdSink(
+        settings.METRICS_STATSD_HOST,
+        getattr(settings, "METRICS_STATSD_PORT", 8125),
+        getattr(settings, "METRICS_STATSD_PREFIX", ""),
+    )
+
+
+def inc(name, value=1, **labels):
+    registry.inc(name, value, **labels)
+    if _statsd is not None:
+        _statsd.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+    if _statsd is not None:
+        _statsd.observe(name, value, **labels)
+
+
+@contextmanager
+def timed(name, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+# ---------------------------------------------------------------------------
+# Database instrumentation
+# ---------------------------------------------------------------------------
+
+_query_local = threading.local()
+
+
+def query_stats():
+    """Return ``(query_count, query_seconds)`` executed so far on this thread."""
+    return (
+        getattr(_query_local, "count", 0),
+        getattr(_query_local, "seconds", 0.0),
+    )
+
+
+def _record_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        _query_local.count = getattr(_query_local, "count", 0) + 1
+        _query_local.seconds = getattr(_query_local, "seconds", 0.0) + elapsed
+
+        alias = context["connection"].alias
+        inc("db_queries_total", alias=alias)
+        observe("db_query_seconds", elapsed, alias=alias)
+
+
+def install_query_instrumentation(sender, connection, **kwargs):
+    # Keep this wrapper outermost: execute_wrapper() context managers pop the
+    # last entry, and a connection can be opened in the middle of one.
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+connection_created.connect(install_query_instrumentation)
+
+
+# ---------------------------------------------------------------------------
+# Analytics cache helpers
+# ---------------------------------------------------------------------------
+
+
+class ComputeTimer:
+    def __init__(self, metric):
+        self.metric = metric
+        self.started = time.perf_counter()
+        self.queries, self.query_seconds = query_stats()
+
+    def stop(self):
+        queries, query_seconds = query_stats()
+        observe(
+            "analytics_compute_seconds",
+            time.perf_counter() - self.started,
+            metric=self.metric,
+        )
+        inc("analytics_queries_total", queries - self.queries, metric=self.metric)
+        inc(
+            "analytics_query_seconds_total",
+            query_seconds - self.query_seconds,
+            metric=self.metric,
+        )
+
+
+def cache_hit(metric):
+    inc("analytics_cache_hits_total", metric=metric)
+
+
+def cache_miss(metric):
+    """Count a miss and return a timer to ``stop()`` once the value is computed."""
+    inc("analytics_cache_misses_total", metric=metric)
+    return ComputeTimer(metric)
@@ -0,0 +1,203 @@
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from api import metrics
+
+
+logger = logging.getLogger("api.profiling")
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """Reduce a statement to its shape so repeated lookups collapse together."""
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self, threshold):
+        return {
+            statement: count
+            for statement, count in self.fingerprints.items()
+            if count >= threshold
+        }
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack at a fixed interval and aggregates the
+    result in collapsed-stack format (``frame;frame;frame count``), which
+    flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(
+                    "{}:{}".format(
+                        os.path.basename(code.co_filename),
+                        getattr(code, "co_qualname", code.co_name),
+                    )
+                )
+                frame = frame.f_back
+
+            self.stacks[";".join(reversed(names))] += 1
+
+
+class QueryProfilingMiddleware:
+    """
+    Opt-in (settings.PROFILING_ENABLED) per-request guardrail: records query
+    count, duplicate query fingerprints, DB time and total time per endpoint,
+    logs requests over budget, and writes sampled collapsed-stack profiles.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.query_budget = settings.PROFILING_QUERY_BUDGET
+        self.time_budget_ms = settings.PROFILING_TIME_BUDGET_MS
+        self.duplicate_threshold = settings.PROFILING_DUPLICATE_THRESHOLD
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.sample_interval = settings.PROFILING_SAMPLE_INTERVAL_MS / 1000
+        self.output_dir = settings.PROFILING_OUTPUT_DIR
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        sampler = None
+        if self.sample_rate and random.random() < self.sample_rate:
+            sampler = StackSampler(threading.get_ident(), self.sample_interval)
+            sampler.start()
+
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            stacks = sampler.stop() if sampler else None
+
+        elapsed = time.perf_counter() - started
+        endpoint = self._endpoint(request)
+
+        self._record(request, response, endpoint, recorder, elapsed)
+
+        if stacks:
+            self._write_profile(endpoint, stacks)
+
+        response["Server-Timing"] = 'db;dur={:.1f};desc="{} queries", total;dur={:.1f}'.format(
+            recorder.seconds * 1000, recorder.count, elapsed * 1000
+        )
+
+        return response
+
+    def _endpoint(self, request):
+        match = getattr(request, "resolver_match", None)
+        if match is None:
+            return "unresolved"
+        return match.route or match.view_name or "unresolved"
+
+    def _record(self, request, response, endpoint, recorder, elapsed):
+        labels = {"endpoint": endpoint, "method": request.method}
+
+        metrics.observe("http_request_seconds", elapsed, **labels)
+        metrics.observe("http_request_db_seconds", recorder.seconds, **labels)
+        metrics.inc("http_request_queries_total", recorder.count, **labels)
+
+        duplicates = recorder.duplicates(self.duplicate_threshold)
+        if duplicates:
+            metrics.inc("http_request_duplicate_queries_total", **labels)
+
+        elapsed_ms = elapsed * 1000
+        over_budget = (
+            recorder.count > self.query_budget or elapsed_ms > self.time_budget_ms
+        )
+
+        if over_budget:
+            metrics.inc("http_request_over_budget_total", **labels)
+
+        if over_budget or duplicates:
+            logger.warning(
+                "%s %s -> %s: %d queries, %.1f ms db, %.1f ms total",
+                request.method,
+                endpoint,
+                response.status_code,
+                recorder.count,
+                recorder.seconds * 1000,
+                elapsed_ms,
+                extra={
+                    "endpoint": endpoint,
+                    "query_count": recorder.count,
+                    "db_ms": round(recorder.seconds * 1000, 1),
+                    "total_ms": round(elapsed_ms, 1),
+                    "duplicate_queries": duplicates,
+                },
+            )
+
+            for statement, count in sorted(
+                duplicates.items(), key=lambda item: item[1], reverse=True
+            )[:5]:
+                logger.warning("  possible N+1 (%dx): %s", count, statement[:300])
+
+    def _write_profile(self, endpoint, stacks):
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", endpoint).strip("_") or "root"
+        filename = "{}-{}.folded".format(
+            slug, timezone.now().strftime("%Y%m%dT%H%M%S%f")
+        )
+
+        with open(os.path.join(self.output_dir, filename), "w") as handle:
+            for stack, count in stacks.most_common():
+                handle.write(f"{stack} {count}\n")
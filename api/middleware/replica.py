@@ -0,0 +1,57 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+
+from api import db_routers
+
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def pin_key(request):
+    """
+    Cache key identifying the caller across requests: the bearer token for
+    API clients, the session cookie otherwise. None for anonymous callers.
+    """
+    identity = request.META.get("HTTP_AUTHORIZATION") or request.COOKIES.get(
+        settings.SESSION_COOKIE_NAME
+    )
+    if not identity:
+        return None
+    return "replica:pin:" + hashlib.sha256(identity.encode()).hexdigest()[:32]
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Read-only requests read from the replica. After a successful write the
+    caller is pinned to the primary for REPLICA_PIN_SECONDS so they read their
+    own changes; analytics paths (cached for minutes anyway) always use the
+    replica so month-end reporting stays off the primary. Without a replica
+    configured the middleware is left out of the stack entirely.
+    """
+
+    def __init__(self, get_response):
+        if db_routers.replica_alias() is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.pin_seconds = settings.REPLICA_PIN_SECONDS
+        self.always_paths = tuple(settings.REPLICA_ALWAYS_PATHS)
+
+    def __call__(self, request):
+        key = pin_key(request)
+
+        if request.method not in SAFE_METHODS:
+            with db_routers.use_primary():
+                response = self.get_response(request)
+            if key and response.status_code < 400:
+                cache.set(key, True, self.pin_seconds)
+            return response
+
+        if request.path.startswith(self.always_paths) or not (key and cache.get(key)):
+            with db_routers.use_replica():
+                return self.get_response(request)
+
+        with db_routers.use_primary():
+            return self.get_response(request)
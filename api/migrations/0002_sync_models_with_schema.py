@@ -0,0 +1,351 @@
+# Generated by Django 5.1.15 on 2026-10-19 11:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChantierAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.CharField(blank=True, max_length=128, null=True)),
+                ('start_date', models.DateField(blank=True, null=True)),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ChatMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message', models.TextField()),
+                ('ai_response', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EmployeeEOSB',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_job_title', models.CharField(max_length=150)),
+                ('last_salary', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('hire_date', models.DateField()),
+                ('exit_date', models.DateField()),
+                ('total_years_of_service', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('basic_end_of_service_payment', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('bonuses_paid', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('deductions', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('net_payment', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('eosb_pdf', models.FileField(blank=True, null=True, upload_to='eosb_statements/')),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EmployeeWorkingContract',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contract_number', models.CharField(max_length=100, unique=True)),
+                ('contract_start_date', models.DateField()),
+                ('contract_end_date', models.DateField(blank=True, null=True)),
+                ('job_title', models.CharField(max_length=150)),
+                ('salary', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('bonus', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('allowances', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('contract_pdf', models.FileField(blank=True, null=True, upload_to='contracts/')),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='POItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_code', models.CharField(blank=True, max_length=50, null=True)),
+                ('item_name', models.CharField(max_length=255)),
+                ('item_description', models.TextField(blank=True, null=True)),
+                ('unit', models.CharField(max_length=50)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('tax_rate', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PurchaseOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('po_number', models.CharField(max_length=50, unique=True)),
+                ('status', models.CharField(choices=[('DRAFT', 'Draft'), ('SENT', 'Sent'), ('CONFIRMED', 'Confirmed'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], default='DRAFT', max_length=20)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('discount_percentage', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('discount_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_ht', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tax_rate', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('tax_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_ttc', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('amount_in_words', models.TextField(blank=True, null=True)),
+                ('issued_date', models.DateField()),
+                ('expected_delivery_date', models.DateField(blank=True, null=True)),
+                ('project_description', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Quote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quote_number', models.CharField(max_length=50, unique=True)),
+                ('status', models.CharField(choices=[('DRAFT', 'Draft'), ('SENT', 'Sent'), ('ACCEPTED', 'Accepted'), ('REJECTED', 'Rejected'), ('EXPIRED', 'Expired')], default='DRAFT', max_length=20)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('discount_percentage', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('discount_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_ht', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tax_rate', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('tax_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_ttc', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('amount_in_words', models.TextField(blank=True, null=True)),
+                ('issued_date', models.DateField()),
+                ('valid_until', models.DateField(blank=True, null=True)),
+                ('project_description', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuoteItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_code', models.CharField(blank=True, max_length=50, null=True)),
+                ('item_name', models.CharField(max_length=255)),
+                ('item_description', models.TextField(blank=True, null=True)),
+                ('unit', models.CharField(max_length=50)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('tax_rate', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='invoiceitem',
+            options={'ordering': ['id']},
+        ),
+        migrations.AlterModelOptions(
+            name='payment',
+            options={'ordering': ['-payment_date']},
+        ),
+        migrations.RemoveField(
+            model_name='employee',
+            name='assigned_chantier',
+        ),
+        migrations.RemoveField(
+            model_name='employee',
+            name='first_name',
+        ),
+        migrations.RemoveField(
+            model_name='employee',
+            name='last_name',
+        ),
+        migrations.AddField(
+            model_name='chantier',
+            name='document',
+            field=models.FileField(blank=True, null=True, upload_to='chantiers/'),
+        ),
+        migrations.AddField(
+            model_name='chantier',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='company',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='clients', to='api.companyprofile'),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='hire_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='is_currently_working',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='user',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='employee_profile', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='document',
+            field=models.FileField(blank=True, null=True, upload_to='expenses/'),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='Subject',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='remaining_balance',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True),
+        ),
+        migrations.AddField(
+            model_name='invoiceitem',
+            name='description',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='invoiceitem',
+            name='tax_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True),
+        ),
+        migrations.AddField(
+            model_name='invoiceitem',
+            name='total',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='company',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='items', to='api.companyprofile'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='created_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payments', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RemoveField(
+            model_name='chantier',
+            name='responsible',
+        ),
+        migrations.AlterField(
+            model_name='invoice',
+            name='invoice_number',
+            field=models.CharField(blank=True, max_length=50, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='invoice',
+            name='status',
+            field=models.CharField(choices=[('DRAFT', 'Draft'), ('COMPLETED', 'Completed'), ('PAID', 'Paid'), ('PARTIALLY_PAID', 'Partially paid')], default='DRAFT', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='invoiceitem',
+            name='invoice',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invoice_items', to='api.invoice'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_date'], name='api_payment_payment_d80323_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_method'], name='api_payment_payment_38c2ae_idx'),
+        ),
+        migrations.AddField(
+            model_name='chantierassignment',
+            name='chantier',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='employee_assignments', to='api.chantier'),
+        ),
+        migrations.AddField(
+            model_name='chantierassignment',
+            name='employee',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chantier_assignments', to='api.employee'),
+        ),
+        migrations.AddField(
+            model_name='chantier',
+            name='employees',
+            field=models.ManyToManyField(related_name='chantiers', through='api.ChantierAssignment', to='api.employee'),
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='sent_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='employeeeosb',
+            name='employee',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='eosb_record', to='api.employee'),
+        ),
+        migrations.AddField(
+            model_name='employeeworkingcontract',
+            name='employee',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='working_contract', to='api.employee'),
+        ),
+        migrations.AddField(
+            model_name='poitem',
+            name='item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.item'),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='chantier',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='purchase_orders', to='api.chantier'),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='client',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchase_orders', to='api.client'),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='created_by',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_pos', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='poitem',
+            name='purchase_order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='api.purchaseorder'),
+        ),
+        migrations.AddField(
+            model_name='quote',
+            name='chantier',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='quotes', to='api.chantier'),
+        ),
+        migrations.AddField(
+            model_name='quote',
+            name='client',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quotes', to='api.client'),
+        ),
+        migrations.AddField(
+            model_name='quote',
+            name='created_by',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_quotes', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='quoteitem',
+            name='item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.item'),
+        ),
+        migrations.AddField(
+            model_name='quoteitem',
+            name='quote',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='api.quote'),
+        ),
+        migrations.AddField(
+            model_name='chantier',
+            name='responsible',
+            field=models.ManyToManyField(blank=True, limit_choices_to={'role': 'HR_ADMIN'}, related_name='responsible_chantiers', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='chantierassignment',
+            unique_together={('employee', 'chantier')},
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.15 on 2026-10-19 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_sync_models_with_schema'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date'], name='api_attenda_date_44576d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['chantier', 'date'], name='api_attenda_chantie_242579_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chantier',
+            index=models.Index(fields=['start_date'], name='api_chantie_start_d_7a844e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chantier',
+            index=models.Index(fields=['end_date'], name='api_chantie_end_dat_4f72c7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['company_name'], name='api_client_company_d0beb9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['ice'], name='api_client_ice_b42b53_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['hire_date'], name='api_employe_hire_da_64cee5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employeeeosb',
+            index=models.Index(fields=['exit_date'], name='api_employe_exit_da_8b4fc0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employeeworkingcontract',
+            index=models.Index(fields=['contract_end_date'], name='api_employe_contrac_612876_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['expense_date'], name='api_expense_expense_10f979_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['category'], name='api_expense_categor_464d07_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['code'], name='api_item_code_43b1ea_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['name'], name='api_item_name_733099_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_add_invoice_import_job_kind'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='kind',
+            field=models.CharField(choices=[('INVOICE_CREATE', 'Invoice creation'), ('QUOTE_CREATE', 'Quote creation'), ('PO_CREATE', 'Purchase order creation'), ('INVOICE_IMPORT', 'Invoice import'), ('XLSX_EXPORT', 'XLSX export')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.15 on 2026-10-19 12:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_add_xlsx_export_job_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='source_purchase_order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='invoices', to='api.purchaseorder'),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='source_quote',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='invoices', to='api.quote'),
+        ),
+    ]
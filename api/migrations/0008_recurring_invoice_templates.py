@@ -0,0 +1,66 @@
+# Generated by Django 5.1.15 on 2026-10-19 12:05
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_invoice_source_documents'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringInvoiceTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('Subject', models.CharField(blank=True, max_length=255, null=True)),
+                ('project_description', models.TextField(blank=True, null=True)),
+                ('frequency', models.CharField(choices=[('MONTHLY', 'Monthly'), ('QUARTERLY', 'Quarterly')], default='MONTHLY', max_length=20)),
+                ('day_of_month', models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(31)])),
+                ('next_run_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('payment_terms_days', models.PositiveSmallIntegerField(default=30)),
+                ('is_active', models.BooleanField(default=True)),
+                ('last_generated_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('chantier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_invoices', to='api.chantier')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_invoices', to='api.client')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recurring_invoices', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RecurringInvoiceItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_code', models.CharField(blank=True, max_length=50, null=True)),
+                ('item_name', models.CharField(max_length=255)),
+                ('item_description', models.TextField(blank=True, null=True)),
+                ('unit', models.CharField(max_length=50)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('tax_rate', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.item')),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='api.recurringinvoicetemplate')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='recurring_template',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='invoices', to='api.recurringinvoicetemplate'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringinvoicetemplate',
+            index=models.Index(fields=['is_active', 'next_run_date'], name='api_recurri_is_acti_38eb3c_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.15 on 2026-10-19 12:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_recurring_invoice_templates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('INVOICE', 'Invoice issued'), ('PAYMENT', 'Payment received'), ('CREDIT', 'Credit')], max_length=20)),
+                ('entry_date', models.DateField()),
+                ('reference', models.CharField(blank=True, max_length=100, null=True)),
+                ('debit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('credit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='api.client')),
+                ('invoice', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entry', to='api.invoice')),
+                ('payment', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entry', to='api.payment')),
+            ],
+            options={
+                'ordering': ['entry_date', 'id'],
+                'indexes': [models.Index(fields=['client', 'entry_date', 'id'], name='api_clientl_client__dddb4c_idx')],
+            },
+        ),
+    ]
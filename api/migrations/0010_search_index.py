@@ -0,0 +1,80 @@
+# Generated by Django 5.1.15 on 2026-10-19 12:13
+
+import django.db.models.deletion
+from django.db import OperationalError, migrations, models
+
+
+FTS_TABLE = "api_searchentry_fts"
+
+
+def create_text_index(apps, schema_editor):
+    """FTS5 with sync triggers on SQLite, a trigram GIN index on PostgreSQL."""
+    table = schema_editor.quote_name(apps.get_model("api", "SearchEntry")._meta.db_table)
+    vendor = schema_editor.connection.vendor
+
+    if vendor == "sqlite":
+        statements = [
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(text, content={table}, "
+            f"content_rowid=id, tokenize='unicode61 remove_diacritics 2')",
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END",
+            f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text); END",
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {table} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text); "
+            f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END",
+        ]
+    elif vendor == "postgresql":
+        statements = [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            f"CREATE INDEX api_searchentry_text_trgm ON {table} USING gin (text gin_trgm_ops)",
+        ]
+    else:
+        return
+
+    try:
+        schema_editor.execute(statements[0])
+    except OperationalError:
+        # SQLite built without FTS5: api/search.py falls back to LIKE
+        if vendor == "sqlite":
+            return
+        raise
+    for statement in statements[1:]:
+        schema_editor.execute(statement)
+
+
+def drop_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS api_searchentry_text_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_client_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('INVOICE', 'Invoice'), ('CLIENT', 'Client'), ('CHANTIER', 'Chantier'), ('ITEM', 'Item')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('subtitle', models.CharField(blank=True, max_length=255)),
+                ('text', models.TextField()),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='api.companyprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['company', 'kind'], name='api_searche_company_b3ff5b_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_entry')],
+            },
+        ),
+        migrations.RunPython(create_text_index, drop_text_index),
+    ]
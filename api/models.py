@@ -10,6 +10,8 @@ from decimal import Decimal
 from django.db import transaction
 from django.utils import timezone
 from django.db.models import Max
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.validators import MaxValueValidator, MinValueValidator
 
 
 class LanguageChoices(models.TextChoices):
@@ -169,6 +171,12 @@ class Client(models.Model):
         CompanyProfile, on_delete=models.SET_NULL, null=True, related_name="clients"
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["company_name"]),
+            models.Index(fields=["ice"]),
+        ]
+
     def __str__(self):
         return self.company_name
 
@@ -183,6 +191,11 @@ class Employee(models.Model):
     is_currently_working = models.BooleanField(default = True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["hire_date"]),
+        ]
+
     def __str__(self):
         return f"{self.user.get_full_name() if self.user else {self.id }}"
 
@@ -217,6 +230,11 @@ class EmployeeWorkingContract(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["contract_end_date"]),
+        ]
+
     def __str__(self):
         return f"{self.employee} - {self.contract_number}"
 
@@ -254,6 +272,11 @@ class EmployeeEOSB(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["exit_date"]),
+        ]
+
     def __str__(self):
         return f"EOSB - {self.employee} ({self.exit_date})"
 
@@ -301,6 +324,12 @@ class Chantier(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["start_date"]),
+            models.Index(fields=["end_date"]),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -359,6 +388,10 @@ class Attendance(models.Model):
 
     class Meta:
         unique_together = ("employee", "chantier", "date")
+        indexes = [
+            models.Index(fields=["date"]),
+            models.Index(fields=["chantier", "date"]),
+        ]
 
     def __str__(self):
         return f"{self.employee} - {self.chantier} ({self.date})"
@@ -376,6 +409,12 @@ class Item(models.Model):
         CompanyProfile, on_delete=models.SET_NULL, null=True, related_name="items"
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["code"]),
+            models.Index(fields=["name"]),
+        ]
+
     def __str__(self):
         return f"{self.code} - {self.name}" if self.code else self.name
 
@@ -423,6 +462,21 @@ class Invoice(models.Model):
     project_description = models.TextField(blank=True, null=True)
     contract_number = models.CharField(max_length=100, blank=True, null=True)
 
+    # Set when the invoice was converted from a quote or purchase order, or
+    # generated from a recurring template
+    source_quote = models.ForeignKey(
+        "Quote", on_delete=models.SET_NULL, null=True, blank=True, related_name="invoices"
+    )
+    source_purchase_order = models.ForeignKey(
+        "PurchaseOrder", on_delete=models.SET_NULL, null=True, blank=True, related_name="invoices"
+    )
+    recurring_template = models.ForeignKey(
+        "RecurringInvoiceTemplate",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="invoices",
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -440,6 +494,9 @@ class Invoice(models.Model):
     def save(self, *args, **kwargs):
         if not self.invoice_number:
             self.invoice_number = self.generate_invoice_number()
+        # auto_now is only written when listed; the detail ETag relies on it
+        if kwargs.get("update_fields"):
+            kwargs["update_fields"] = {*kwargs["update_fields"], "updated_at"}
         super().save(*args, **kwargs)
 
 
@@ -466,6 +523,32 @@ class Invoice(models.Model):
 
             return f"{prefix}{next_seq:04d}"
 
+    @classmethod
+    def allocate_invoice_numbers(cls, issued_dates):
+        """
+        Numbers for a batch of new invoices, one MAX() query per month prefix
+        instead of one per invoice. Call it in the transaction that inserts them.
+        """
+        indexes_by_prefix = {}
+        for index, date in enumerate(issued_dates):
+            prefix = f"{date.year}-{date.month:02d}-"
+            indexes_by_prefix.setdefault(prefix, []).append(index)
+
+        numbers = [None] * len(issued_dates)
+        for prefix, indexes in indexes_by_prefix.items():
+            last_invoice = (
+                cls.objects
+                .filter(invoice_number__startswith=prefix)
+                .aggregate(max_number=Max("invoice_number"))
+            )["max_number"]
+            sequence = int(last_invoice.split("-")[-1]) if last_invoice else 0
+
+            for index in indexes:
+                sequence += 1
+                numbers[index] = f"{prefix}{sequence:04d}"
+
+        return numbers
+
 class InvoiceItem(models.Model):
     invoice = models.ForeignKey(
         Invoice, on_delete=models.CASCADE, related_name="invoice_items"
@@ -497,12 +580,15 @@ class InvoiceItem(models.Model):
             self.unit_price = self.item.unit_price
             self.tax_rate = self.item.tax_rate
 
+        self.compute_amounts()
+
+        super().save(*args, **kwargs)
+
+    def compute_amounts(self):
         self.subtotal = self.quantity * self.unit_price
         self.tax_amount = self.subtotal * (self.tax_rate / Decimal("100"))
         self.total = self.subtotal + self.tax_amount
 
-        super().save(*args, **kwargs)
-
 
 class Expense(models.Model):
     chantier = models.ForeignKey(
@@ -522,6 +608,12 @@ class Expense(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null = True, related_name = "expenses")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["expense_date"]),
+            models.Index(fields=["category"]),
+        ]
+
 
 class Payment(models.Model):
     invoice = models.ForeignKey(
@@ -546,6 +638,80 @@ class Payment(models.Model):
         ]
 
 
+class LedgerEntryKind(models.TextChoices):
+    INVOICE = "INVOICE", "Invoice issued"
+    PAYMENT = "PAYMENT", "Payment received"
+    CREDIT = "CREDIT", "Credit"
+
+
+class ClientLedgerEntry(models.Model):
+    """
+    One line of a client's account, kept in step with Invoice and Payment
+    writes by api/ledger.py. ``balance`` is what the client owes after this
+    entry, in (entry_date, id) order.
+    """
+
+    client = models.ForeignKey(
+        Client, on_delete=models.CASCADE, related_name="ledger_entries"
+    )
+    kind = models.CharField(max_length=20, choices=LedgerEntryKind.choices)
+    invoice = models.OneToOneField(
+        Invoice, on_delete=models.CASCADE, null=True, blank=True, related_name="ledger_entry"
+    )
+    payment = models.OneToOneField(
+        Payment, on_delete=models.CASCADE, null=True, blank=True, related_name="ledger_entry"
+    )
+    entry_date = models.DateField()
+    reference = models.CharField(max_length=100, blank=True, null=True)
+    debit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    credit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["entry_date", "id"]
+        indexes = [
+            models.Index(fields=["client", "entry_date", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.reference or ''} ({self.balance})"
+
+
+class SearchKind(models.TextChoices):
+    INVOICE = "INVOICE", "Invoice"
+    CLIENT = "CLIENT", "Client"
+    CHANTIER = "CHANTIER", "Chantier"
+    ITEM = "ITEM", "Item"
+
+
+class SearchEntry(models.Model):
+    """
+    One searchable record per invoice, client, chantier and item, kept up to
+    date on save by api/search.py. ``text`` is lowercased and unaccented; it
+    is indexed by FTS5 on SQLite and by a trigram GIN index on PostgreSQL.
+    """
+
+    company = models.ForeignKey(
+        CompanyProfile, on_delete=models.CASCADE, related_name="search_entries"
+    )
+    kind = models.CharField(max_length=20, choices=SearchKind.choices)
+    object_id = models.PositiveIntegerField()
+    title = models.CharField(max_length=255)
+    subtitle = models.CharField(max_length=255, blank=True)
+    text = models.TextField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="unique_search_entry"),
+        ]
+        indexes = [
+            models.Index(fields=["company", "kind"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.title}"
+
 
 class ChatMessage(models.Model):
     message = models.TextField()
@@ -679,4 +845,152 @@ class POItem(models.Model):
             self.tax_rate = self.item.tax_rate
             
         self.subtotal = self.quantity * self.unit_price
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+
+class RecurrenceFrequency(models.TextChoices):
+    MONTHLY = "MONTHLY", "Monthly"
+    QUARTERLY = "QUARTERLY", "Quarterly"
+
+
+class RecurringInvoiceTemplate(models.Model):
+    """
+    An invoice issued on a schedule for a chantier (monthly situations de
+    travaux). generate_recurring_invoices_task issues every due template and
+    moves next_run_date forward; see api/recurring.py.
+    """
+
+    chantier = models.ForeignKey(
+        Chantier, on_delete=models.CASCADE, related_name="recurring_invoices"
+    )
+    client = models.ForeignKey(
+        Client, on_delete=models.CASCADE, related_name="recurring_invoices"
+    )
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, related_name="recurring_invoices"
+    )
+    Subject = models.CharField(max_length=255, null=True, blank=True)
+    project_description = models.TextField(blank=True, null=True)
+
+    frequency = models.CharField(
+        max_length=20,
+        choices=RecurrenceFrequency.choices,
+        default=RecurrenceFrequency.MONTHLY,
+    )
+    # Clamped to the last day of shorter months
+    day_of_month = models.PositiveSmallIntegerField(
+        default=1, validators=[MinValueValidator(1), MaxValueValidator(31)]
+    )
+    next_run_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    payment_terms_days = models.PositiveSmallIntegerField(default=30)
+    is_active = models.BooleanField(default=True)
+    last_generated_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["is_active", "next_run_date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.chantier} ({self.get_frequency_display()})"
+
+
+class RecurringInvoiceItem(models.Model):
+    template = models.ForeignKey(
+        RecurringInvoiceTemplate, related_name="items", on_delete=models.CASCADE
+    )
+    item = models.ForeignKey(Item, on_delete=models.SET_NULL, null=True, blank=True)
+    item_code = models.CharField(max_length=50, blank=True, null=True)
+    item_name = models.CharField(max_length=255)
+    item_description = models.TextField(blank=True, null=True)
+    unit = models.CharField(max_length=50)
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    unit_price = models.DecimalField(max_digits=12, decimal_places=2)
+    tax_rate = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return self.item_name
+
+
+class BackgroundJobKind(models.TextChoices):
+    INVOICE_CREATE = "INVOICE_CREATE", "Invoice creation"
+    QUOTE_CREATE = "QUOTE_CREATE", "Quote creation"
+    PO_CREATE = "PO_CREATE", "Purchase order creation"
+    INVOICE_IMPORT = "INVOICE_IMPORT", "Invoice import"
+    XLSX_EXPORT = "XLSX_EXPORT", "XLSX export"
+
+
+class BackgroundJobStatus(models.TextChoices):
+    PENDING = "PENDING", "Pending"
+    RUNNING = "RUNNING", "Running"
+    SUCCEEDED = "SUCCEEDED", "Succeeded"
+    FAILED = "FAILED", "Failed"
+
+
+class BackgroundJob(models.Model):
+    """Work handed to Celery on behalf of a user; polled at /api/jobs/<id>/."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=30, choices=BackgroundJobKind.choices)
+    status = models.CharField(
+        max_length=20,
+        choices=BackgroundJobStatus.choices,
+        default=BackgroundJobStatus.PENDING,
+    )
+    created_by = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="background_jobs"
+    )
+    payload = models.JSONField(encoder=DjangoJSONEncoder, default=dict, blank=True)
+    result = models.JSONField(encoder=DjangoJSONEncoder, null=True, blank=True)
+    error = models.JSONField(encoder=DjangoJSONEncoder, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["created_by", "-created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.id} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    The first response to a request carrying an Idempotency-Key header, kept
+    so that retries of the same request replay it instead of creating a
+    second document. response_status is null while the first attempt runs.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="idempotency_keys"
+    )
+    scope = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(encoder=DjangoJSONEncoder, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "scope", "key"], name="unique_idempotency_key"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key}"
@@ -0,0 +1,30 @@
+from rest_framework.pagination import CursorPagination
+
+
+class DefaultCursorPagination(CursorPagination):
+    """
+    Keyset pagination: each page is an indexed range scan on the ordering
+    column instead of an OFFSET, and responses are capped at max_page_size
+    whatever the client asks for.
+
+    The cursor stores the first ordering column, so views must only offer
+    NOT NULL columns in ordering_fields; id is appended as a tiebreaker so
+    rows sharing a value keep a stable order across pages.
+    """
+
+    ordering = "-id"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+    def get_ordering(self, request, queryset, view):
+        ordering = tuple(super().get_ordering(request, queryset, view))
+        if not any(field.lstrip("-") in ("id", "pk") for field in ordering):
+            ordering += ("-id" if ordering[0].startswith("-") else "id",)
+        return ordering
+
+
+class LedgerCursorPagination(DefaultCursorPagination):
+    """Statement lines in booking order, read off the (client, entry_date, id) index."""
+
+    ordering = ("entry_date", "id")
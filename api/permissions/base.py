@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
 from rest_framework.permissions import BasePermission
 
 
@@ -6,3 +8,18 @@ class IsAuthenticatedAndActive(BasePermission):
         return bool(
             request.user and request.user.is_authenticated and request.user.is_active
         )
+
+
+class HasMetricsAccess(BasePermission):
+    """
+    Superusers, or a scraper presenting settings.METRICS_TOKEN
+    in the X-Metrics-Token header.
+    """
+
+    def has_permission(self, request, view):
+        token = settings.METRICS_TOKEN
+        provided = request.headers.get("X-Metrics-Token")
+        if token and provided and constant_time_compare(provided, token):
+            return True
+
+        return bool(request.user and request.user.is_superuser)
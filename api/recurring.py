@@ -0,0 +1,179 @@
+import calendar
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from api.models import (
+    Invoice,
+    InvoiceItem,
+    RecurrenceFrequency,
+    RecurringInvoiceTemplate,
+    SearchKind,
+)
+from api.ledger import ClientLedger
+from api.search import SearchIndex
+from api.services import InvoiceCalculator
+from api.signals import clear_company_analytics
+
+
+MONTHS_PER_PERIOD = {
+    RecurrenceFrequency.MONTHLY: 1,
+    RecurrenceFrequency.QUARTERLY: 3,
+}
+
+
+def next_occurrence(day, frequency, day_of_month):
+    """The run date one period after ``day``, clamped to the end of short months."""
+    month_index = day.month - 1 + MONTHS_PER_PERIOD[frequency]
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return datetime.date(year, month, min(day_of_month, calendar.monthrange(year, month)[1]))
+
+
+class RecurringInvoiceGenerator:
+    """
+    Issues every due recurring invoice in batches of ``batch_size``
+    templates. Each batch is one transaction: templates and their lines are
+    loaded with two queries, numbers are allocated as a block and invoices
+    and lines are written with bulk_create. Templates more than one period
+    behind get one invoice per missed period.
+    """
+
+    def __init__(self, today=None, batch_size=200, on_batch=None):
+        self.today = today or timezone.now().date()
+        self.batch_size = batch_size
+        # Called with the ids of each committed batch, e.g. to queue their PDFs
+        self.on_batch = on_batch
+
+        self.templates = 0
+        self.invoice_ids = []
+        self.company_ids = set()
+
+    def run(self):
+        last_id = 0
+        while True:
+            for attempt in range(3):
+                try:
+                    with transaction.atomic():
+                        batch, invoices = self._generate_batch(last_id)
+                        ids = [invoice.id for invoice in invoices]
+                        if self.on_batch and ids:
+                            transaction.on_commit(lambda ids=ids: self.on_batch(ids))
+                    break
+                except IntegrityError:
+                    # A concurrent create took one of the allocated numbers
+                    if attempt == 2:
+                        raise
+
+            if not batch:
+                break
+
+            last_id = batch[-1].id
+            self.templates += len(batch)
+            self.invoice_ids.extend(ids)
+            self.company_ids.update(template.client.company_id for template in batch)
+
+        for company_id in self.company_ids:
+            clear_company_analytics(company_id)
+
+        return self.report()
+
+    def report(self):
+        return {
+            "templates": self.templates,
+            "invoices": len(self.invoice_ids),
+            "invoice_ids": self.invoice_ids,
+        }
+
+    def _generate_batch(self, last_id):
+        batch = list(
+            RecurringInvoiceTemplate.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(is_active=True, next_run_date__lte=self.today, id__gt=last_id)
+            .select_related("client", "chantier")
+            .prefetch_related("items")
+            .order_by("id")[: self.batch_size]
+        )
+        if not batch:
+            return batch, []
+
+        now = timezone.now()
+        invoices = []
+        lines = []
+        for template in batch:
+            for issued_date in self._due_dates(template):
+                invoice_lines = self._lines(template)
+                invoices.append(self._invoice(template, issued_date, invoice_lines))
+                lines.append(invoice_lines)
+            template.last_generated_at = now
+
+        numbers = Invoice.allocate_invoice_numbers(
+            [invoice.issued_date for invoice in invoices]
+        )
+        for invoice, number in zip(invoices, numbers):
+            invoice.invoice_number = number
+        invoices = Invoice.objects.bulk_create(invoices)
+
+        for invoice, invoice_lines in zip(invoices, lines):
+            for line in invoice_lines:
+                line.invoice = invoice
+        InvoiceItem.objects.bulk_create(
+            [line for invoice_lines in lines for line in invoice_lines], batch_size=1000
+        )
+        ClientLedger.post_invoices(invoices)
+        SearchIndex.reindex(
+            SearchKind.INVOICE, Invoice.objects.filter(id__in=[invoice.id for invoice in invoices])
+        )
+
+        RecurringInvoiceTemplate.objects.bulk_update(
+            batch, ["next_run_date", "is_active", "last_generated_at"]
+        )
+        return batch, invoices
+
+    def _due_dates(self, template):
+        """Dates to invoice, advancing the template past today (or ending it)."""
+        dates = []
+        while template.next_run_date <= self.today:
+            if template.end_date and template.next_run_date > template.end_date:
+                break
+            dates.append(template.next_run_date)
+            template.next_run_date = next_occurrence(
+                template.next_run_date, template.frequency, template.day_of_month
+            )
+
+        if template.end_date and template.next_run_date > template.end_date:
+            template.is_active = False
+        return dates
+
+    def _lines(self, template):
+        lines = []
+        for item in template.items.all():
+            line = InvoiceItem(
+                item_id=item.item_id,
+                item_code=item.item_code,
+                item_name=item.item_name,
+                item_description=item.item_description,
+                unit=item.unit,
+                quantity=item.quantity,
+                unit_price=item.unit_price,
+                tax_rate=item.tax_rate,
+            )
+            line.compute_amounts()
+            lines.append(line)
+        return lines
+
+    def _invoice(self, template, issued_date, lines):
+        totals = InvoiceCalculator.get_line_totals(lines)
+        return Invoice(
+            client_id=template.client_id,
+            chantier_id=template.chantier_id,
+            created_by_id=template.created_by_id,
+            recurring_template=template,
+            Subject=template.Subject,
+            project_description=template.project_description,
+            contract_number=template.chantier.contract_number,
+            issued_date=issued_date,
+            due_date=issued_date + datetime.timedelta(days=template.payment_terms_days),
+            remaining_balance=totals["total_ttc"],
+            amount_in_words=InvoiceCalculator.get_amount_in_words(totals["total_ttc"]),
+            **totals,
+        )
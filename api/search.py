@@ -0,0 +1,209 @@
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import OperationalError, connections, router
+
+from api.models import Chantier, Client, Invoice, Item, SearchEntry, SearchKind
+
+
+FTS_TABLE = "api_searchentry_fts"
+TOKEN = re.compile(r"\w+")
+
+# Aliases whose SQLite has no FTS5 table, learnt from the first failed query
+_fts_tables = {}
+
+# Fields whose change alters an entry; saves touching none of them are skipped
+INDEXED_FIELDS = {
+    SearchKind.INVOICE: {"invoice_number", "Subject", "client", "client_id", "created_by", "created_by_id"},
+    SearchKind.CLIENT: {"company_name", "contact_name", "ice", "email", "company", "company_id"},
+    SearchKind.CHANTIER: {"name", "location", "contract_number", "department", "department_id"},
+    SearchKind.ITEM: {"code", "name", "company", "company_id"},
+}
+
+
+def normalise(value):
+    """Lowercase without accents, so "Résidence" and "residence" match."""
+    decomposed = unicodedata.normalize("NFKD", str(value or ""))
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def _invoice_document(invoice):
+    client = invoice.client
+    return {
+        "company_id": invoice.created_by.company_id if invoice.created_by_id else None,
+        "title": invoice.invoice_number,
+        "subtitle": client.company_name,
+        "text": [invoice.invoice_number, client.company_name, client.ice, invoice.Subject],
+    }
+
+
+def _client_document(client):
+    return {
+        "company_id": client.company_id,
+        "title": client.company_name,
+        "subtitle": client.ice,
+        "text": [client.company_name, client.contact_name, client.ice, client.email],
+    }
+
+
+def _chantier_document(chantier):
+    return {
+        "company_id": chantier.department.company_id if chantier.department_id else None,
+        "title": chantier.name,
+        "subtitle": chantier.location,
+        "text": [chantier.name, chantier.location, chantier.contract_number],
+    }
+
+
+def _item_document(item):
+    return {
+        "company_id": item.company_id,
+        "title": item.name,
+        "subtitle": item.code or "",
+        "text": [item.code, item.name],
+    }
+
+
+SOURCES = {
+    SearchKind.INVOICE: (Invoice, _invoice_document, ["client", "created_by"]),
+    SearchKind.CLIENT: (Client, _client_document, []),
+    SearchKind.CHANTIER: (Chantier, _chantier_document, ["department"]),
+    SearchKind.ITEM: (Item, _item_document, []),
+}
+
+
+class SearchIndex:
+    """
+    Maintains SearchEntry rows (one upsert per save, batched for bulk writes)
+    and answers tenant-scoped searches from the text index of the database:
+    FTS5 ranked by bm25 on SQLite, trigram similarity on PostgreSQL, and a
+    plain LIKE scan elsewhere.
+    """
+
+    @staticmethod
+    def entry(kind, obj):
+        """The unsaved entry for ``obj``, or None when it has no company."""
+        _, document, _ = SOURCES[kind]
+        values = document(obj)
+        if values["company_id"] is None:
+            return None
+        return SearchEntry(
+            company_id=values["company_id"],
+            kind=kind,
+            object_id=obj.pk,
+            title=(values["title"] or "")[:255],
+            subtitle=(values["subtitle"] or "")[:255],
+            text=normalise(" ".join(str(part) for part in values["text"] if part)),
+        )
+
+    @staticmethod
+    def index(kind, objects):
+        entries = [entry for entry in (SearchIndex.entry(kind, obj) for obj in objects) if entry]
+        SearchEntry.objects.bulk_create(
+            entries,
+            batch_size=settings.SEARCH_INDEX_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["kind", "object_id"],
+            update_fields=["company", "title", "subtitle", "text"],
+        )
+        return len(entries)
+
+    @staticmethod
+    def index_client(client):
+        """Index a client and, when its name or ICE changed, the invoices showing them."""
+        entry = SearchIndex.entry(SearchKind.CLIENT, client)
+        previous = (
+            SearchEntry.objects.filter(kind=SearchKind.CLIENT, object_id=client.pk)
+            .values_list("title", "subtitle")
+            .first()
+        )
+        SearchIndex.index(SearchKind.CLIENT, [client])
+        if previous and previous != (entry.title, entry.subtitle):
+            SearchIndex.reindex(SearchKind.INVOICE, Invoice.objects.filter(client=client))
+
+    @staticmethod
+    def reindex(kind, queryset):
+        """Index ``queryset`` in chunks, loading the relations each entry needs."""
+        _, _, related = SOURCES[kind]
+        objects = queryset.select_related(*related).order_by("pk")
+        count = 0
+        chunk = []
+        for obj in objects.iterator(chunk_size=settings.SEARCH_INDEX_BATCH_SIZE):
+            chunk.append(obj)
+            if len(chunk) == settings.SEARCH_INDEX_BATCH_SIZE:
+                count += SearchIndex.index(kind, chunk)
+                chunk = []
+        return count + SearchIndex.index(kind, chunk)
+
+    @staticmethod
+    def rebuild(company):
+        SearchEntry.objects.filter(company=company).delete()
+        return sum(
+            SearchIndex.reindex(kind, queryset)
+            for kind, queryset in [
+                (SearchKind.CLIENT, Client.objects.filter(company=company)),
+                (SearchKind.ITEM, Item.objects.filter(company=company)),
+                (SearchKind.CHANTIER, Chantier.objects.filter(department__company=company)),
+                (SearchKind.INVOICE, Invoice.objects.filter(created_by__company=company)),
+            ]
+        )
+
+    @staticmethod
+    def remove(kind, object_id):
+        SearchEntry.objects.filter(kind=kind, object_id=object_id).delete()
+
+    @staticmethod
+    def search(company_id, query, kinds=None, limit=20):
+        tokens = TOKEN.findall(normalise(query))
+        if not tokens:
+            return []
+
+        connection = connections[router.db_for_read(SearchEntry)]
+        if connection.vendor == "sqlite" and _fts_tables.get(connection.alias, True):
+            try:
+                return SearchIndex._search_fts(connection, company_id, tokens, kinds, limit)
+            except OperationalError:
+                # SQLite built without FTS5: the migration skipped the table
+                _fts_tables[connection.alias] = False
+
+        entries = SearchEntry.objects.using(connection.alias).filter(company_id=company_id)
+        if kinds:
+            entries = entries.filter(kind__in=kinds)
+        # text is already lowercase, so plain LIKE can use the trigram index
+        for token in tokens:
+            entries = entries.filter(text__contains=token)
+
+        if connection.vendor == "postgresql":
+            from django.contrib.postgres.search import TrigramWordSimilarity
+
+            entries = entries.annotate(
+                rank=TrigramWordSimilarity(" ".join(tokens), "text")
+            ).order_by("-rank", "kind", "title")
+        else:
+            entries = entries.order_by("kind", "title")
+
+        return list(entries[:limit])
+
+    @staticmethod
+    def _search_fts(connection, company_id, tokens, kinds, limit):
+        # Every token must match as a prefix; quotes keep FTS syntax out of user input
+        match = " ".join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+        table = connection.ops.quote_name(SearchEntry._meta.db_table)
+        kind_filter = ""
+        params = [match, company_id]
+        if kinds:
+            kind_filter = f"AND entry.kind IN ({', '.join('%s' for _ in kinds)})"
+            params.extend(kinds)
+        params.append(limit)
+
+        return list(
+            SearchEntry.objects.using(connection.alias).raw(
+                f"SELECT entry.* FROM {FTS_TABLE} "
+                f"JOIN {table} AS entry ON entry.id = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s AND entry.company_id = %s {kind_filter} "
+                f"ORDER BY bm25({FTS_TABLE}), entry.kind, entry.title LIMIT %s",
+                params,
+            )
+        )
+
@@ -21,10 +21,100 @@ from api.models import (
     Quote,
     QuoteItem,
     PurchaseOrder, 
-    POItem
+    POItem,
+    BackgroundJob,
+    RecurringInvoiceTemplate,
+    RecurringInvoiceItem,
+    ClientLedgerEntry,
+    SearchEntry,
+    SearchKind,
 )
 from django.db.models import Sum
+from decimal import Decimal
 from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+from api.downloads import download_url, invoice_pdf_name
+
+
+def _comma_separated_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return set()
+    return {part.strip() for part in value.split(",") if part.strip()}
+
+
+class SparseFieldsMixin:
+    """
+    Read requests may pass ``?fields=a,b`` to keep only those top-level fields
+    and ``?expand=x`` to replace a relation id with its nested representation.
+
+    Meta options drive both the output and the queryset plan:
+        select_related_fields / prefetch_related_fields
+            field name -> related lookups needed to render that field
+        expandable_fields
+            field name -> {"serializer": cls, "select_related": [...],
+                           "prefetch_related": [...], "many": bool}
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        requested, expanded = self.get_field_selection(self.context.get("request"))
+
+        for name in expanded:
+            if requested and name not in requested:
+                continue
+            options = self.Meta.expandable_fields[name]
+            self.fields[name] = options["serializer"](
+                read_only=True, many=options.get("many", False)
+            )
+
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+    @classmethod
+    def get_field_selection(cls, request):
+        if request is None or not hasattr(request, "query_params"):
+            return set(), set()
+        if request.method not in SAFE_METHODS:
+            return set(), set()
+
+        expandable = getattr(cls.Meta, "expandable_fields", {})
+        return (
+            _comma_separated_param(request, "fields"),
+            _comma_separated_param(request, "expand") & set(expandable),
+        )
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, request):
+        requested, expanded = cls.get_field_selection(request)
+        meta = cls.Meta
+
+        select_related = []
+        prefetch_related = []
+
+        for name, lookups in getattr(meta, "select_related_fields", {}).items():
+            if not requested or name in requested:
+                select_related.extend(lookups)
+
+        for name, lookups in getattr(meta, "prefetch_related_fields", {}).items():
+            if not requested or name in requested:
+                prefetch_related.extend(lookups)
+
+        for name in expanded:
+            if requested and name not in requested:
+                continue
+            options = meta.expandable_fields[name]
+            select_related.extend(options.get("select_related", []))
+            prefetch_related.extend(options.get("prefetch_related", []))
+
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+
+        return queryset
 
 
 class CompanyOwnerRegistrationSerializer(serializers.Serializer):
@@ -322,7 +412,7 @@ class UserNestedSerializer(serializers.ModelSerializer):
         return instance
 
 
-class EmployeeSerializer(serializers.ModelSerializer):
+class EmployeeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserNestedSerializer()
 
     class Meta:
@@ -336,6 +426,7 @@ class EmployeeSerializer(serializers.ModelSerializer):
             "created_at",
         ]
         read_only_fields = ["id", "created_at"]
+        select_related_fields = {"user": ["user"]}
 
     @transaction.atomic
     def create(self, validated_data):
@@ -453,7 +544,7 @@ class DepartmentAdminSerializer(serializers.ModelSerializer):
         return instance
 
 
-class ClientSerializer(serializers.ModelSerializer):
+class ClientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Client
@@ -580,6 +671,42 @@ class ChantierSerializer(serializers.ModelSerializer):
 
 
 
+class ChantierListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Lightweight list representation: related objects as ids and counts."""
+
+    department_name = serializers.CharField(
+        source="department.name", read_only=True, default=None
+    )
+    client_name = serializers.CharField(
+        source="client.company_name", read_only=True, default=None
+    )
+    responsible_ids = serializers.PrimaryKeyRelatedField(
+        source="responsible", many=True, read_only=True
+    )
+    employee_count = serializers.IntegerField(read_only=True)
+    status = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = Chantier
+        fields = [
+            "id",
+            "name",
+            "location",
+            "contract_number",
+            "contract_date",
+            "department",
+            "department_name",
+            "client",
+            "client_name",
+            "responsible_ids",
+            "employee_count",
+            "start_date",
+            "end_date",
+            "status",
+            "created_at",
+        ]
+
+
 class AttendanceSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -635,15 +762,128 @@ class AttendanceSerializer(serializers.ModelSerializer):
 
         return attrs
 
-    def to_representation(self, instance):
-        data = super().to_representation(instance)
-        data["employee"] = EmployeeSerializer(instance.employee).data
-        data["chantier"] = ChantierSerializer(instance.chantier).data
-        return data
 
+class AttendanceSheetEntrySerializer(serializers.Serializer):
+    employee = serializers.IntegerField(min_value=1)
+    present = serializers.BooleanField(default=False)
+    hours_worked = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=Decimal("0"), default=0
+    )
+
+    def validate(self, attrs):
+        if not attrs["present"] and attrs["hours_worked"] > 0:
+            raise serializers.ValidationError(
+                "Hours worked must be 0 if employee is not present"
+            )
+        return attrs
+
+
+class AttendanceSheetSerializer(serializers.Serializer):
+    """
+    A whole day's attendance for one chantier. Permissions are checked once
+    for the sheet and rows are upserted on (employee, chantier, date).
+    """
+
+    chantier = serializers.PrimaryKeyRelatedField(
+        queryset=Chantier.objects.select_related("department")
+    )
+    date = serializers.DateField()
+    entries = AttendanceSheetEntrySerializer(many=True, allow_empty=False)
+
+    def validate(self, attrs):
+        user = self.context["request"].user
+        chantier = attrs["chantier"]
+        entries = attrs["entries"]
+
+        if not (
+            user.is_superuser or
+            user.role in [UserRole.HR_ADMIN, UserRole.COMPANY_ADMIN]
+        ):
+            raise serializers.ValidationError(
+                "You are not allowed to mark attendance"
+            )
+
+        if user.role == UserRole.HR_ADMIN:
+            if not chantier.responsible.filter(id=user.id).exists():
+                raise serializers.ValidationError(
+                    "You are not responsible for this chantier"
+                )
+
+        company_id = chantier.department.company_id if chantier.department else None
 
+        if user.role == UserRole.COMPANY_ADMIN:
+            if company_id != user.company_id:
+                raise serializers.ValidationError(
+                    "This chantier belongs to a different company"
+                )
 
-class ItemSerializer(serializers.ModelSerializer):
+        employee_ids = [entry["employee"] for entry in entries]
+        if len(employee_ids) != len(set(employee_ids)):
+            raise serializers.ValidationError(
+                {"entries": "Each employee can only appear once per sheet"}
+            )
+
+        known_ids = set(
+            Employee.objects.filter(
+                id__in=employee_ids, user__company_id=company_id
+            ).values_list("id", flat=True)
+        )
+        unknown_ids = sorted(set(employee_ids) - known_ids)
+        if unknown_ids:
+            raise serializers.ValidationError(
+                {"entries": f"Unknown employees for this company: {unknown_ids}"}
+            )
+
+        return attrs
+
+    @transaction.atomic
+    def save(self):
+        chantier = self.validated_data["chantier"]
+        date = self.validated_data["date"]
+        entries = self.validated_data["entries"]
+        employee_ids = [entry["employee"] for entry in entries]
+
+        existing = set(
+            Attendance.objects.filter(
+                chantier=chantier, date=date, employee_id__in=employee_ids
+            ).values_list("employee_id", flat=True)
+        )
+
+        Attendance.objects.bulk_create(
+            [
+                Attendance(
+                    employee_id=entry["employee"],
+                    chantier=chantier,
+                    date=date,
+                    present=entry["present"],
+                    hours_worked=entry["hours_worked"],
+                )
+                for entry in entries
+            ],
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["employee", "chantier", "date"],
+            update_fields=["present", "hours_worked"],
+        )
+
+        self.created_count = len(employee_ids) - len(existing)
+        self.updated_count = len(existing)
+
+        return Attendance.objects.filter(
+            chantier=chantier, date=date, employee_id__in=employee_ids
+        ).order_by("employee_id")
+
+
+class AttendanceEmployeeSerializer(serializers.ModelSerializer):
+    full_name = serializers.CharField(source="user.get_full_name", read_only=True)
+
+    class Meta:
+        model = Employee
+        fields = ["id", "full_name", "cin", "job_title"]
+
+
+
+class ItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Item
@@ -651,12 +891,22 @@ class ItemSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "created_at"]
 
 
-class ExpenseSerializer(serializers.ModelSerializer):
+class ExpenseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Expense
         fields = "__all__"
         read_only_fields = ["id", "created_at", "created_by"]
+        select_related_fields = {
+            "chantier": ["chantier__department", "chantier__client"],
+        }
+        prefetch_related_fields = {
+            "chantier": [
+                "chantier__responsible__department",
+                "chantier__responsible__company",
+                "chantier__employee_assignments__employee__user",
+            ],
+        }
 
     
     def create(self, validated_data):
@@ -671,7 +921,12 @@ class ExpenseSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        data["chantier"] = ChantierSerializer(instance.chantier).data
+        if "chantier" in self.fields:
+            # A page of expenses shares a handful of chantiers: render each once
+            rendered = self.context.setdefault("_rendered_chantiers", {})
+            if instance.chantier_id not in rendered:
+                rendered[instance.chantier_id] = ChantierSerializer(instance.chantier).data
+            data["chantier"] = rendered[instance.chantier_id]
         return data
 
 
@@ -697,7 +952,7 @@ class InvoiceItemSerializer(serializers.ModelSerializer):
         read_only_fields = ["subtotal"]
 
 
-class InvoiceSerializer(serializers.ModelSerializer):
+class InvoiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     download_url = serializers.SerializerMethodField()
     invoice_items = InvoiceItemSerializer(many=True, read_only=True)
     client_name = serializers.CharField(source="client.company_name", read_only=True)
@@ -714,8 +969,23 @@ class InvoiceSerializer(serializers.ModelSerializer):
             "tax_amount",
             "total_ttc",
             "amount_in_words",
-            "remaining_balance"
+            "remaining_balance",
+            "source_quote",
+            "source_purchase_order",
         ]
+        select_related_fields = {"client_name": ["client"]}
+        prefetch_related_fields = {"invoice_items": ["invoice_items"]}
+        expandable_fields = {
+            "client": {"serializer": ClientSerializer, "select_related": ["client"]},
+            "chantier": {
+                "serializer": ChantierMiniSerializer,
+                "select_related": ["chantier__department"],
+            },
+            "created_by": {
+                "serializer": UserNestedSerializer,
+                "select_related": ["created_by"],
+            },
+        }
 
     def validate(self, attrs):
         user = self.context["request"].user
@@ -724,19 +994,10 @@ class InvoiceSerializer(serializers.ModelSerializer):
         return attrs
         
     def get_download_url(self, obj):
-        request = self.context.get("request")
-
         if not obj.invoice_number:
             return None
 
-        filename = f"facture_{obj.invoice_number.replace('/', '_')}.pdf"
-
-        if request:
-            return request.build_absolute_uri(
-                f"{settings.MEDIA_URL}invoices/{filename}"
-            )
-
-        return f"{settings.MEDIA_URL}invoices/{filename}"
+        return download_url(invoice_pdf_name(obj.invoice_number), self.context.get("request"))
 
     @transaction.atomic
     def create(self, validated_data):
@@ -795,16 +1056,18 @@ class InvoiceCreateSerializer(serializers.ModelSerializer):
             "tax_amount",
             "total_ttc",
             "amount_in_words",
+            "source_quote",
+            "source_purchase_order",
         ]
 
     def validate(self, attrs):
-        user = self.context["request"].user
+        user = self.context.get("user") or self.context["request"].user
         if attrs.get("client") and attrs["client"].company != user.company:
             raise serializers.ValidationError("Client does not belong to your company.")
         return attrs
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     payment_method_display = serializers.CharField(
         source="get_payment_method_display", read_only=True
@@ -910,7 +1173,7 @@ class QuoteItemSerializer(serializers.ModelSerializer):
         fields = ["id", "item_id", "item_code", "item_name", "item_description", "unit", "quantity", "unit_price", "subtotal", "tax_rate"]
         read_only_fields = ["subtotal"]
 
-class QuoteSerializer(serializers.ModelSerializer):
+class QuoteSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = QuoteItemSerializer(many=True, read_only=True)
     download_url = serializers.SerializerMethodField()
     client_name = serializers.CharField(source="client.company_name", read_only=True)
@@ -919,11 +1182,20 @@ class QuoteSerializer(serializers.ModelSerializer):
         model = Quote
         fields = "__all__"
         read_only_fields = ["created_by", "subtotal", "total_ht", "total_ttc", "amount_in_words", "tax_amount", "discount_amount"]
+        select_related_fields = {"client_name": ["client"]}
+        prefetch_related_fields = {"items": ["items"]}
+        expandable_fields = {
+            "client": {"serializer": ClientSerializer, "select_related": ["client"]},
+            "chantier": {
+                "serializer": ChantierMiniSerializer,
+                "select_related": ["chantier__department"],
+            },
+        }
 
     def get_download_url(self, obj):
         if not obj.quote_number: return None
         filename = f"devis_{obj.quote_number.replace('/', '_')}.pdf"
-        return f"{settings.MEDIA_URL}quotes/{filename}"
+        return download_url(f"quotes/{filename}", self.context.get("request"))
 
 class QuoteCreateSerializer(serializers.ModelSerializer):
     items = QuoteItemSerializer(many=True) # Nested Write
@@ -942,7 +1214,7 @@ class POItemSerializer(serializers.ModelSerializer):
         fields = ["id", "item_id", "item_code", "item_name", "item_description", "unit", "quantity", "unit_price", "subtotal", "tax_rate"]
         read_only_fields = ["subtotal"]
 
-class POSerializer(serializers.ModelSerializer):
+class POSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = POItemSerializer(many=True, read_only=True)
     download_url = serializers.SerializerMethodField()
     client_name = serializers.CharField(source="client.company_name", read_only=True)
@@ -951,11 +1223,20 @@ class POSerializer(serializers.ModelSerializer):
         model = PurchaseOrder
         fields = "__all__"
         read_only_fields = ["created_by", "subtotal", "total_ht", "total_ttc", "amount_in_words", "tax_amount", "discount_amount"]
+        select_related_fields = {"client_name": ["client"]}
+        prefetch_related_fields = {"items": ["items"]}
+        expandable_fields = {
+            "client": {"serializer": ClientSerializer, "select_related": ["client"]},
+            "chantier": {
+                "serializer": ChantierMiniSerializer,
+                "select_related": ["chantier__department"],
+            },
+        }
 
     def get_download_url(self, obj):
         if not obj.po_number: return None
         filename = f"bc_{obj.po_number.replace('/', '_')}.pdf"
-        return f"{settings.MEDIA_URL}purchase_orders/{filename}"
+        return download_url(f"purchase_orders/{filename}", self.context.get("request"))
 
 class POCreateSerializer(serializers.ModelSerializer):
     items = POItemSerializer(many=True)
@@ -982,3 +1263,162 @@ class POPatchSerializer(serializers.ModelSerializer):
         read_only_fields = [
             "subtotal", "total_ht", "total_ttc", "amount_in_words", "discount_amount", "tax_amount"
         ]
+
+
+class RecurringInvoiceItemSerializer(serializers.ModelSerializer):
+    item_id = serializers.PrimaryKeyRelatedField(
+        queryset=Item.objects.all(), source="item", write_only=True, required=False
+    )
+
+    class Meta:
+        model = RecurringInvoiceItem
+        fields = ["id", "item_id", "item_code", "item_name", "item_description", "unit", "quantity", "unit_price", "tax_rate"]
+
+
+class RecurringInvoiceTemplateSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    items = RecurringInvoiceItemSerializer(many=True)
+    client_name = serializers.CharField(source="client.company_name", read_only=True)
+    chantier_name = serializers.CharField(source="chantier.name", read_only=True)
+
+    class Meta:
+        model = RecurringInvoiceTemplate
+        fields = "__all__"
+        read_only_fields = ["created_by", "last_generated_at", "created_at", "updated_at"]
+        select_related_fields = {"client_name": ["client"], "chantier_name": ["chantier"]}
+        prefetch_related_fields = {"items": ["items"]}
+
+    def validate(self, attrs):
+        company = self.context["request"].user.company
+        client = attrs.get("client")
+        chantier = attrs.get("chantier")
+
+        if client and client.company_id != company.id:
+            raise serializers.ValidationError("Client does not belong to your company.")
+        if chantier and (not chantier.department or chantier.department.company_id != company.id):
+            raise serializers.ValidationError("Chantier does not belong to your company.")
+        for line in attrs.get("items", []):
+            if line.get("item") and line["item"].company_id != company.id:
+                raise serializers.ValidationError("Item does not belong to your company.")
+        if "items" in attrs and not attrs["items"]:
+            raise serializers.ValidationError({"items": "At least one line is required."})
+        return attrs
+
+    @transaction.atomic
+    def create(self, validated_data):
+        items = validated_data.pop("items")
+        template = RecurringInvoiceTemplate.objects.create(**validated_data)
+        RecurringInvoiceItem.objects.bulk_create(
+            RecurringInvoiceItem(template=template, **line) for line in items
+        )
+        return template
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        items = validated_data.pop("items", None)
+        instance = super().update(instance, validated_data)
+        if items is not None:
+            instance.items.all().delete()
+            RecurringInvoiceItem.objects.bulk_create(
+                RecurringInvoiceItem(template=instance, **line) for line in items
+            )
+        return instance
+
+
+class ClientLedgerEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ClientLedgerEntry
+        fields = ["id", "kind", "entry_date", "reference", "invoice", "payment", "debit", "credit", "balance"]
+        read_only_fields = fields
+
+
+class ClientCreditSerializer(serializers.Serializer):
+    amount = serializers.DecimalField(max_digits=14, decimal_places=2, min_value=Decimal("0.01"))
+    entry_date = serializers.DateField()
+    reference = serializers.CharField(max_length=100, required=False, allow_blank=True)
+
+
+class ItemAutocompleteQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=100)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+
+class ItemAutocompleteSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    code = serializers.CharField(allow_null=True)
+    name = serializers.CharField()
+    unit = serializers.CharField()
+    unit_price = serializers.DecimalField(max_digits=12, decimal_places=2)
+    tax_rate = serializers.DecimalField(max_digits=5, decimal_places=2)
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(min_length=2, max_length=100)
+    types = serializers.CharField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=20)
+
+    def validate_types(self, value):
+        kinds = [name.strip().upper() for name in value.split(",") if name.strip()]
+        unknown = set(kinds) - set(SearchKind.values)
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown types: {', '.join(sorted(unknown)).lower()}. "
+                f"Choose from {', '.join(SearchKind.values).lower()}."
+            )
+        return kinds
+
+
+class SearchEntrySerializer(serializers.ModelSerializer):
+    type = serializers.SerializerMethodField()
+    id = serializers.IntegerField(source="object_id")
+
+    class Meta:
+        model = SearchEntry
+        fields = ["type", "id", "title", "subtitle"]
+
+    def get_type(self, obj):
+        return obj.kind.lower()
+
+
+class BackgroundJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BackgroundJob
+        fields = [
+            "id",
+            "kind",
+            "status",
+            "result",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
+
+
+class ExportRangeSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if attrs.get("start") and attrs.get("end") and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("start must be on or before end.")
+        return attrs
+
+
+class DocumentConversionSerializer(serializers.Serializer):
+    MAX_DOCUMENTS = 100
+
+    quotes = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    purchase_orders = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list
+    )
+
+    def validate(self, attrs):
+        count = len(attrs["quotes"]) + len(attrs["purchase_orders"])
+        if not count:
+            raise serializers.ValidationError("Give at least one quote or purchase order.")
+        if count > self.MAX_DOCUMENTS:
+            raise serializers.ValidationError(
+                f"At most {self.MAX_DOCUMENTS} documents can be converted at once."
+            )
+        return attrs
@@ -17,6 +17,35 @@ from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from email.mime.image import MIMEImage
 from django.utils import timezone
+from django.db import transaction
+from num2words import num2words
+from api import metrics
+from django.db.models import DecimalField, F, Sum
+from rest_framework.exceptions import ValidationError
+from api.models import (
+    BackgroundJobKind,
+    Invoice,
+    InvoiceItem,
+    Quote,
+    QuoteItem,
+    QuoteStatus,
+    PurchaseOrder,
+    POItem,
+    POStatus,
+    SearchKind,
+)
+from api.ledger import ClientLedger
+from api.search import SearchIndex
+from api.signals import clear_company_analytics
+from api.downloads import download_url, invoice_pdf_name
+from api.serializers import (
+    InvoiceCreateSerializer,
+    InvoiceSerializer,
+    QuoteCreateSerializer,
+    QuoteSerializer,
+    POCreateSerializer,
+    POSerializer,
+)
 
 
 class InvoiceGenerator:
@@ -105,9 +134,17 @@ class InvoiceCalculator:
 
     @staticmethod
     def get_totals(invoice):
+        return InvoiceCalculator.get_line_totals(invoice.invoice_items.all())
 
-        items = invoice.invoice_items.all()
-        subtotal = sum(i.quantity * i.unit_price for i in items)
+    @staticmethod
+    def get_line_totals(items):
+        """Totals for invoice lines that need not be saved yet (see api/imports.py)."""
+        return InvoiceCalculator.get_subtotal_totals(
+            sum(i.quantity * i.unit_price for i in items)
+        )
+
+    @staticmethod
+    def get_subtotal_totals(subtotal):
 
         retention_rate = Decimal("10.0")
         discount_amount = subtotal * (retention_rate / Decimal("100"))
@@ -129,6 +166,304 @@ class InvoiceCalculator:
             "total_ttc": total_ttc,
         }
 
+    @staticmethod
+    def get_amount_in_words(total_ttc):
+        """Legal amount line printed on documents, e.g. "MILLE DIRHAMS ET 50 CTS TTC"."""
+        dirhams = int(total_ttc)
+        centimes = int(round((total_ttc - dirhams) * 100))
+        dirhams_words = num2words(dirhams, lang="fr")
+
+        if centimes > 0:
+            legal_text = f"{dirhams_words} Dirhams Et {centimes} Cts TTC"
+        else:
+            legal_text = f"{dirhams_words} Dirhams TTC"
+
+        return legal_text.upper()
+
+
+class DocumentCreator:
+    """
+    Validates a create payload and writes the document, its lines and its
+    totals in one transaction. Used by the create endpoints and, for async
+    requests, by create_document_task.
+    """
+
+    CREATE_SERIALIZERS = {
+        BackgroundJobKind.INVOICE_CREATE: InvoiceCreateSerializer,
+        BackgroundJobKind.QUOTE_CREATE: QuoteCreateSerializer,
+        BackgroundJobKind.PO_CREATE: POCreateSerializer,
+    }
+    SERIALIZERS = {
+        BackgroundJobKind.INVOICE_CREATE: InvoiceSerializer,
+        BackgroundJobKind.QUOTE_CREATE: QuoteSerializer,
+        BackgroundJobKind.PO_CREATE: POSerializer,
+    }
+
+    @staticmethod
+    def validate(kind, user, data, request=None):
+        serializer = DocumentCreator.CREATE_SERIALIZERS[kind](
+            data=data, context={"request": request, "user": user}
+        )
+        serializer.is_valid(raise_exception=True)
+        return serializer
+
+    @staticmethod
+    def create(kind, user, data, request=None):
+        serializer = DocumentCreator.validate(kind, user, data, request)
+        creators = {
+            BackgroundJobKind.INVOICE_CREATE: DocumentCreator._create_invoice,
+            BackgroundJobKind.QUOTE_CREATE: DocumentCreator._create_quote,
+            BackgroundJobKind.PO_CREATE: DocumentCreator._create_po,
+        }
+        with transaction.atomic():
+            return creators[kind](serializer, user)
+
+    @staticmethod
+    def represent(kind, document, request=None):
+        return DocumentCreator.SERIALIZERS[kind](document, context={"request": request}).data
+
+    @staticmethod
+    def _create_invoice(serializer, user):
+        items_data = serializer.validated_data.pop("items")
+        invoice = serializer.save(created_by=user)
+
+        for item_data in items_data:
+            InvoiceItem.objects.create(invoice=invoice, **item_data)
+
+        totals = InvoiceCalculator.get_totals(invoice)
+
+        invoice.subtotal = totals["subtotal"]
+        invoice.discount_percentage = totals["discount_percentage"]
+        invoice.discount_amount = totals["discount_amount"]
+        invoice.total_ht = totals["total_ht"]
+        invoice.tax_rate = totals["tax_rate"]
+        invoice.tax_amount = totals["tax_amount"]
+        invoice.total_ttc = totals["total_ttc"]
+        invoice.remaining_balance = totals["total_ttc"]
+        invoice.amount_in_words = InvoiceCalculator.get_amount_in_words(
+            invoice.total_ttc
+        )
+        invoice.save()
+
+        return invoice
+
+    @staticmethod
+    def _create_quote(serializer, user):
+        items_data = serializer.validated_data.pop("items")
+        quote = serializer.save(created_by=user)
+
+        subtotal = 0
+        for item_data in items_data:
+            item = QuoteItem.objects.create(quote=quote, **item_data)
+            subtotal += item.subtotal
+
+        DocumentCreator._apply_totals(quote, subtotal)
+        quote.save()
+
+        return quote
+
+    @staticmethod
+    def _create_po(serializer, user):
+        items_data = serializer.validated_data.pop("items")
+        po = serializer.save(created_by=user)
+
+        subtotal = 0
+        for item_data in items_data:
+            item = POItem.objects.create(purchase_order=po, **item_data)
+            subtotal += item.subtotal
+
+        DocumentCreator._apply_totals(po, subtotal)
+        po.save()
+
+        return po
+
+    @staticmethod
+    def _apply_totals(document, subtotal):
+        for field, value in InvoiceCalculator.get_subtotal_totals(subtotal).items():
+            setattr(document, field, value)
+        document.amount_in_words = InvoiceCalculator.get_amount_in_words(
+            document.total_ttc
+        )
+
+
+class DocumentConverter:
+    """
+    Turns quotes and purchase orders into invoices. Subtotals come from one
+    aggregate query per source table, invoice numbers are allocated as a
+    block, and lines are read with one query per source table and written
+    with bulk_create, so the cost barely moves with the number of lines.
+    Line amounts come from InvoiceItem.compute_amounts(), so they round
+    exactly like a line saved through the model.
+    """
+
+    # Fields copied verbatim from QuoteItem/POItem to InvoiceItem
+    LINE_FIELDS = [
+        "item",
+        "item_code",
+        "item_name",
+        "item_description",
+        "unit",
+        "quantity",
+        "unit_price",
+        "tax_rate",
+    ]
+
+    SOURCES = {
+        "quote": {
+            "model": Quote,
+            "line_model": QuoteItem,
+            "line_fk": "quote",
+            "invoice_fk": "source_quote",
+            "closed_statuses": [QuoteStatus.REJECTED, QuoteStatus.EXPIRED],
+        },
+        "purchase_order": {
+            "model": PurchaseOrder,
+            "line_model": POItem,
+            "line_fk": "purchase_order",
+            "invoice_fk": "source_purchase_order",
+            "closed_statuses": [POStatus.CANCELLED],
+        },
+    }
+
+    @staticmethod
+    def convert(user, quote_ids=(), purchase_order_ids=()):
+        """Return the new invoices, quotes first, each group in the order given."""
+        requested = {"quote": list(quote_ids), "purchase_order": list(purchase_order_ids)}
+
+        with transaction.atomic():
+            sources = {
+                kind: DocumentConverter._load_sources(kind, user, ids)
+                for kind, ids in requested.items()
+            }
+
+            invoices = []
+            for kind, documents in sources.items():
+                invoices.extend(DocumentConverter._build_invoices(kind, user, documents))
+
+            numbers = Invoice.allocate_invoice_numbers(
+                [invoice.issued_date for invoice in invoices]
+            )
+            for invoice, number in zip(invoices, numbers):
+                invoice.invoice_number = number
+            invoices = Invoice.objects.bulk_create(invoices)
+
+            for kind in sources:
+                DocumentConverter._copy_lines(kind, invoices)
+            ClientLedger.post_invoices(invoices)
+            SearchIndex.reindex(
+                SearchKind.INVOICE, Invoice.objects.filter(id__in=[invoice.id for invoice in invoices])
+            )
+
+            if sources["quote"]:
+                Quote.objects.filter(
+                    id__in=[quote.id for quote in sources["quote"]],
+                    status__in=[QuoteStatus.DRAFT, QuoteStatus.SENT],
+                ).update(status=QuoteStatus.ACCEPTED)
+
+        if invoices:
+            clear_company_analytics(user.company_id)
+        return invoices
+
+    @staticmethod
+    def _load_sources(kind, user, ids):
+        if not ids:
+            return []
+
+        config = DocumentConverter.SOURCES[kind]
+        documents = config["model"].objects.select_for_update().filter(id__in=ids)
+        if not user.is_superuser:
+            documents = documents.filter(created_by__company=user.company)
+        by_id = {document.id: document for document in documents}
+
+        errors = []
+        missing = [document_id for document_id in ids if document_id not in by_id]
+        if missing:
+            errors.append(f"Unknown {kind} ids: {', '.join(map(str, missing))}")
+
+        closed = [
+            str(document.id)
+            for document in by_id.values()
+            if document.status in config["closed_statuses"]
+        ]
+        if closed:
+            errors.append(f"Cannot convert closed {kind} ids: {', '.join(closed)}")
+
+        converted = Invoice.objects.filter(
+            **{f"{config['invoice_fk']}_id__in": list(by_id)}
+        ).values_list(f"{config['invoice_fk']}_id", "invoice_number")
+        errors.extend(
+            f"{kind} {source_id} was already converted to invoice {number}"
+            for source_id, number in converted
+        )
+
+        if errors:
+            raise ValidationError({kind: errors})
+        return [by_id[document_id] for document_id in dict.fromkeys(ids)]
+
+    @staticmethod
+    def _build_invoices(kind, user, documents):
+        if not documents:
+            return []
+
+        config = DocumentConverter.SOURCES[kind]
+        line_fk = config["line_fk"]
+        subtotals = dict(
+            config["line_model"].objects.filter(**{f"{line_fk}__in": documents})
+            .values(line_fk)
+            .annotate(
+                subtotal=Sum(
+                    F("quantity") * F("unit_price"),
+                    output_field=DecimalField(max_digits=14, decimal_places=2),
+                )
+            )
+            .values_list(line_fk, "subtotal")
+        )
+
+        today = timezone.now().date()
+        invoices = []
+        for document in documents:
+            totals = InvoiceCalculator.get_subtotal_totals(
+                subtotals.get(document.id) or Decimal("0")
+            )
+            invoice = Invoice(
+                client_id=document.client_id,
+                chantier_id=document.chantier_id,
+                created_by=user,
+                project_description=document.project_description,
+                issued_date=today,
+                remaining_balance=totals["total_ttc"],
+                amount_in_words=InvoiceCalculator.get_amount_in_words(totals["total_ttc"]),
+                **{config["invoice_fk"]: document},
+                **totals,
+            )
+            invoices.append(invoice)
+        return invoices
+
+    @staticmethod
+    def _copy_lines(kind, invoices):
+        config = DocumentConverter.SOURCES[kind]
+        invoice_by_source = {
+            getattr(invoice, f"{config['invoice_fk']}_id"): invoice.id
+            for invoice in invoices
+            if getattr(invoice, f"{config['invoice_fk']}_id")
+        }
+        if not invoice_by_source:
+            return
+
+        fields = [
+            InvoiceItem._meta.get_field(name).attname for name in DocumentConverter.LINE_FIELDS
+        ]
+        lines = []
+        for source_id, *values in (
+            config["line_model"].objects.filter(**{f"{config['line_fk']}__in": invoice_by_source})
+            .order_by(config["line_fk"], "id")
+            .values_list(config["line_fk"], *DocumentConverter.LINE_FIELDS)
+        ):
+            line = InvoiceItem(invoice_id=invoice_by_source[source_id], **dict(zip(fields, values)))
+            line.compute_amounts()
+            lines.append(line)
+        InvoiceItem.objects.bulk_create(lines, batch_size=1000)
+
 
 class EmailSending:
     def __init__(self, invoice):
@@ -144,7 +479,11 @@ class EmailSending:
                 else "N/A"
             ),
             "current_year": timezone.now().year,
-            "payment_url": f"https://tourtra-app.com/invoices/{self.invoice.id}/",
+            # Signed link straight to the PDF: no login, and no worker when offloaded
+            "payment_url": download_url(
+                invoice_pdf_name(self.invoice.invoice_number),
+                max_age=settings.DOWNLOAD_LINK_EMAIL_MAX_AGE,
+            ),
         }
 
     def _prepare_email(self, subject, template_name, context_update):
@@ -175,6 +514,11 @@ class EmailSending:
 
         return email
 
+    def _send(self, email, kind):
+        with metrics.timed("email_send_seconds", kind=kind):
+            email.send()
+        metrics.inc("emails_sent_total", kind=kind)
+
     def send_email_reminder(self, days_left=None):
         subject = f"Reminder: Invoice #{self.invoice.invoice_number} is due soon"
         if days_left:
@@ -184,13 +528,13 @@ class EmailSending:
             subject, "invoice_reminder.html", {"days_left": days_left}
         )
         if email:
-            email.send()
+            self._send(email, "reminder")
 
     def send_thanking_email(self):
         subject = f"Receipt & Thank You: Invoice #{self.invoice.invoice_number} Paid"
         email = self._prepare_email(subject, "thanking_invoice.html", {})
         if email:
-            email.send()
+            self._send(email, "thanking")
 
     def send_pre_due_reminder(self, days_left):
 
@@ -204,7 +548,7 @@ class EmailSending:
 
         email = self._prepare_email(subject, "invoice_reminder.html", context_update)
         if email:
-            email.send()
+            self._send(email, "pre_due_reminder")
             print(
                 f"Pre-due reminder sent for invoice {self.invoice.invoice_number} ({days_left} days remaining)"
             )
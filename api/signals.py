@@ -1,8 +1,14 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.core.cache import cache
 from .models import Invoice, Payment, Expense, Client, Attendance, InvoiceStatus
+from .models import Chantier, Department, Item, SearchKind
 from django.db.models import Sum
+from api import metrics
+from .analytics.timesheet import timesheet_cache_key
+from .ledger import ClientLedger, INVOICE_FIELDS
+from .search import SearchIndex, INDEXED_FIELDS
+from .catalog import CATALOGS, bump_catalog_version
 
 def clear_company_analytics(company_id):
  
@@ -24,7 +30,11 @@ def clear_company_analytics(company_id):
     ]
     
     cache.delete_many(keys_to_clear)
-    print(f"--- [CACHE INVALIDATED] All Analytics for Company {company_id} ---")
+    metrics.inc("analytics_cache_invalidations_total")
+
+
+def clear_attendance_timesheet(chantier_id, day):
+    cache.delete(timesheet_cache_key(chantier_id, day.year, day.month))
 
 @receiver([post_save, post_delete], sender=Invoice)
 def invalidate_invoice_cache(sender, instance, **kwargs):
@@ -46,12 +56,86 @@ def invalidate_client_cache(sender, instance, **kwargs):
     if instance.company:
         clear_company_analytics(instance.company.id)
 
+@receiver(pre_save, sender=Attendance)
+def remember_attendance_timesheet(sender, instance, update_fields=None, **kwargs):
+    # A move to another chantier or month must also clear the timesheet it leaves
+    if instance.pk and (not update_fields or {"chantier", "chantier_id", "date"} & set(update_fields)):
+        instance._previous_timesheet = (
+            Attendance.objects.filter(pk=instance.pk).values_list("chantier_id", "date").first()
+        )
+
 @receiver([post_save, post_delete], sender=Attendance)
 def invalidate_attendance_cache(sender, instance, **kwargs):
    
     if instance.chantier.department and instance.chantier.department.company:
         clear_company_analytics(instance.chantier.department.company.id)
 
+    clear_attendance_timesheet(instance.chantier_id, instance.date)
+    previous = getattr(instance, "_previous_timesheet", None)
+    if previous:
+        clear_attendance_timesheet(*previous)
+
+
+
+@receiver(post_save, sender=Invoice)
+def post_invoice_to_ledger(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields and not INVOICE_FIELDS.intersection(update_fields):
+        return
+    # Invoices are created empty and saved again once their totals are known
+    if created and not instance.total_ttc:
+        return
+    ClientLedger.post_invoice(instance, created=created)
+
+@receiver(post_save, sender=Payment)
+def post_payment_to_ledger(sender, instance, created, **kwargs):
+    ClientLedger.post_payment(instance, created=created)
+
+@receiver(post_delete, sender=Invoice)
+def rebalance_ledger_after_invoice_delete(sender, instance, **kwargs):
+    # The entry itself is removed by the cascade
+    ClientLedger.rebalance({instance.client_id: instance.issued_date})
+
+@receiver(post_delete, sender=Payment)
+def rebalance_ledger_after_payment_delete(sender, instance, **kwargs):
+    ClientLedger.rebalance({instance.invoice.client_id: instance.payment_date})
+
+
+def search_fields_changed(kind, update_fields):
+    return not update_fields or INDEXED_FIELDS[kind].intersection(update_fields)
+
+@receiver(post_save, sender=Invoice)
+def index_invoice(sender, instance, update_fields=None, **kwargs):
+    if search_fields_changed(SearchKind.INVOICE, update_fields):
+        SearchIndex.index(SearchKind.INVOICE, [instance])
+
+@receiver(post_save, sender=Client)
+def index_client(sender, instance, update_fields=None, **kwargs):
+    if search_fields_changed(SearchKind.CLIENT, update_fields):
+        SearchIndex.index_client(instance)
+
+@receiver(post_save, sender=Chantier)
+def index_chantier(sender, instance, update_fields=None, **kwargs):
+    if search_fields_changed(SearchKind.CHANTIER, update_fields):
+        SearchIndex.index(SearchKind.CHANTIER, [instance])
+
+@receiver(post_save, sender=Item)
+def index_item(sender, instance, update_fields=None, **kwargs):
+    if search_fields_changed(SearchKind.ITEM, update_fields):
+        SearchIndex.index(SearchKind.ITEM, [instance])
+
+@receiver([post_save, post_delete], sender=Item)
+@receiver([post_save, post_delete], sender=Client)
+@receiver([post_save, post_delete], sender=Department)
+def bump_catalog(sender, instance, **kwargs):
+    if instance.company_id:
+        bump_catalog_version(CATALOGS[sender], instance.company_id)
+
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=Chantier)
+@receiver(post_delete, sender=Item)
+def remove_from_search(sender, instance, **kwargs):
+    SearchIndex.remove(SearchKind(sender.__name__.upper()), instance.pk)
 
 
 @receiver([post_save, post_delete], sender=Payment)
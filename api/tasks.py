@@ -6,11 +6,36 @@ from weasyprint import HTML
 from num2words import num2words
 from decimal import Decimal
 from .models import Invoice, InvoiceStatus, Quote, QuoteItem, POItem,  PurchaseOrder , QuoteStatus, POStatus
+from .models import BackgroundJob, BackgroundJobKind, BackgroundJobStatus, IdempotencyKey
 from .services import InvoiceCalculator
 from django.utils import timezone
-from .services import EmailSending
+from .services import EmailSending, DocumentCreator
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from .imports import InvoiceImporter, read_rows
+from .exports import EXPORTS
+from .recurring import RecurringInvoiceGenerator
+from django.core.files import File
+import tempfile
 from django.core.cache import cache
 from datetime import timedelta
+from api import metrics
+from .downloads import download_url, invoice_pdf_name
+
+
+def render_invoice_html(invoice):
+    logo_path = os.path.join(
+        settings.BASE_DIR, "static", "assets", "companyLogo.jpg"
+    )
+
+    context = {
+        "invoice": invoice,
+        "company": invoice.created_by.company,
+        "logo_path": logo_path,
+    }
+
+    return render_to_string("pdf/invoice_pdf.html", context)
 
 
 @shared_task(
@@ -25,34 +50,52 @@ def generate_invoice_pdf_task(self, invoice_id):
             id=invoice_id
         )
 
-        logo_path = os.path.join(
-            settings.BASE_DIR, "static", "assets", "companyLogo.jpg"
-        )
+        write_invoice_pdf(invoice)
 
-        context = {
-            "invoice": invoice,
-            "company": invoice.created_by.company,
-            "logo_path": logo_path,
-        }
+        return f"Invoice {invoice.invoice_number} PDF successfully generated."
+
+    except Invoice.DoesNotExist:
+        return f"Error: Invoice ID {invoice_id} not found."
+    except Exception as exc:
+        raise self.retry(exc=exc)
 
-        html_string = render_to_string("pdf/invoice_pdf.html", context)
 
-        pdf_filename = f"facture_{invoice.invoice_number.replace('/', '_')}.pdf"
-        pdf_directory = os.path.join(settings.MEDIA_ROOT, "invoices")
+def write_invoice_pdf(invoice):
+    html_string = render_invoice_html(invoice)
 
-        if not os.path.exists(pdf_directory):
-            os.makedirs(pdf_directory, exist_ok=True)
+    pdf_directory = os.path.join(settings.MEDIA_ROOT, "invoices")
 
-        pdf_path = os.path.join(pdf_directory, pdf_filename)
+    if not os.path.exists(pdf_directory):
+        os.makedirs(pdf_directory, exist_ok=True)
 
+    pdf_path = os.path.join(settings.MEDIA_ROOT, invoice_pdf_name(invoice.invoice_number))
+
+    with metrics.timed("pdf_render_seconds", document="invoice"):
         HTML(string=html_string, base_url=settings.BASE_DIR).write_pdf(pdf_path)
 
-        return f"Invoice {invoice.invoice_number} PDF successfully generated."
+    return pdf_path
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(Exception,),
+    retry_kwargs={"max_retries": 3, "countdown": 10},
+)
+def generate_invoice_pdfs_task(self, invoice_ids):
+    """Render several invoices loaded with one query, e.g. after a batch conversion."""
+    invoices = (
+        Invoice.objects.filter(id__in=invoice_ids)
+        .select_related("client", "created_by__company")
+        .prefetch_related("invoice_items")
+    )
+    rendered = 0
+    for invoice in invoices:
+        write_invoice_pdf(invoice)
+        rendered += 1
+
+    return f"{rendered} invoice PDFs generated."
+
 
-    except Invoice.DoesNotExist:
-        return f"Error: Invoice ID {invoice_id} not found."
-    except Exception as exc:
-        raise self.retry(exc=exc)
 @shared_task(
     blank=True,
     autoretry_for=(Exception,),
@@ -66,11 +109,12 @@ def send_invoice_reminders():
     print("checking for unpaid invoices ...")
     unpaid_invoices = Invoice.objects.filter(
         due_date__lte=today, status=InvoiceStatus.COMPLETED
-    )
+    ).select_related("client")
 
-    print(f"unpaid invoices found {unpaid_invoices}")
+    print(f"unpaid invoices found {unpaid_invoices.count()}")
 
-    for invoice in unpaid_invoices:
+    sent = 0
+    for invoice in unpaid_invoices.iterator(chunk_size=settings.DB_ITERATOR_CHUNK_SIZE):
 
         cache_key = f"reminder_sent_{invoice.id}_{timezone.now().date()}"
 
@@ -79,10 +123,11 @@ def send_invoice_reminders():
             email_sending.send_email_reminder()
 
             cache.set(cache_key, True, 86400)
+            sent += 1
         else:
             print(f"Skipping invoice {invoice.id}: Reminder already sent today.")
 
-    return f"{unpaid_invoices.count()} reminders sent"
+    return f"{sent} reminders sent"
 
 
 @shared_task(autoretry_for=(Exception,), retry_backoff=60)
@@ -95,14 +140,16 @@ def send_invoice_reminders_pre_due():
 
     invoices = Invoice.objects.filter(
         due_date__in=target_dates, status=InvoiceStatus.COMPLETED
-    )
+    ).select_related("client")
 
-    for invoice in invoices:
+    sent = 0
+    for invoice in invoices.iterator(chunk_size=settings.DB_ITERATOR_CHUNK_SIZE):
         days_left = (invoice.due_date - today).days
         email_sending = EmailSending(invoice)
         email_sending.send_pre_due_reminder(days_left)
+        sent += 1
 
-    return f"Sent {invoices.count()} pre-due reminders."
+    return f"Sent {sent} pre-due reminders."
 
 
 @shared_task
@@ -133,7 +180,8 @@ def generate_po_pdf_task(po_id):
         directory = os.path.join(settings.MEDIA_ROOT, "purchase_orders")
         if not os.path.exists(directory): os.makedirs(directory, exist_ok=True)
         
-        HTML(string=html_string, base_url=settings.BASE_DIR).write_pdf(os.path.join(directory, filename))
+        with metrics.timed("pdf_render_seconds", document="purchase_order"):
+            HTML(string=html_string, base_url=settings.BASE_DIR).write_pdf(os.path.join(directory, filename))
         return f"PO {po.po_number} PDF Generated"
     except Exception as e:
         return f"Error: {str(e)}"
@@ -161,7 +209,148 @@ def generate_quote_pdf_task(quote_id):
         directory = os.path.join(settings.MEDIA_ROOT, "quotes")
         if not os.path.exists(directory): os.makedirs(directory, exist_ok=True)
         
-        HTML(string=html_string, base_url=settings.BASE_DIR).write_pdf(os.path.join(directory, filename))
+        with metrics.timed("pdf_render_seconds", document="quote"):
+            HTML(string=html_string, base_url=settings.BASE_DIR).write_pdf(os.path.join(directory, filename))
         return f"Quote {quote.quote_number} PDF Generated"
     except Exception as e:
-        return f"Error: {str(e)}"
\ No newline at end of file
+        return f"Error: {str(e)}"
+
+
+DOCUMENT_PDF_TASKS = {
+    BackgroundJobKind.INVOICE_CREATE: generate_invoice_pdf_task,
+    BackgroundJobKind.QUOTE_CREATE: generate_quote_pdf_task,
+    BackgroundJobKind.PO_CREATE: generate_po_pdf_task,
+}
+
+
+@shared_task
+def create_document_task(job_id):
+    """Create the invoice, quote or PO described by an async create job."""
+    job = BackgroundJob.objects.select_related("created_by__company").get(id=job_id)
+    if job.status != BackgroundJobStatus.PENDING:
+        return f"Job {job_id} already {job.status}"
+
+    job.status = BackgroundJobStatus.RUNNING
+    job.started_at = timezone.now()
+    job.save(update_fields=["status", "started_at"])
+
+    try:
+        with metrics.timed("document_create_seconds", kind=job.kind):
+            document = DocumentCreator.create(job.kind, job.created_by, job.payload)
+    except ValidationError as exc:
+        job.status = BackgroundJobStatus.FAILED
+        job.error = exc.detail
+    except Exception as exc:
+        job.status = BackgroundJobStatus.FAILED
+        job.error = {"detail": str(exc)}
+    else:
+        job.status = BackgroundJobStatus.SUCCEEDED
+        job.result = DocumentCreator.represent(job.kind, document)
+        pdf_task = DOCUMENT_PDF_TASKS[job.kind]
+        transaction.on_commit(lambda: pdf_task.delay(document.id))
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "result", "error", "finished_at"])
+    return f"Job {job_id} {job.status}"
+
+
+@shared_task
+def purge_expired_idempotency_keys():
+    expires_before = timezone.now() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=expires_before).delete()
+    return f"Purged {deleted} idempotency keys"
+
+
+@shared_task
+def generate_recurring_invoices_task():
+    """
+    Issue every due recurring invoice for all companies in one run; each
+    committed batch queues a single PDF task for its invoices.
+    """
+    generator = RecurringInvoiceGenerator(
+        batch_size=settings.RECURRING_INVOICE_BATCH_SIZE,
+        on_batch=generate_invoice_pdfs_task.delay,
+    )
+    with metrics.timed("recurring_invoices_seconds"):
+        report = generator.run()
+
+    metrics.inc("recurring_invoices_total", report["invoices"])
+    return f"{report['invoices']} invoices generated from {report['templates']} templates"
+
+
+@shared_task
+def import_invoices_task(job_id):
+    """Import the CSV/XLSX file uploaded for an INVOICE_IMPORT job."""
+    job = BackgroundJob.objects.select_related("created_by__company").get(id=job_id)
+    if job.status != BackgroundJobStatus.PENDING:
+        return f"Job {job_id} already {job.status}"
+
+    job.status = BackgroundJobStatus.RUNNING
+    job.started_at = timezone.now()
+    job.save(update_fields=["status", "started_at"])
+
+    def progress(report):
+        BackgroundJob.objects.filter(id=job.id).update(result=report)
+
+    path = job.payload["path"]
+    importer = InvoiceImporter(
+        job.created_by,
+        batch_size=settings.INVOICE_IMPORT_BATCH_SIZE,
+        max_errors=settings.INVOICE_IMPORT_MAX_ERRORS,
+    )
+    try:
+        with metrics.timed("invoice_import_seconds"):
+            with default_storage.open(path, "rb") as file:
+                report = importer.run(read_rows(file, job.payload["format"]), progress)
+    except Exception as exc:
+        # Batches written before the failure stay imported; the report says how many
+        job.status = BackgroundJobStatus.FAILED
+        job.error = {"detail": str(exc)}
+        job.result = importer.report()
+    else:
+        job.status = BackgroundJobStatus.SUCCEEDED
+        job.result = report
+    finally:
+        default_storage.delete(path)
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "result", "error", "finished_at"])
+    metrics.inc("invoices_imported_total", importer.created)
+    return f"Job {job_id} {job.status}: {importer.created} created, {importer.failed} failed"
+
+
+@shared_task
+def export_xlsx_task(job_id):
+    """Build the XLSX file for an XLSX_EXPORT job in openpyxl write-only mode."""
+    job = BackgroundJob.objects.select_related("created_by__company").get(id=job_id)
+    if job.status != BackgroundJobStatus.PENDING:
+        return f"Job {job_id} already {job.status}"
+
+    job.status = BackgroundJobStatus.RUNNING
+    job.started_at = timezone.now()
+    job.save(update_fields=["status", "started_at"])
+
+    export = EXPORTS[job.payload["dataset"]]
+    start, end = job.payload.get("start"), job.payload.get("end")
+    try:
+        with tempfile.TemporaryFile() as handle:
+            with metrics.timed("export_seconds", dataset=export.name, format="xlsx"):
+                count = export.write_xlsx(handle, job.created_by.company, start, end)
+            handle.seek(0)
+            path = default_storage.save(
+                f"exports/{job.id}/{export.filename(start, end, 'xlsx')}", File(handle)
+            )
+    except Exception as exc:
+        job.status = BackgroundJobStatus.FAILED
+        job.error = {"detail": str(exc)}
+    else:
+        job.status = BackgroundJobStatus.SUCCEEDED
+        job.result = {
+            "rows": count,
+            "path": path,
+            "download_url": download_url(path),
+        }
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "result", "error", "finished_at"])
+    return f"Job {job_id} {job.status}"
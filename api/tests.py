@@ -1,3 +1,2274 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import os
+import shutil
+import tempfile
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import urlsplit
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, resolve
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from django.core.files.uploadedfile import SimpleUploadedFile
+from openpyxl import Workbook, load_workbook
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api import metrics
+from api.metrics import MetricsRegistry
+from api.db_routers import ReplicaRouter, use_replica
+from api.analytics.timesheet import timesheet_cache_key
+from api.catalog import ItemCatalog
+from api.downloads import download_token, invoice_pdf_name
+from api.exports import EXPORTS
+from api.imports import ImportFileError, InvoiceImporter, read_rows
+from api.ledger import ClientLedger
+from api.fast_serializers import (
+    InvoiceValuesSerializer,
+    QuoteValuesSerializer,
+    POValuesSerializer,
+)
+from api.middleware.profiling import QueryProfilingMiddleware, fingerprint
+from api.middleware.replica import ReplicaRoutingMiddleware
+from api.recurring import RecurringInvoiceGenerator, next_occurrence
+from api.search import SearchIndex
+from api import urls as api_urls
+from api.urls import router
+from api.services import DocumentConverter, EmailSending
+from api.models import (
+    BackgroundJob,
+    BackgroundJobKind,
+    BackgroundJobStatus,
+    User,
+    UserRole,
+    CompanyProfile,
+    Department,
+    Client,
+    Employee,
+    EmployeeWorkingContract,
+    EmployeeEOSB,
+    Chantier,
+    ChantierAssignment,
+    Attendance,
+    Item,
+    Invoice,
+    InvoiceItem,
+    InvoiceStatus,
+    Expense,
+    ExpenseCategory,
+    Payment,
+    PaymentMethod,
+    Quote,
+    QuoteItem,
+    QuoteStatus,
+    PurchaseOrder,
+    POItem,
+    ClientLedgerEntry,
+    IdempotencyKey,
+    LedgerEntryKind,
+    RecurrenceFrequency,
+    RecurringInvoiceItem,
+    RecurringInvoiceTemplate,
+    SearchEntry,
+    SearchKind,
+)
+from api.pagination import DefaultCursorPagination
+from api.renderers import ORJSONRenderer
+from api.serializers import InvoiceSerializer, QuoteSerializer, POSerializer
+from api.tasks import (
+    create_document_task,
+    export_xlsx_task,
+    generate_recurring_invoices_task,
+    import_invoices_task,
+    send_invoice_reminders,
+    send_invoice_reminders_pre_due,
+)
+
+
+LOCMEM_CACHE = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+def create_tenant(invoices=5, lines=3, employees=5, days=3):
+    company = CompanyProfile.objects.create(
+        name="Test BTP",
+        address="Casablanca",
+        phone="+212600000000",
+        email="contact@test-btp.ma",
+        ice="000000000000001",
+    )
+    admin = User.objects.create_user(
+        email="admin@test-btp.ma",
+        password="password123",
+        first_name="Admin",
+        last_name="Test",
+        role=UserRole.COMPANY_ADMIN,
+        company=company,
+    )
+    department = Department.objects.create(name="Gros oeuvre", company=company)
+    hr_admin = User.objects.create_user(
+        email="rh@test-btp.ma",
+        password="password123",
+        first_name="RH",
+        last_name="Test",
+        role=UserRole.HR_ADMIN,
+        company=company,
+        department=department,
+    )
+    chantier = Chantier.objects.create(
+        name="Résidence Atlas",
+        location="Rabat",
+        department=department,
+        start_date=datetime.date(2026, 1, 1),
+    )
+    chantier.responsible.add(hr_admin)
+    clients = [
+        Client.objects.create(
+            company=company,
+            company_name=f"Client {index}",
+            contact_name="Contact",
+            ice=f"00000000000010{index}",
+            phone="+212600000001",
+        )
+        for index in range(3)
+    ]
+    item = Item.objects.create(
+        company=company,
+        code="CIM-01",
+        name="Ciment",
+        unit_price=Decimal("10.50"),
+        unit="sac",
+        tax_rate=20,
+    )
+
+    tenant = SimpleNamespace(
+        company=company,
+        admin=admin,
+        hr_admin=hr_admin,
+        department=department,
+        chantier=chantier,
+        clients=clients,
+        item=item,
+    )
+    add_documents(tenant, invoices, lines)
+    add_workforce(tenant, employees, days)
+    return tenant
+
+
+def add_documents(tenant, count, lines):
+    """Invoices (with a payment and an expense each), quotes and purchase orders."""
+    offset = Invoice.objects.count()
+
+    def document_kwargs(index):
+        return {
+            "client": tenant.clients[index % len(tenant.clients)],
+            "chantier": tenant.chantier if index % 2 else None,
+            "created_by": tenant.admin,
+            "issued_date": datetime.date(2026, 10, 1),
+        }
+
+    invoices = Invoice.objects.bulk_create(
+        Invoice(
+            invoice_number=f"2026-10-{offset + index:04d}",
+            due_date=datetime.date(2026, 11, 1) if index % 2 else None,
+            **document_kwargs(index),
+        )
+        for index in range(count)
+    )
+    quotes = Quote.objects.bulk_create(
+        Quote(quote_number=f"DV-{offset + index:04d}", **document_kwargs(index))
+        for index in range(count)
+    )
+    purchase_orders = PurchaseOrder.objects.bulk_create(
+        PurchaseOrder(po_number=f"BC-{offset + index:04d}", **document_kwargs(index))
+        for index in range(count)
+    )
+
+    line_kwargs = [
+        {
+            "item": tenant.item,
+            "item_code": tenant.item.code,
+            "item_name": tenant.item.name,
+            "unit": tenant.item.unit,
+            "quantity": Decimal(line + 1),
+            "unit_price": Decimal("10.50"),
+            "subtotal": Decimal(line + 1) * Decimal("10.50"),
+            "tax_rate": Decimal("20"),
+        }
+        for line in range(lines)
+    ]
+    InvoiceItem.objects.bulk_create(
+        InvoiceItem(invoice=invoice, **kwargs)
+        for invoice in invoices
+        for kwargs in line_kwargs
+    )
+    QuoteItem.objects.bulk_create(
+        QuoteItem(quote=quote, **kwargs) for quote in quotes for kwargs in line_kwargs
+    )
+    POItem.objects.bulk_create(
+        POItem(purchase_order=purchase_order, **kwargs)
+        for purchase_order in purchase_orders
+        for kwargs in line_kwargs
+    )
+
+    Payment.objects.bulk_create(
+        Payment(
+            invoice=invoice,
+            amount=Decimal("5.00"),
+            payment_method=PaymentMethod.CASH,
+            payment_date=datetime.date(2026, 10, 2),
+            created_by=tenant.admin,
+        )
+        for invoice in invoices
+    )
+    Expense.objects.bulk_create(
+        Expense(
+            chantier=tenant.chantier,
+            title=f"Achat {offset + index}",
+            category=ExpenseCategory.choices[index % len(ExpenseCategory.choices)][0],
+            amount=Decimal("25.00"),
+            expense_date=datetime.date(2026, 10, 1),
+            created_by=tenant.admin,
+        )
+        for index in range(count)
+    )
+    ClientLedger.rebuild(Client.objects.filter(company=tenant.company))
+    SearchIndex.rebuild(tenant.company)
+
+
+def add_workforce(tenant, count, days):
+    """Employees assigned to the chantier, with a contract and daily attendance."""
+    offset = Employee.objects.count()
+
+    users = User.objects.bulk_create(
+        User(
+            email=f"employe{offset + index}@test-btp.ma",
+            password="!",
+            first_name="Employé",
+            last_name=str(offset + index),
+            role=UserRole.EMPLOYEE,
+            company=tenant.company,
+        )
+        for index in range(count)
+    )
+    employees = Employee.objects.bulk_create(
+        Employee(cin=f"CIN{offset + index}", job_title="Maçon", user=user)
+        for index, user in enumerate(users)
+    )
+    ChantierAssignment.objects.bulk_create(
+        ChantierAssignment(employee=employee, chantier=tenant.chantier)
+        for employee in employees
+    )
+    EmployeeWorkingContract.objects.bulk_create(
+        EmployeeWorkingContract(
+            employee=employee,
+            contract_number=f"CT-{employee.cin}",
+            contract_start_date=datetime.date(2025, 1, 1),
+            job_title="Maçon",
+            salary=Decimal("4000.00"),
+        )
+        for employee in employees
+    )
+    EmployeeEOSB.objects.bulk_create(
+        EmployeeEOSB(
+            employee=employee,
+            last_job_title="Maçon",
+            last_salary=Decimal("4000.00"),
+            hire_date=datetime.date(2025, 1, 1),
+            exit_date=datetime.date(2026, 9, 30),
+            total_years_of_service=Decimal("1.75"),
+            basic_end_of_service_payment=Decimal("3500.00"),
+            net_payment=Decimal("3500.00"),
+        )
+        for employee in employees[::2]
+    )
+    Attendance.objects.bulk_create(
+        Attendance(
+            employee=employee,
+            chantier=tenant.chantier,
+            date=datetime.date(2026, 10, 1) + datetime.timedelta(days=day),
+            present=True,
+            hours_worked=Decimal("8.00"),
+        )
+        for employee in employees
+        for day in range(days)
+    )
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ValuesSerializerParityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = create_tenant()
+
+    def setUp(self):
+        self.request = APIRequestFactory().get("/api/invoices")
+        self.request.query_params = self.request.GET
+
+    def assertParity(self, values_serializer, serializer_class, queryset):
+        context = {"request": self.request}
+        expected = serializer_class(queryset, many=True, context=context).data
+        actual = values_serializer(queryset, context=context).data
+
+        self.assertEqual(len(actual), queryset.count())
+        self.assertEqual(
+            JSONRenderer().render(actual), JSONRenderer().render(expected)
+        )
+
+    def test_invoice_list_matches_serializer(self):
+        self.assertParity(
+            InvoiceValuesSerializer,
+            InvoiceSerializer,
+            Invoice.objects.order_by("-created_at"),
+        )
+
+    def test_quote_list_matches_serializer(self):
+        self.assertParity(
+            QuoteValuesSerializer, QuoteSerializer, Quote.objects.order_by("-created_at")
+        )
+
+    def test_po_list_matches_serializer(self):
+        self.assertParity(
+            POValuesSerializer,
+            POSerializer,
+            PurchaseOrder.objects.order_by("-created_at"),
+        )
+
+    def test_sparse_fields_match_serializer(self):
+        self.request = APIRequestFactory().get(
+            "/api/invoices", {"fields": "id,invoice_number,download_url,invoice_items"}
+        )
+        self.request.query_params = self.request.GET
+
+        self.assertParity(
+            InvoiceValuesSerializer, InvoiceSerializer, Invoice.objects.order_by("id")
+        )
+
+    def test_expand_falls_back_to_serializer(self):
+        request = APIRequestFactory().get("/api/invoices", {"expand": "client"})
+        request.query_params = request.GET
+
+        self.assertFalse(InvoiceValuesSerializer.supports(request))
+
+    def test_list_endpoints_use_two_queries(self):
+        client = APIClient()
+        client.force_authenticate(self.tenant.admin)
+
+        for url in ("/api/invoices", "/api/quotes/", "/api/po/"):
+            # user lookup is cached on the request; one query for the
+            # parents and one for their lines
+            with self.assertNumQueries(2):
+                response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()), 5)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = create_tenant(invoices=3, lines=1, employees=4, days=2)
+        Item.objects.create(
+            company=cls.tenant.company, name="Sable", unit="t", unit_price=Decimal("300")
+        )
+        Chantier.objects.create(
+            name="Villa Anfa",
+            location="Casablanca",
+            department=cls.tenant.department,
+            start_date=datetime.date(2026, 1, 1),
+            end_date=datetime.date(2026, 12, 31),
+        )
+
+    def routes(self):
+        for prefix, viewset, _ in router.registry:
+            if issubclass(viewset.pagination_class or object, DefaultCursorPagination):
+                yield f"/api/{prefix}/", viewset
+
+    def test_ordering_fields_are_not_nullable(self):
+        for url, viewset in self.routes():
+            model = viewset.serializer_class.Meta.model
+            for field in getattr(viewset, "ordering_fields", ["id"]):
+                with self.subTest(url=url, field=field):
+                    self.assertFalse(model._meta.get_field(field).null)
+
+    def test_every_ordering_walks_every_row_once(self):
+        api = APIClient()
+        api.force_authenticate(self.tenant.admin)
+
+        for url, viewset in self.routes():
+            expected = sorted(
+                row["id"] for row in api.get(url, {"page_size": 200}).json()["results"]
+            )
+            for field in getattr(viewset, "ordering_fields", ["id"]):
+                for ordering in (field, f"-{field}"):
+                    with self.subTest(url=url, ordering=ordering):
+                        seen = []
+                        page = api.get(url, {"ordering": ordering, "page_size": 1})
+                        while True:
+                            self.assertEqual(page.status_code, 200)
+                            seen.extend(row["id"] for row in page.json()["results"])
+                            if not page.json()["next"]:
+                                break
+                            page = api.get(page.json()["next"])
+                        self.assertEqual(sorted(seen), expected)
+
+
+class ORJSONRendererTests(TestCase):
+    def test_matches_drf_json_renderer(self):
+        data = {
+            "amount": Decimal("12.50"),
+            "issued": datetime.date(2026, 10, 1),
+            "created": datetime.datetime(2026, 10, 1, 8, 30, tzinfo=datetime.timezone.utc),
+            "label": gettext_lazy("Facture"),
+            "by_id": {1: "un", 2: "deux"},
+            "lines": ({"name": "Ciment é"}, None, True),
+        }
+
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_none_renders_empty_body(self):
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+
+class MetricsRegistryTests(SimpleTestCase):
+    def test_renders_counters_and_histograms_in_prometheus_format(self):
+        registry = MetricsRegistry(buckets=(0.1, 1.0))
+        registry.inc("emails_sent_total", kind="reminder")
+        registry.inc("emails_sent_total", 2, kind="reminder")
+        registry.observe("pdf_render_seconds", 0.05, document='in"voice')
+        registry.observe("pdf_render_seconds", 0.5, document='in"voice')
+
+        self.assertEqual(
+            registry.render().splitlines(),
+            [
+                "# TYPE emails_sent_total counter",
+                'emails_sent_total{kind="reminder"} 3',
+                "# TYPE pdf_render_seconds histogram",
+                'pdf_render_seconds_bucket{document="in\\"voice",le="0.1"} 1',
+                'pdf_render_seconds_bucket{document="in\\"voice",le="1"} 2',
+                'pdf_render_seconds_bucket{document="in\\"voice",le="+Inf"} 2',
+                'pdf_render_seconds_sum{document="in\\"voice"} 0.55',
+                'pdf_render_seconds_count{document="in\\"voice"} 2',
+            ],
+        )
+
+        registry.reset()
+        self.assertEqual(registry.render(), "\n")
+
+    def test_timed_observes_even_when_the_block_raises(self):
+        with mock.patch.object(metrics, "registry", MetricsRegistry()) as registry:
+            with self.assertRaises(ValueError):
+                with metrics.timed("job_seconds", kind="export"):
+                    raise ValueError
+            _, histograms = registry.snapshot()
+
+        self.assertEqual(histograms[("job_seconds", (("kind", "export"),))]["count"], 1)
+
+
+class QueryProfilingTests(TestCase):
+    def test_fingerprint_collapses_literals_and_in_lists(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM api_item WHERE id = 12 AND name = 'O''Neil'"),
+            "SELECT * FROM api_item WHERE id = ? AND name = ?",
+        )
+        self.assertEqual(
+            fingerprint("SELECT *  FROM api_item\nWHERE id IN (%s, %s, %s)"),
+            "SELECT * FROM api_item WHERE id IN (...)",
+        )
+
+    @override_settings(PROFILING_QUERY_BUDGET=2, PROFILING_DUPLICATE_THRESHOLD=3)
+    def test_reports_queries_in_server_timing_and_flags_duplicates(self):
+        def view(request):
+            for item_id in range(3):
+                list(Item.objects.filter(id=item_id))
+            return HttpResponse()
+
+        middleware = QueryProfilingMiddleware(view)
+        with self.assertLogs("api.profiling", level="WARNING") as logs:
+            response = middleware(RequestFactory().get("/api/items/"))
+
+        self.assertRegex(
+            response["Server-Timing"], r'^db;dur=[\d.]+;desc="3 queries", total;dur=[\d.]+$'
+        )
+        self.assertIn("possible N+1 (3x)", "\n".join(logs.output))
+
+
+@override_settings(METRICS_TOKEN="scraper-token")
+class MetricsEndpointTests(TestCase):
+    def test_requires_the_token_or_a_superuser(self):
+        api = APIClient()
+        self.assertIn(api.get("/api/metrics").status_code, (401, 403))
+        self.assertIn(
+            api.get("/api/metrics", HTTP_X_METRICS_TOKEN="wrong").status_code, (401, 403)
+        )
+
+        response = api.get("/api/metrics", HTTP_X_METRICS_TOKEN="scraper-token")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn("# TYPE db_queries_total counter", response.content.decode())
+
+        admin = User.objects.create_user(
+            email="root@test-btp.ma",
+            password="password123",
+            first_name="Root",
+            last_name="Admin",
+            is_superuser=True,
+        )
+        api.force_authenticate(admin)
+        self.assertEqual(api.get("/api/metrics").status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, METRICS_TOKEN="budget-token")
+class QueryBudgetTests(TestCase):
+    """
+    Every route in api/urls.py answers within a fixed query budget and time
+    limit, and its query count does not move when the tenant grows. A new
+    N+1 fails here instead of in production.
+    """
+
+    MAX_SECONDS = 2.0
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = create_tenant(invoices=10, lines=3, employees=6, days=3)
+        cls.job = BackgroundJob.objects.create(
+            kind=BackgroundJobKind.INVOICE_CREATE, created_by=cls.tenant.admin
+        )
+        cls.template = RecurringInvoiceTemplate.objects.create(
+            chantier=cls.tenant.chantier,
+            client=cls.tenant.clients[0],
+            created_by=cls.tenant.admin,
+            next_run_date=datetime.date(2026, 11, 1),
+        )
+
+    def setUp(self):
+        self.sequence = 0
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def next_number(self, prefix):
+        self.sequence += 1
+        return f"{prefix}-BUDGET-{self.sequence:04d}"
+
+    def endpoints(self):
+        """``(name, method, url, payload, user, max_queries)`` for every route."""
+        tenant = self.tenant
+        admin = tenant.admin
+        invoice = Invoice.objects.order_by("id").first()
+        quote = Quote.objects.order_by("id").first()
+        purchase_order = PurchaseOrder.objects.order_by("id").first()
+        # Conversions take documents no earlier measurement has converted
+        to_convert = Quote.objects.exclude(
+            id__in=Invoice.objects.filter(source_quote__isnull=False).values("source_quote")
+        ).order_by("-id")
+        po_to_convert = PurchaseOrder.objects.exclude(
+            id__in=Invoice.objects.filter(source_purchase_order__isnull=False).values(
+                "source_purchase_order"
+            )
+        ).order_by("-id")
+        payment = Payment.objects.order_by("id").first()
+        employee = Employee.objects.order_by("id").first()
+        contract = EmployeeWorkingContract.objects.order_by("id").first()
+        eosb = EmployeeEOSB.objects.order_by("id").first()
+        assignment = ChantierAssignment.objects.order_by("id").first()
+        attendance = Attendance.objects.order_by("id").first()
+        expense = Expense.objects.order_by("id").first()
+        client = tenant.clients[0]
+        line = {
+            "item_id": tenant.item.id,
+            "item_name": "Ciment",
+            "unit": "sac",
+            "quantity": "2.00",
+            "unit_price": "10.50",
+            "tax_rate": "20.00",
+        }
+        document = {
+            "client": client.id,
+            "chantier": tenant.chantier.id,
+            "issued_date": "2026-10-15",
+            "items": [line, line, line],
+        }
+        sheet = {
+            "chantier": tenant.chantier.id,
+            "date": "2026-10-20",
+            "entries": [
+                {"employee": employee_id, "present": True, "hours_worked": "8.00"}
+                for employee_id in Employee.objects.order_by("id").values_list(
+                    "id", flat=True
+                )[:5]
+            ],
+        }
+
+        pdf_name = invoice_pdf_name(invoice.invoice_number)
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, "invoices"), exist_ok=True)
+        with open(os.path.join(settings.MEDIA_ROOT, pdf_name), "wb") as handle:
+            handle.write(b"%PDF-1.7")
+        upload = SimpleUploadedFile(
+            "factures.csv",
+            f"invoice_ref;issued_date;client;item_code;quantity\n"
+            f"B-1;2026-10-05;{client.ice};{tenant.item.code};2\n".encode(),
+        )
+
+        registration = {
+            "first_name": "Nouveau",
+            "last_name": "Gérant",
+            "email": f"{self.next_number('owner').lower()}@example.ma",
+            "password": "password123",
+            "company_name": "Nouvelle SARL",
+            "company_address": "Tanger",
+            "company_phone": "+212600000002",
+            "company_email": "contact@nouvelle.ma",
+            "ice": "000000000000009",
+        }
+
+        return [
+            ("register company owner", "post", "/api/register/company-owner", registration, None, 5),
+            ("chat ai", "post", "/api/chat-ai", {"message": "TVA sur acompte ?"}, admin, 2),
+            ("invoice list", "get", "/api/invoices", None, admin, 2),
+            ("invoice detail", "get", f"/api/invoices/{invoice.id}/", None, admin, 3),
+            ("invoice create", "post", "/api/invoices", document, admin, 27),
+            ("invoice create async", "post", "/api/invoices?async=true", document, admin, 7),
+            ("job detail", "get", f"/api/jobs/{self.job.id}/", None, admin, 1),
+            ("search", "get", "/api/search?q=client", None, admin, 1),
+            ("invoice pdf", "get", f"/api/invoices/{invoice.id}/pdf", None, admin, 1),
+            ("download", "get", f"/api/downloads/{download_token(pdf_name)}", None, None, 0),
+            ("invoice import", "post", "/api/invoices/import", {"file": upload}, admin, 1),
+            (
+                "invoice convert",
+                "post",
+                "/api/invoices/convert",
+                {"quotes": [to_convert[1].id], "purchase_orders": [po_to_convert[1].id]},
+                admin,
+                28,
+            ),
+            ("quote convert", "post", f"/api/quotes/{to_convert[0].id}/convert", {}, admin, 23),
+            ("po convert", "post", f"/api/po/{po_to_convert[0].id}/convert", {}, admin, 22),
+            ("export csv", "get", "/api/exports/invoices.csv", None, admin, 1),
+            ("export xlsx", "post", "/api/exports/invoices.xlsx", {}, admin, 1),
+            ("invoice update", "patch", f"/api/invoices/{invoice.id}/", {"Subject": "Lot 2"}, admin, 14),
+            ("quote list", "get", "/api/quotes/", None, admin, 2),
+            (
+                "quote create",
+                "post",
+                "/api/quotes/",
+                {**document, "quote_number": self.next_number("DV")},
+                admin,
+                14,
+            ),
+            ("quote update", "patch", f"/api/quotes/{quote.id}/", {"status": "SENT"}, admin, 6),
+            ("po list", "get", "/api/po/", None, admin, 2),
+            (
+                "po create",
+                "post",
+                "/api/po/",
+                {**document, "po_number": self.next_number("BC")},
+                admin,
+                14,
+            ),
+            ("po update", "patch", f"/api/po/{purchase_order.id}/", {"status": "SENT"}, admin, 4),
+            ("dashboard", "get", "/api/dashboard/data", None, admin, 6),
+            ("executive dashboard", "get", "/api/dashboard/executive", None, admin, 9),
+            ("advanced dashboard", "get", "/api/dashboard/advanced", None, admin, 7),
+            ("metrics", "get", "/api/metrics", None, admin, 0),
+            ("profile", "get", "/api/profile", None, admin, 0),
+            ("company details", "get", "/api/company/details", None, admin, 0),
+            ("department admin me", "get", "/api/departments/admins/me", None, tenant.hr_admin, 0),
+            ("hr admins", "get", "/api/hr-deparements/admins", None, admin, 1),
+            (
+                "employees by chantier",
+                "get",
+                f"/api/employee-chantier?chantier_id={tenant.chantier.id}",
+                None,
+                admin,
+                1,
+            ),
+            ("payments", "get", "/api/payments/", None, admin, 1),
+            ("payment detail", "get", f"/api/payments/{payment.id}/", None, admin, 1),
+            ("eosb", "get", "/api/employee-eosb/", None, admin, 1),
+            ("eosb detail", "get", f"/api/employee-eosb/{eosb.id}/", None, admin, 1),
+            ("contracts", "get", "/api/employee-working-contract/", None, admin, 1),
+            (
+                "contract detail",
+                "get",
+                f"/api/employee-working-contract/{contract.id}/",
+                None,
+                admin,
+                1,
+            ),
+            ("departments", "get", "/api/departments/", None, admin, 1),
+            ("department detail", "get", f"/api/departments/{tenant.department.id}/", None, admin, 1),
+            ("department admins", "get", "/api/departments-admins/", None, admin, 1),
+            (
+                "department admin detail",
+                "get",
+                f"/api/departments-admins/{tenant.hr_admin.id}/",
+                None,
+                admin,
+                1,
+            ),
+            ("items", "get", "/api/items/", None, admin, 1),
+            ("item detail", "get", f"/api/items/{tenant.item.id}/", None, admin, 1),
+            ("item autocomplete", "get", "/api/items/autocomplete/?q=cim", None, admin, 1),
+            ("clients", "get", "/api/clients/", None, admin, 1),
+            ("client detail", "get", f"/api/clients/{client.id}/", None, admin, 1),
+            (
+                "client statement",
+                "get",
+                f"/api/clients/{client.id}/statement/?start=2026-10-01",
+                None,
+                admin,
+                4,
+            ),
+            (
+                "client credit",
+                "post",
+                f"/api/clients/{client.id}/credits/",
+                {"amount": "10.00", "entry_date": "2026-10-20"},
+                admin,
+                9,
+            ),
+            ("recurring invoices", "get", "/api/recurring-invoices/", None, admin, 2),
+            (
+                "recurring invoice detail",
+                "get",
+                f"/api/recurring-invoices/{self.template.id}/",
+                None,
+                admin,
+                2,
+            ),
+            ("employees", "get", "/api/employees/", None, admin, 1),
+            ("employee detail", "get", f"/api/employees/{employee.id}/", None, admin, 1),
+            ("chantiers", "get", "/api/chantiers/", None, admin, 2),
+            (
+                "chantiers expanded",
+                "get",
+                "/api/chantiers/?expand=employees",
+                None,
+                admin,
+                7,
+            ),
+            ("chantier detail", "get", f"/api/chantiers/{tenant.chantier.id}/", None, admin, 7),
+            ("assignments", "get", "/api/chantiers-assignments/", None, admin, 1),
+            (
+                "assignment detail",
+                "get",
+                f"/api/chantiers-assignments/{assignment.id}/",
+                None,
+                admin,
+                1,
+            ),
+            ("attendances", "get", "/api/attendances/", None, admin, 1),
+            ("attendance detail", "get", f"/api/attendances/{attendance.id}/", None, admin, 1),
+            ("attendance sheet", "post", "/api/attendances/sheet/", sheet, admin, 7),
+            (
+                "attendance timesheet",
+                "get",
+                f"/api/attendances/timesheet/?chantier={tenant.chantier.id}&month=2026-10",
+                None,
+                admin,
+                2,
+            ),
+            ("expenses", "get", "/api/expenses/", None, admin, 7),
+            ("expense detail", "get", f"/api/expenses/{expense.id}/", None, admin, 7),
+        ]
+
+    def request(self, method, url, payload, user):
+        api_client = APIClient()
+        if user is not None:
+            api_client.force_authenticate(user)
+        cache.clear()
+
+        extra = {"HTTP_X_METRICS_TOKEN": "budget-token"} if url == "/api/metrics" else {}
+        uploads = payload and any(isinstance(value, SimpleUploadedFile) for value in payload.values())
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(api_client, method)(
+                url, payload, format="multipart" if uploads else "json", **extra
+            )
+            body = b"".join(response.streaming_content) if response.streaming else response.content
+            elapsed = time.perf_counter() - started
+
+        self.assertLess(response.status_code, 400, f"{method.upper()} {url}: {body[:300]}")
+        return len(queries), elapsed
+
+    def measure(self):
+        results = {}
+        for name, method, url, payload, user, budget in self.endpoints():
+            results[name] = (budget,) + self.request(method, url, payload, user)
+        return results
+
+    @mock.patch("api.views.client")
+    def test_every_endpoint_has_a_fixed_query_budget(self, openai_client):
+        openai_client.chat.completions.create.return_value = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="Réponse"))]
+        )
+
+        small = self.measure()
+
+        add_documents(self.tenant, 200, 5)
+        add_workforce(self.tenant, 40, 20)
+        large = self.measure()
+
+        for name, (budget, queries, elapsed) in large.items():
+            with self.subTest(endpoint=name):
+                self.assertLessEqual(queries, budget)
+                self.assertEqual(queries, small[name][1], "query count grows with row count")
+                self.assertLess(elapsed, self.MAX_SECONDS)
+
+    def test_every_route_is_in_the_budget_table(self):
+        def routes(patterns, prefix=""):
+            for pattern in patterns:
+                if isinstance(pattern, URLResolver):
+                    yield from routes(pattern.url_patterns, prefix + str(pattern.pattern))
+                elif isinstance(pattern, URLPattern) and pattern.name != "api-root":
+                    yield pattern.name or prefix + str(pattern.pattern)
+
+        covered = set()
+        for _, _, url, *_ in self.endpoints():
+            match = resolve(urlsplit(url).path)
+            covered.add(match.url_name or match.route)
+
+        self.assertEqual(set(routes(api_urls.urlpatterns, "api/")) - covered, set())
+
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DocumentCreationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = create_tenant(invoices=0, lines=0, employees=0, days=0)
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.tenant.admin)
+
+    def payload(self, quantity="2.00"):
+        return {
+            "client": self.tenant.clients[0].id,
+            "issued_date": "2026-10-15",
+            "items": [
+                {
+                    "item_id": self.tenant.item.id,
+                    "item_name": "Ciment",
+                    "unit": "sac",
+                    "quantity": quantity,
+                    "unit_price": "10.50",
+                    "tax_rate": "20.00",
+                }
+            ],
+        }
+
+    def post(self, url, payload, key=None):
+        extra = {"HTTP_IDEMPOTENCY_KEY": key} if key else {}
+        return self.api.post(url, payload, format="json", **extra)
+
+    def test_retry_with_same_key_replays_the_first_response(self):
+        first = self.post("/api/invoices", self.payload(), key="retry-1")
+        second = self.post("/api/invoices", self.payload(), key="retry-1")
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.json()["id"], first.json()["id"])
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(Invoice.objects.count(), 1)
+
+    def test_key_reused_for_a_different_payload_is_rejected(self):
+        quote = {**self.payload(), "quote_number": "DV-REUSE-1"}
+        self.assertEqual(self.post("/api/quotes/", quote, key="reuse-1").status_code, 201)
+        response = self.post("/api/quotes/", {**quote, "project_description": "Lot 2"}, key="reuse-1")
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Quote.objects.count(), 1)
+
+    def test_failed_request_releases_the_key(self):
+        invalid = self.payload()
+        invalid["items"] = []
+        invalid["client"] = None
+        self.assertEqual(self.post("/api/po/", invalid, key="po-1").status_code, 400)
+
+        response = self.post(
+            "/api/po/", {**self.payload(), "po_number": "BC-RETRY-1"}, key="po-1"
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_crashed_request_releases_the_key(self):
+        with mock.patch("api.views.DocumentCreator.create", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                self.post("/api/invoices", self.payload(), key="crash-1")
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        response = self.post("/api/invoices", self.payload(), key="crash-1")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Invoice.objects.count(), 1)
+
+    @mock.patch("api.views.create_document_task")
+    def test_async_creation_returns_a_job(self, task):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post("/api/invoices?async=true", self.payload())
+
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["id"]
+        self.assertTrue(response["Location"].endswith(f"/api/jobs/{job_id}/"))
+        task.delay.assert_called_once_with(job_id)
+        self.assertFalse(Invoice.objects.exists())
+
+        create_document_task(job_id)
+
+        job = self.api.get(f"/api/jobs/{job_id}/").json()
+        invoice = Invoice.objects.get()
+        self.assertEqual(job["status"], BackgroundJobStatus.SUCCEEDED)
+        self.assertEqual(job["result"]["id"], invoice.id)
+        self.assertEqual(invoice.total_ttc, Decimal("22.68"))
+
+    def test_async_payload_is_validated_before_queueing(self):
+        invalid = self.payload()
+        del invalid["items"]
+        response = self.post("/api/invoices", invalid, key=None)
+        self.assertEqual(response.status_code, 400)
+
+        response = self.api.post(
+            "/api/quotes/", invalid, format="json", HTTP_PREFER="respond-async"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(BackgroundJob.objects.exists())
+
+    def test_jobs_are_private_to_their_creator(self):
+        job = BackgroundJob.objects.create(
+            kind=BackgroundJobKind.INVOICE_CREATE, created_by=self.tenant.admin
+        )
+        self.api.force_authenticate(self.tenant.hr_admin)
+
+        self.assertEqual(self.api.get(f"/api/jobs/{job.id}/").status_code, 404)
+
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class InvoiceImportTests(TestCase):
+    HEADER = ["invoice_ref", "issued_date", "client", "chantier", "status", "item_code", "item_name", "unit", "quantity", "unit_price"]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = create_tenant(invoices=0, lines=0, employees=0, days=0)
+
+    def rows(self):
+        client = self.tenant.clients[0]
+        return [
+            self.HEADER,
+            ["A-1", "2026-03-05", client.ice, self.tenant.chantier.name, "Paid", self.tenant.item.code, "", "", "2", ""],
+            ["A-1", "", "", "", "", "", "Transport", "forfait", "1", "100"],
+            ["A-2", "05/03/2026", client.company_name.upper(), "", "", "", "Gravier", "m3", "3,5", "80"],
+            ["A-3", "2026-03-06", "Inconnu SARL", "", "", "NOPE", "", "", "1", ""],
+            ["A-4", "2026-03-07", client.ice, "", "", "", "Sable", "m3", "abc", "10"],
+        ]
+
+    def csv_file(self, rows):
+        text = "\n".join(";".join(str(value) for value in row) for row in rows)
+        return io.BytesIO(text.encode("utf-8-sig"))
+
+    def xlsx_file(self, rows):
+        workbook = Workbook()
+        for row in rows:
+            workbook.active.append(row)
+        handle = io.BytesIO()
+        workbook.save(handle)
+        handle.seek(0)
+        return handle
+
+    def test_csv_import_creates_valid_invoices_and_reports_the_rest(self):
+        importer = InvoiceImporter(self.tenant.admin, batch_size=1)
+        report = importer.run(read_rows(self.csv_file(self.rows()), "csv"))
+
+        self.assertEqual(report["created"], 2)
+        self.assertEqual(report["failed"], 2)
+        self.assertEqual([error["row"] for error in report["errors"]], [5, 6])
+        self.assertIn("Unknown client: Inconnu SARL", report["errors"][0]["errors"])
+        self.assertIn("row 5: Unknown item code: NOPE", report["errors"][0]["errors"])
+        self.assertIn("row 6: quantity is not a number: abc", report["errors"][1]["errors"])
+
+        first, second = Invoice.objects.order_by("id")
+        self.assertEqual([first.invoice_number, second.invoice_number], ["2026-03-0001", "2026-03-0002"])
+        self.assertEqual(first.status, InvoiceStatus.PAID)
+        self.assertEqual(first.remaining_balance, Decimal("0"))
+        self.assertEqual(first.chantier, self.tenant.chantier)
+        self.assertEqual(first.invoice_items.count(), 2)
+        # 2 x 10.50 + 100 = 121, minus 10% retention, plus 20% TVA
+        self.assertEqual(first.total_ttc, Decimal("130.68"))
+        self.assertEqual(second.subtotal, Decimal("280.00"))
+
+    def test_xlsx_import_matches_csv(self):
+        report = InvoiceImporter(self.tenant.admin).run(
+            read_rows(self.xlsx_file(self.rows()), "xlsx")
+        )
+
+        self.assertEqual((report["created"], report["failed"]), (2, 2))
+        self.assertEqual(InvoiceItem.objects.count(), 3)
+
+    def test_missing_columns_reject_the_file(self):
+        with self.assertRaises(ImportFileError):
+            list(read_rows(self.csv_file([["invoice_ref", "client"]]), "csv"))
+
+    def test_file_numbers_must_be_unique(self):
+        rows = [
+            ["invoice_ref", "invoice_number", "issued_date", "client", "item_name", "unit", "quantity", "unit_price"],
+            ["H-1", "FA-2019-001", "2019-01-10", self.tenant.clients[0].ice, "Béton", "m3", "1", "900"],
+            ["H-2", "FA-2019-001", "2019-01-11", self.tenant.clients[0].ice, "Béton", "m3", "1", "900"],
+        ]
+        report = InvoiceImporter(self.tenant.admin).run(read_rows(self.csv_file(rows), "csv"))
+
+        self.assertEqual((report["created"], report["failed"]), (1, 1))
+        self.assertEqual(Invoice.objects.get().invoice_number, "FA-2019-001")
+
+    def test_file_number_taken_by_a_concurrent_create_is_reported(self):
+        rows = [
+            ["invoice_ref", "invoice_number", "issued_date", "client", "item_name", "unit", "quantity", "unit_price"],
+            ["H-1", "FA-2019-002", "2019-01-10", self.tenant.clients[0].ice, "Béton", "m3", "1", "900"],
+            ["H-2", "", "2019-01-11", self.tenant.clients[0].ice, "Béton", "m3", "1", "900"],
+        ]
+        check = InvoiceImporter._without_taken_numbers
+
+        def race(importer, batch):
+            kept = check(importer, batch)
+            if not Invoice.objects.filter(invoice_number="FA-2019-002").exists():
+                Invoice.objects.create(
+                    invoice_number="FA-2019-002",
+                    client=self.tenant.clients[1],
+                    created_by=self.tenant.admin,
+                    issued_date=datetime.date(2019, 1, 10),
+                )
+            return kept
+
+        with mock.patch.object(
+            InvoiceImporter, "_without_taken_numbers", autospec=True, side_effect=race
+        ):
+            report = InvoiceImporter(self.tenant.admin).run(read_rows(self.csv_file(rows), "csv"))
+
+        self.assertEqual((report["created"], report["failed"]), (1, 1))
+        self.assertEqual(report["errors"][0]["row"], 2)
+        self.assertEqual(report["errors"][0]["errors"], ["invoice_number already exists: FA-2019-002"])
+        self.assertEqual(
+            Invoice.objects.get(invoice_number="FA-2019-002").client, self.tenant.clients[1]
+        )
+        self.assertEqual(Invoice.objects.count(), 2)
+
+    @mock.patch("api.views.import_invoices_task")
+    def test_upload_queues_an_import_job(self, task):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        api = APIClient()
+        api.force_authenticate(self.tenant.admin)
+        upload = SimpleUploadedFile("factures.xlsx", self.xlsx_file(self.rows()).read())
+
+        with override_settings(MEDIA_ROOT=media_root):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = api.post("/api/invoices/import", {"file": upload}, format="multipart")
+
+            self.assertEqual(response.status_code, 202)
+            job_id = response.json()["id"]
+            task.delay.assert_called_once_with(job_id)
+
+            import_invoices_task(job_id)
+
+        job = BackgroundJob.objects.get(id=job_id)
+        self.assertEqual(job.status, BackgroundJobStatus.SUCCEEDED)
+        self.assertEqual(job.result["created"], 2)
+        self.assertEqual(len(job.result["errors"]), 2)
+        self.assertFalse(os.listdir(os.path.join(media_root, "imports")))
+
+    def test_upload_rejects_other_formats(self):
+        api = APIClient()
+        api.force_authenticate(self.tenant.admin)
+        upload = SimpleUploadedFile("factures.pdf", b"%PDF")
+
+        response = api.post("/api/invoices/import", {"file": upload}, format="multipart")
+
+        self.assertEqual(response.status_code, 400)
+
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = create_tenant(invoices=4, lines=1, employees=0, days=0)
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.tenant.admin)
+
+    def read_csv(self, url):
+        response = self.api.get(url)
+        self.assertEqual(response.status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            body = b"".join(response.streaming_content).decode("utf-8-sig")
+        return response, body.splitlines(), len(queries)
+
+    def test_csv_streams_rows_in_one_query(self):
+        response, lines, queries = self.read_csv("/api/exports/invoices.csv")
+
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn('filename="invoices.csv"', response["Content-Disposition"])
+        self.assertTrue(lines[0].startswith("invoice_number,issued_date"))
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(queries, 1)
+
+        add_documents(self.tenant, 20, 1)
+        _, lines, queries = self.read_csv("/api/exports/payments.csv")
+        self.assertEqual(len(lines), 25)
+        self.assertEqual(queries, 1)
+
+    def test_csv_filters_by_date_range(self):
+        _, lines, _ = self.read_csv("/api/exports/expenses.csv?start=2026-10-02&end=2026-12-31")
+        self.assertEqual(len(lines), 1)
+
+        response = self.api.get("/api/exports/expenses.csv?start=2026-10-02&end=2026-10-01")
+        self.assertEqual(response.status_code, 400)
+
+    def test_unknown_dataset_is_not_found(self):
+        self.assertEqual(self.api.get("/api/exports/salaries.csv").status_code, 404)
+
+    @mock.patch("api.views.export_xlsx_task")
+    def test_xlsx_export_runs_as_a_job(self, task):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+
+        with override_settings(MEDIA_ROOT=media_root):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.api.post(
+                    "/api/exports/invoices.xlsx", {"start": "2026-10-01"}, format="json"
+                )
+            self.assertEqual(response.status_code, 202)
+            job_id = response.json()["id"]
+            task.delay.assert_called_once_with(job_id)
+
+            export_xlsx_task(job_id)
+
+            job = BackgroundJob.objects.get(id=job_id)
+            self.assertEqual(job.status, BackgroundJobStatus.SUCCEEDED)
+            self.assertEqual(job.result["rows"], 4)
+            self.assertTrue(job.result["path"].endswith("invoices_2026-10-01.xlsx"))
+
+            workbook = load_workbook(os.path.join(media_root, job.result["path"]), read_only=True)
+            rows = list(workbook.active.iter_rows(values_only=True))
+            workbook.close()
+
+            link = job.result["download_url"]
+            self.assertTrue(link.startswith(f"{settings.PUBLIC_BASE_URL}/api/downloads/"))
+            response = APIClient().get(link.removeprefix(settings.PUBLIC_BASE_URL))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                response["Content-Type"],
+                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            )
+            downloaded = load_workbook(io.BytesIO(b"".join(response.streaming_content)))
+            self.assertEqual(downloaded.active["A1"].value, "invoice_number")
+
+        self.assertEqual(rows[0][0], "invoice_number")
+        self.assertEqual(len(rows), 5)
+
+    def test_formula_like_text_is_quoted(self):
+        Expense.objects.create(
+            chantier=self.tenant.chantier,
+            title='=HYPERLINK("http://evil.example","Facture")',
+            category=ExpenseCategory.choices[0][0],
+            amount=Decimal("-12.00"),
+            expense_date=datetime.date(2026, 10, 3),
+            description="@SUM(A1:A2)",
+            created_by=self.tenant.admin,
+        )
+
+        _, lines, _ = self.read_csv("/api/exports/expenses.csv?start=2026-10-03")
+        self.assertEqual(
+            next(csv.reader(lines[1:])),
+            [
+                "2026-10-03",
+                '\'=HYPERLINK("http://evil.example","Facture")',
+                ExpenseCategory.choices[0][0],
+                "-12.00",
+                "Résidence Atlas",
+                "'@SUM(A1:A2)",
+            ],
+        )
+
+        handle = io.BytesIO()
+        EXPORTS["expenses"].write_xlsx(handle, self.tenant.company, start=datetime.date(2026, 10, 3))
+        handle.seek(0)
+        workbook = load_workbook(handle, read_only=True)
+        row = list(workbook.active.iter_rows(min_row=2, values_only=True))[0]
+        workbook.close()
+
+        self.assertEqual(row[1], '\'=HYPERLINK("http://evil.example","Facture")')
+        self.assertEqual(row[3], -12)
+        self.assertEqual(row[5], "'@SUM(A1:A2)")
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+@mock.patch("api.views.generate_invoice_pdfs_task")
+class ConversionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = create_tenant(invoices=2, lines=3, employees=0, days=0)
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.tenant.admin)
+        self.quotes = list(Quote.objects.order_by("id"))
+        self.purchase_orders = list(PurchaseOrder.objects.order_by("id"))
+
+    def convert(self, url, payload=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.api.post(url, payload or {}, format="json")
+        return response, queries
+
+    def test_query_count_does_not_grow_with_lines(self, task):
+        add_documents(self.tenant, 1, 300)
+        large = Quote.objects.latest("id")
+
+        small_response, small_queries = self.convert(f"/api/quotes/{self.quotes[0].id}/convert")
+        large_response, large_queries = self.convert(f"/api/quotes/{large.id}/convert")
+
+        # Lines are written with bulk_create, which splits them into as many
+        # INSERTs as the backend's parameter limit needs (one on PostgreSQL)
+        def line_inserts(queries):
+            table = connection.ops.quote_name(InvoiceItem._meta.db_table)
+            return sum(query["sql"].startswith(f"INSERT INTO {table}") for query in queries)
+
+        self.assertEqual(small_response.status_code, 201)
+        self.assertEqual(large_response.status_code, 201)
+        self.assertEqual(
+            len(small_queries) - line_inserts(small_queries),
+            len(large_queries) - line_inserts(large_queries),
+        )
+        self.assertLessEqual(line_inserts(large_queries), 300 // 50)
+        self.assertEqual(len(large_response.json()["invoice_items"]), 300)
+
+    def test_invoice_copies_lines_and_totals_of_the_quote(self, task):
+        quote = self.quotes[0]
+        response, _ = self.convert(f"/api/quotes/{quote.id}/convert")
+
+        invoice = Invoice.objects.get(id=response.json()["id"])
+        self.assertEqual(invoice.source_quote, quote)
+        self.assertEqual(invoice.client_id, quote.client_id)
+        self.assertEqual(invoice.subtotal, Decimal("63.00"))
+        self.assertEqual(invoice.total_ttc, Decimal("68.04"))
+        self.assertEqual(invoice.remaining_balance, invoice.total_ttc)
+        self.assertEqual(
+            list(invoice.invoice_items.values_list("quantity", "subtotal", "tax_amount", "total")),
+            [
+                (Decimal("1.00"), Decimal("10.50"), Decimal("2.10"), Decimal("12.60")),
+                (Decimal("2.00"), Decimal("21.00"), Decimal("4.20"), Decimal("25.20")),
+                (Decimal("3.00"), Decimal("31.50"), Decimal("6.30"), Decimal("37.80")),
+            ],
+        )
+        quote.refresh_from_db()
+        self.assertEqual(quote.status, QuoteStatus.ACCEPTED)
+
+        # Amounts that need rounding match a line saved through the model
+        quote = self.quotes[1]
+        quote.items.all().delete()
+        for quantity, unit_price, tax_rate in (("0.50", "0.25", "20"), ("0.30", "0.35", "7")):
+            QuoteItem.objects.create(
+                quote=quote,
+                item_name="Main d'oeuvre",
+                unit="h",
+                quantity=Decimal(quantity),
+                unit_price=Decimal(unit_price),
+                tax_rate=Decimal(tax_rate),
+            )
+        response, _ = self.convert(f"/api/quotes/{quote.id}/convert")
+
+        invoice = Invoice.objects.get(id=response.json()["id"])
+        converted = list(invoice.invoice_items.values_list("subtotal", "tax_amount", "total"))
+        self.assertEqual(
+            converted,
+            [
+                (Decimal("0.12"), Decimal("0.02"), Decimal("0.15")),
+                (Decimal("0.10"), Decimal("0.01"), Decimal("0.11")),
+            ],
+        )
+        for line in invoice.invoice_items.all():
+            line.pk = None
+            line.save()
+        saved = invoice.invoice_items.order_by("id").values_list("subtotal", "tax_amount", "total")
+        self.assertEqual(list(saved)[2:], converted)
+
+    def test_document_is_converted_only_once(self, task):
+        url = f"/api/po/{self.purchase_orders[0].id}/convert"
+        self.assertEqual(self.convert(url)[0].status_code, 201)
+        self.assertEqual(self.convert(url)[0].status_code, 400)
+        self.assertEqual(Invoice.objects.filter(source_purchase_order__isnull=False).count(), 1)
+
+    def test_closed_quote_is_rejected(self, task):
+        Quote.objects.filter(id=self.quotes[0].id).update(status=QuoteStatus.REJECTED)
+        response, _ = self.convert(
+            "/api/invoices/convert", {"quotes": [self.quotes[0].id, self.quotes[1].id]}
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Invoice.objects.filter(source_quote__isnull=False).exists())
+        task.delay.assert_not_called()
+
+    def test_batch_conversion_renders_pdfs_in_one_task(self, task):
+        response, _ = self.convert(
+            "/api/invoices/convert",
+            {
+                "quotes": [quote.id for quote in self.quotes],
+                "purchase_orders": [self.purchase_orders[0].id],
+            },
+        )
+
+        self.assertEqual(response.status_code, 201)
+        ids = [invoice["id"] for invoice in response.json()]
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(len(set(invoice["invoice_number"] for invoice in response.json())), 3)
+        task.delay.assert_called_once_with(ids)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RecurringInvoiceTests(TestCase):
+    TODAY = datetime.date(2026, 10, 19)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = create_tenant(invoices=0, lines=0, employees=0, days=0)
+
+    def add_templates(self, count, lines=2, **kwargs):
+        templates = RecurringInvoiceTemplate.objects.bulk_create(
+            RecurringInvoiceTemplate(
+                chantier=self.tenant.chantier,
+                client=self.tenant.clients[index % len(self.tenant.clients)],
+                created_by=self.tenant.admin,
+                **{"next_run_date": datetime.date(2026, 10, 1), **kwargs},
+            )
+            for index in range(count)
+        )
+        RecurringInvoiceItem.objects.bulk_create(
+            RecurringInvoiceItem(
+                template=template,
+                item=self.tenant.item,
+                item_name="Situation de travaux",
+                unit="forfait",
+                quantity=Decimal(line + 1),
+                unit_price=Decimal("1000.00"),
+                tax_rate=Decimal("20"),
+            )
+            for template in templates
+            for line in range(lines)
+        )
+        return templates
+
+    def generate(self, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            report = RecurringInvoiceGenerator(today=self.TODAY, **kwargs).run()
+        return report, len(queries)
+
+    def test_next_occurrence_is_clamped_to_short_months(self):
+        self.assertEqual(
+            next_occurrence(datetime.date(2026, 1, 31), RecurrenceFrequency.MONTHLY, 31),
+            datetime.date(2026, 2, 28),
+        )
+        self.assertEqual(
+            next_occurrence(datetime.date(2026, 2, 28), RecurrenceFrequency.MONTHLY, 31),
+            datetime.date(2026, 3, 31),
+        )
+        self.assertEqual(
+            next_occurrence(datetime.date(2026, 11, 30), RecurrenceFrequency.QUARTERLY, 30),
+            datetime.date(2027, 2, 28),
+        )
+
+    def test_query_count_does_not_grow_with_templates(self):
+        self.add_templates(3)
+        _, few = self.generate()
+        self.add_templates(30, next_run_date=datetime.date(2026, 10, 2), day_of_month=2)
+        report, many = self.generate()
+
+        self.assertEqual(report["invoices"], 30)
+        self.assertEqual(few, many)
+
+        invoice = Invoice.objects.filter(recurring_template__isnull=False).latest("id")
+        self.assertEqual(invoice.subtotal, Decimal("3000.00"))
+        self.assertEqual(invoice.due_date, datetime.date(2026, 11, 1))
+        self.assertEqual(invoice.invoice_items.count(), 2)
+        self.assertEqual(
+            RecurringInvoiceTemplate.objects.filter(next_run_date=datetime.date(2026, 11, 2)).count(),
+            30,
+        )
+
+    def test_missed_periods_are_caught_up_until_the_end_date(self):
+        template, inactive = self.add_templates(
+            2, next_run_date=datetime.date(2026, 8, 1), end_date=datetime.date(2026, 9, 15)
+        )
+        RecurringInvoiceTemplate.objects.filter(id=inactive.id).update(is_active=False)
+        report, _ = self.generate()
+
+        self.assertEqual(report["invoices"], 2)
+        self.assertEqual(
+            list(template.invoices.order_by("issued_date").values_list("issued_date", flat=True)),
+            [datetime.date(2026, 8, 1), datetime.date(2026, 9, 1)],
+        )
+        template.refresh_from_db()
+        self.assertFalse(template.is_active)
+        self.assertFalse(inactive.invoices.exists())
+
+    @override_settings(RECURRING_INVOICE_BATCH_SIZE=2)
+    @mock.patch("api.tasks.generate_invoice_pdfs_task")
+    def test_task_queues_one_pdf_task_per_batch(self, pdf_task):
+        self.add_templates(3)
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_recurring_invoices_task()
+
+        self.assertEqual(pdf_task.delay.call_count, 2)
+        queued = [id for call in pdf_task.delay.call_args_list for id in call.args[0]]
+        self.assertEqual(
+            sorted(queued),
+            sorted(Invoice.objects.values_list("id", flat=True)),
+        )
+
+    def test_templates_are_managed_through_the_api(self):
+        api = APIClient()
+        api.force_authenticate(self.tenant.admin)
+        payload = {
+            "chantier": self.tenant.chantier.id,
+            "client": self.tenant.clients[0].id,
+            "next_run_date": "2026-11-01",
+            "items": [
+                {
+                    "item_id": self.tenant.item.id,
+                    "item_name": "Situation",
+                    "unit": "forfait",
+                    "quantity": "1",
+                    "unit_price": "5000.00",
+                }
+            ],
+        }
+
+        response = api.post("/api/recurring-invoices/", payload, format="json")
+        self.assertEqual(response.status_code, 201)
+        template = RecurringInvoiceTemplate.objects.get(id=response.json()["id"])
+        self.assertEqual(template.created_by, self.tenant.admin)
+        self.assertEqual(template.items.count(), 1)
+
+        response = api.post("/api/recurring-invoices/", {**payload, "items": []}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ClientLedgerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = create_tenant(invoices=0, lines=0, employees=0, days=0)
+        cls.client_a = cls.tenant.clients[0]
+
+    def invoice(self, day, total, client=None):
+        return Invoice.objects.create(
+            client=client or self.client_a,
+            created_by=self.tenant.admin,
+            issued_date=datetime.date(2026, 10, day),
+            total_ttc=Decimal(total),
+        )
+
+    def pay(self, invoice, day, amount):
+        return Payment.objects.create(
+            invoice=invoice,
+            amount=Decimal(amount),
+            payment_method=PaymentMethod.BANK_TRANSFER,
+            payment_date=datetime.date(2026, 10, day),
+        )
+
+    def ledger(self):
+        return list(
+            ClientLedgerEntry.objects.filter(client=self.client_a).values_list(
+                "entry_date", "kind", "debit", "credit", "balance"
+            )
+        )
+
+    def test_balances_follow_writes_and_match_a_rebuild(self):
+        first = self.invoice(5, "1000.00")
+        self.invoice(20, "500.00")
+        payment = self.pay(first, 10, "400.00")
+        self.invoice(2, "200.00")  # backdated
+        payment.amount = Decimal("600.00")
+        payment.save()
+        self.pay(first, 25, "100.00").delete()
+
+        self.assertEqual(
+            [row[4] for row in self.ledger()],
+            [Decimal("200.00"), Decimal("1200.00"), Decimal("600.00"), Decimal("1100.00")],
+        )
+        incremental = self.ledger()
+        ClientLedger.rebuild(Client.objects.filter(id=self.client_a.id))
+        self.assertEqual(self.ledger(), incremental)
+
+    def test_postings_on_one_date_chain_their_balances(self):
+        self.invoice(5, "300.00")
+        with mock.patch.object(ClientLedger, "_lock", wraps=ClientLedger._lock) as lock:
+            for amount in ("50.00", "20.00"):
+                ClientLedger._append(
+                    {},
+                    {
+                        "kind": LedgerEntryKind.CREDIT,
+                        "client_id": self.client_a.id,
+                        "entry_date": datetime.date(2026, 10, 5),
+                        "reference": None,
+                        "debit": Decimal("0"),
+                        "credit": Decimal(amount),
+                    },
+                )
+        lock.assert_called_with([self.client_a.id])
+        self.assertEqual(lock.call_count, 2)
+
+        running = Decimal("0")
+        for _, _, debit, credit, balance in self.ledger():
+            running += debit - credit
+            self.assertEqual(balance, running)
+        self.assertEqual(running, Decimal("230.00"))
+
+    def test_moving_an_entry_locks_both_clients_at_once(self):
+        client_b = self.tenant.clients[1]
+        invoice = self.invoice(5, "300.00", client=client_b)
+        self.invoice(6, "100.00")
+
+        invoice.client = self.client_a
+        with mock.patch.object(ClientLedger, "_lock", wraps=ClientLedger._lock) as lock:
+            ClientLedger.post_invoice(invoice)
+
+        self.assertEqual(lock.call_args_list[0], mock.call({self.client_a.id, client_b.id}))
+        self.assertEqual(ClientLedger.balance_at(client_b.id), Decimal("0"))
+        self.assertEqual(
+            [row[4] for row in self.ledger()], [Decimal("300.00"), Decimal("400.00")]
+        )
+
+    def test_posting_cost_does_not_grow_with_history(self):
+        def post_cost():
+            invoice = self.invoice(15, "100.00")
+            with CaptureQueriesContext(connection) as queries:
+                self.pay(invoice, 16, "10.00")
+            return len(queries)
+
+        short = post_cost()
+        for day in range(1, 29):
+            self.pay(self.invoice(day, "50.00"), day, "5.00")
+        self.assertEqual(post_cost(), short)
+
+    def test_statement_returns_lines_and_balances_for_a_range(self):
+        for day in (1, 3, 5, 7):
+            self.invoice(day, "100.00")
+        self.invoice(4, "999.00", client=self.tenant.clients[1])
+
+        api = APIClient()
+        api.force_authenticate(self.tenant.admin)
+        url = f"/api/clients/{self.client_a.id}/statement/"
+        data = api.get(url, {"start": "2026-10-02", "end": "2026-10-05", "page_size": 1}).json()
+
+        self.assertEqual(data["opening_balance"], "100.00")
+        self.assertEqual(data["closing_balance"], "300.00")
+        self.assertEqual([line["entry_date"] for line in data["results"]], ["2026-10-03"])
+        data = api.get(data["next"]).json()
+        self.assertEqual([line["balance"] for line in data["results"]], ["300.00"])
+
+        response = api.post(
+            f"/api/clients/{self.client_a.id}/credits/",
+            {"amount": "50.00", "entry_date": "2026-10-06", "reference": "Avoir 1"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["balance"], "250.00")
+        self.assertEqual(ClientLedger.balance_at(self.client_a.id), Decimal("350.00"))
+
+    def test_bulk_created_invoices_are_posted(self):
+        add_documents(self.tenant, 1, 2)
+        quote = Quote.objects.get()
+        [invoice] = DocumentConverter.convert(self.tenant.admin, quote_ids=[quote.id])
+
+        entry = ClientLedgerEntry.objects.get(invoice=invoice)
+        self.assertEqual(entry.kind, LedgerEntryKind.INVOICE)
+        self.assertEqual(entry.debit, Decimal("34.02"))
+        self.assertEqual(entry.balance, ClientLedger.balance_at(invoice.client_id))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ItemAutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = create_tenant(invoices=0, lines=0, employees=0, days=0)
+        for code, name in [
+            ("BET-25", "Béton prêt à l'emploi"),
+            ("SAB-01", "Sable fin"),
+            (None, "Sac de ciment blanc"),
+            ("CIM-45", "Ciment Portland"),
+        ]:
+            Item.objects.create(
+                company=cls.tenant.company,
+                code=code,
+                name=name,
+                unit="u",
+                unit_price=Decimal("12.00"),
+                tax_rate=20,
+            )
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.tenant.admin)
+
+    def names(self, q, **params):
+        response = self.api.get("/api/items/autocomplete/", {"q": q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item["name"] for item in response.json()["results"]]
+
+    def test_codes_rank_before_names_and_inner_words(self):
+        self.assertEqual(
+            self.names("cim"), ["Ciment", "Ciment Portland", "Sac de ciment blanc"]
+        )
+        self.assertEqual(self.names("cim", limit=1), ["Ciment"])
+        self.assertEqual(self.names("beton pret"), ["Béton prêt à l'emploi"])
+        self.assertEqual(self.names("cim-4"), ["Ciment Portland"])
+        self.assertEqual(self.names("portland")[0], "Ciment Portland")
+
+        item = self.api.get("/api/items/autocomplete/", {"q": "sab"}).json()["results"][0]
+        self.assertEqual(
+            item,
+            {
+                "id": item["id"],
+                "code": "SAB-01",
+                "name": "Sable fin",
+                "unit": "u",
+                "unit_price": "12.00",
+                "tax_rate": "20.00",
+            },
+        )
+
+    def test_warm_lookups_skip_the_database_until_an_item_changes(self):
+        self.names("sab")
+        with CaptureQueriesContext(connection) as queries:
+            items = ItemCatalog.autocomplete(self.tenant.company.id, "sab")
+        self.assertEqual([item["name"] for item in items], ["Sable fin"])
+        self.assertEqual(len(queries), 0)
+
+        sand = Item.objects.get(code="SAB-01")
+        sand.name = "Gravette"
+        sand.save()
+        self.assertEqual(self.names("sab"), ["Gravette"])
+        sand.delete()
+        self.assertEqual(self.names("sab"), [])
+
+    def test_results_are_scoped_to_the_company(self):
+        other = CompanyProfile.objects.create(
+            name="Autre BTP",
+            address="Fès",
+            phone="+212600000009",
+            email="contact@autre-btp.ma",
+            ice="000000000000002",
+        )
+        Item.objects.create(
+            company=other, code="CIM-99", name="Ciment gris", unit="sac", unit_price=Decimal("9")
+        )
+        self.assertNotIn("Ciment gris", self.names("cim"))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CatalogSnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = create_tenant(invoices=0, lines=0, employees=0, days=0)
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.tenant.admin)
+
+    def test_revalidation_and_repeat_reads_skip_the_database(self):
+        first = self.api.get("/api/items/")
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("Last-Modified", first.headers)
+
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = self.api.get("/api/items/", HTTP_IF_NONE_MATCH=first.headers["ETag"])
+            again = self.api.get("/api/items/")
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.headers["ETag"], first.headers["ETag"])
+        self.assertEqual(again.json(), first.json())
+
+        filtered = self.api.get("/api/items/", {"code": "NONE"})
+        self.assertNotEqual(filtered.headers["ETag"], first.headers["ETag"])
+
+    def test_writes_replace_the_snapshot(self):
+        for url, model, fields in [
+            ("/api/items/", Item, {"name": "Sable", "unit": "t", "unit_price": Decimal("300")}),
+            (
+                "/api/clients/",
+                Client,
+                {"company_name": "Client 9", "contact_name": "Contact", "ice": "000000000000109"},
+            ),
+            ("/api/departments/", Department, {"name": "Second oeuvre"}),
+        ]:
+            with self.subTest(url=url):
+                first = self.api.get(url)
+                model.objects.create(company=self.tenant.company, **fields)
+                response = self.api.get(url, HTTP_IF_NONE_MATCH=first.headers["ETag"])
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()["results"]), len(first.json()["results"]) + 1)
+                self.assertNotEqual(response.headers["ETag"], first.headers["ETag"])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class InvoiceHttpCachingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = create_tenant(invoices=1, lines=2, employees=0, days=0)
+        cls.invoice = Invoice.objects.get()
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.tenant.admin)
+        self.url = f"/api/invoices/{self.invoice.id}/"
+
+    def test_detail_revalidation_skips_the_prefetch(self):
+        etag = self.api.get(self.url).headers["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+
+        expanded = self.api.get(self.url, {"expand": "client"}).headers["ETag"]
+        self.assertNotEqual(expanded, etag)
+
+    def test_detail_etag_follows_payments_lines_and_client(self):
+        def etag():
+            return self.api.get(self.url).headers["ETag"]
+
+        seen = [etag()]
+        Payment.objects.create(
+            invoice=self.invoice,
+            amount=Decimal("1.00"),
+            payment_method=PaymentMethod.CASH,
+            payment_date=datetime.date(2026, 10, 3),
+        )
+        seen.append(etag())
+        InvoiceItem.objects.filter(invoice=self.invoice).first().delete()
+        seen.append(etag())
+        Client.objects.filter(id=self.invoice.client_id).update(company_name="Renommé")
+        seen.append(etag())
+        self.assertEqual(len(set(seen)), 4)
+
+        response = self.api.get(self.url, HTTP_IF_NONE_MATCH=seen[-1])
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_etag_changes_with_the_download_link(self):
+        now = time.time()
+        with mock.patch("api.downloads.time.time", return_value=now):
+            first = self.api.get(self.url)
+        with mock.patch(
+            "api.downloads.time.time", return_value=now + settings.DOWNLOAD_LINK_ROUNDING
+        ):
+            response = self.api.get(self.url, HTTP_IF_NONE_MATCH=first.headers["ETag"])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()["download_url"], first.json()["download_url"])
+
+    def test_pdf_is_served_with_validators_or_offloaded(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        url = f"/api/invoices/{self.invoice.id}/pdf"
+
+        with override_settings(MEDIA_ROOT=media_root):
+            self.assertEqual(self.api.get(url).status_code, 404)
+
+            path = os.path.join(media_root, invoice_pdf_name(self.invoice.invoice_number))
+            os.makedirs(os.path.dirname(path))
+            with open(path, "wb") as handle:
+                handle.write(b"%PDF-1.7")
+
+            response = self.api.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b"".join(response.streaming_content), b"%PDF-1.7")
+            self.assertEqual(response.headers["Cache-Control"], "private, max-age=86400")
+
+            with CaptureQueriesContext(connection) as queries:
+                response = self.api.get(url, HTTP_IF_NONE_MATCH=response.headers["ETag"])
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(len(queries), 1)
+
+            with override_settings(SENDFILE_HEADER="X-Accel-Redirect"):
+                response = self.api.get(url)
+            self.assertEqual(
+                response.headers["X-Accel-Redirect"],
+                f"/protected-media/invoices/facture_{self.invoice.invoice_number}.pdf",
+            )
+            self.assertEqual(response.content, b"")
+
+    def test_other_companies_get_no_validators(self):
+        outsider = User.objects.create_user(
+            email="admin@autre-btp.ma",
+            password="password123",
+            first_name="Autre",
+            last_name="Admin",
+            role=UserRole.COMPANY_ADMIN,
+            company=CompanyProfile.objects.create(
+                name="Autre BTP",
+                address="Fès",
+                phone="+212600000009",
+                email="contact@autre-btp.ma",
+                ice="000000000000002",
+            ),
+        )
+        etag = self.api.get(self.url).headers["ETag"]
+        self.api.force_authenticate(outsider)
+        response = self.api.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.api.get(f"{self.url}pdf").status_code, 403)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DownloadLinkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = create_tenant(invoices=1, lines=1, employees=0, days=0)
+        cls.invoice = Invoice.objects.select_related("client").get()
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.name = invoice_pdf_name(self.invoice.invoice_number)
+        path = os.path.join(media_root, self.name)
+        os.makedirs(os.path.dirname(path))
+        with open(path, "wb") as handle:
+            handle.write(b"%PDF-1.7 facture")
+        self.api = APIClient()
+
+    def test_serialized_link_downloads_without_login_or_queries(self):
+        admin = APIClient()
+        admin.force_authenticate(self.tenant.admin)
+        url = admin.get(f"/api/invoices/{self.invoice.id}/").json()["download_url"]
+        self.assertNotIn("/media/", url)
+        self.assertEqual(admin.get(f"/api/invoices/{self.invoice.id}/").json()["download_url"], url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get(url)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"%PDF-1.7 facture")
+
+    def test_forged_expired_and_escaping_tokens_are_refused(self):
+        token = download_token(self.name)
+        for bad in [
+            "x" + token,
+            download_token(self.name, max_age=-2 * 60 * 60),
+            download_token("../base/settings.py"),
+        ]:
+            with self.subTest(token=bad):
+                self.assertEqual(self.api.get(f"/api/downloads/{bad}").status_code, 404)
+
+    def test_single_byte_ranges(self):
+        url = f"/api/downloads/{download_token(self.name)}"
+
+        response = self.api.get(url, HTTP_RANGE="bytes=1-3")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers["Content-Range"], "bytes 1-3/16")
+        self.assertEqual(b"".join(response.streaming_content), b"PDF")
+
+        response = self.api.get(url, HTTP_RANGE="bytes=-7")
+        self.assertEqual(b"".join(response.streaming_content), b"facture")
+
+        self.assertEqual(self.api.get(url, HTTP_RANGE="bytes=99-").status_code, 416)
+        stale = self.api.get(url, HTTP_RANGE="bytes=1-3", HTTP_IF_RANGE='"old"')
+        self.assertEqual(stale.status_code, 200)
+
+    def test_reminder_emails_link_to_a_signed_download(self):
+        with override_settings(PUBLIC_BASE_URL="https://app.example.ma"):
+            url = EmailSending(self.invoice).common_context["payment_url"]
+        self.assertTrue(url.startswith("https://app.example.ma/api/downloads/"))
+        self.assertEqual(self.api.get(url.removeprefix("https://app.example.ma")).status_code, 200)
+
+    def test_created_invoice_links_to_a_signed_download(self):
+        admin = APIClient()
+        admin.force_authenticate(self.tenant.admin)
+        response = admin.post(
+            "/api/invoices",
+            {
+                "client": self.tenant.clients[0].id,
+                "issued_date": "2026-10-15",
+                "items": [
+                    {
+                        "item_id": self.tenant.item.id,
+                        "item_name": "Ciment",
+                        "unit": "sac",
+                        "quantity": "2.00",
+                        "unit_price": "10.50",
+                        "tax_rate": "20.00",
+                    }
+                ],
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertRegex(response.json()["download_url"], r"^http://testserver/api/downloads/[^/]+$")
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = create_tenant(invoices=2, lines=1, employees=0, days=0)
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.tenant.admin)
+
+    def search(self, q, **params):
+        response = self.api.get("/api/search", {"q": q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(result["type"], result["title"]) for result in response.json()["results"]]
+
+    def test_matches_prefixes_without_accents_across_types(self):
+        self.assertEqual(self.search("resid"), [("chantier", "Résidence Atlas")])
+        self.assertEqual(self.search("cim-01"), [("item", "Ciment")])
+        self.assertCountEqual(
+            self.search("000000000000101"),
+            [("client", "Client 1"), ("invoice", "2026-10-0001")],
+        )
+        self.assertEqual(
+            self.search("000000000000101", types="invoice"), [("invoice", "2026-10-0001")]
+        )
+
+    def test_validates_parameters(self):
+        self.assertEqual(self.api.get("/api/search", {"q": "c"}).status_code, 400)
+        self.assertEqual(
+            self.api.get("/api/search", {"q": "client", "types": "quote"}).status_code, 400
+        )
+
+    def test_results_are_scoped_to_the_company(self):
+        other = CompanyProfile.objects.create(
+            name="Autre BTP",
+            address="Fès",
+            phone="+212600000009",
+            email="contact@autre-btp.ma",
+            ice="000000000000002",
+        )
+        Client.objects.create(
+            company=other, company_name="Client Atlas", contact_name="X", ice="000000000000201"
+        )
+        self.assertEqual(self.search("atlas"), [("chantier", "Résidence Atlas")])
+
+    def test_index_follows_renames_and_deletes(self):
+        client = self.tenant.clients[0]
+        client.company_name = "Société Générale Travaux"
+        client.save()
+        self.assertEqual(
+            self.search("societe"),
+            [("client", "Société Générale Travaux"), ("invoice", "2026-10-0000")],
+        )
+
+        Invoice.objects.get(invoice_number="2026-10-0000").delete()
+        self.tenant.item.delete()
+        self.assertEqual(self.search("societe"), [("client", "Société Générale Travaux")])
+        self.assertFalse(SearchEntry.objects.filter(kind=SearchKind.ITEM).exists())
+
+    def test_search_is_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            SearchIndex.search(self.tenant.company.id, "client")
+        self.assertEqual(len(queries), 1)
+
+    def test_bulk_created_invoices_are_indexed(self):
+        quote = Quote.objects.order_by("id").first()
+        [invoice] = DocumentConverter.convert(self.tenant.admin, quote_ids=[quote.id])
+        self.assertIn(("invoice", invoice.invoice_number), self.search(invoice.invoice_number))
+
+    def test_rebuild_matches_incremental_index(self):
+        def entries():
+            return list(
+                SearchEntry.objects.order_by("kind", "object_id").values_list(
+                    "kind", "object_id", "title", "subtitle", "text"
+                )
+            )
+
+        incremental = entries()
+        SearchIndex.rebuild(self.tenant.company)
+        self.assertEqual(entries(), incremental)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AttendanceTimesheetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = create_tenant(invoices=0, lines=0, employees=1, days=1)
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.tenant.admin)
+
+    def get(self, month):
+        return self.api.get(
+            "/api/attendances/timesheet/", {"chantier": self.tenant.chantier.id, "month": month}
+        )
+
+    def test_rejects_months_outside_the_calendar(self):
+        for month in ("0000-01", "10000-01", "2026-13", "2026-1x"):
+            with self.subTest(month=month):
+                self.assertEqual(self.get(month).status_code, 400)
+
+    def test_moving_an_attendance_clears_the_month_it_leaves(self):
+        self.assertEqual(self.get("2026-10").status_code, 200)
+        october = timesheet_cache_key(self.tenant.chantier.id, 2026, 10)
+        self.assertIsNotNone(cache.get(october))
+
+        attendance = Attendance.objects.get()
+        attendance.date = datetime.date(2026, 11, 5)
+        attendance.save()
+        self.assertIsNone(cache.get(october))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AttendanceApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = create_tenant(invoices=0, lines=0, employees=3, days=2)
+        cls.other_chantier = Chantier.objects.create(
+            name="Villa Anfa",
+            location="Casablanca",
+            department=cls.tenant.department,
+            start_date=datetime.date(2026, 3, 1),
+        )
+        Attendance.objects.create(
+            employee=Employee.objects.order_by("id").first(),
+            chantier=cls.other_chantier,
+            date=datetime.date(2026, 10, 1),
+            present=True,
+            hours_worked=Decimal("4.00"),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.tenant.admin)
+
+    def test_list_side_loads_each_employee_and_chantier_once(self):
+        url = "/api/attendances/?page_size=4"
+        rows = []
+        while url:
+            data = self.api.get(url).json()
+            rows.extend(data["results"])
+
+            for row in data["results"]:
+                self.assertIsInstance(row["employee"], int)
+                self.assertIsInstance(row["chantier"], int)
+            self.assertEqual(
+                sorted(data["employees"]),
+                sorted({str(row["employee"]) for row in data["results"]}),
+            )
+            self.assertEqual(
+                sorted(data["chantiers"]),
+                sorted({str(row["chantier"]) for row in data["results"]}),
+            )
+            for employee_id, employee in data["employees"].items():
+                self.assertEqual(str(employee["id"]), employee_id)
+            for chantier_id, chantier in data["chantiers"].items():
+                self.assertEqual(str(chantier["id"]), chantier_id)
+            url = data["next"]
+
+        self.assertEqual(len(rows), Attendance.objects.count())
+        self.assertEqual(len({row["id"] for row in rows}), len(rows))
+
+    def sheet(self, entries, day="2026-10-05", chantier=None):
+        return self.api.post(
+            "/api/attendances/sheet/",
+            {
+                "chantier": (chantier or self.tenant.chantier).id,
+                "date": day,
+                "entries": entries,
+            },
+            format="json",
+        )
+
+    def entry(self, employee, hours="8.00"):
+        return {"employee": employee.id, "present": hours != "0", "hours_worked": hours}
+
+    def test_sheet_creates_then_updates_rows(self):
+        first, second, third = Employee.objects.order_by("id")
+
+        response = self.sheet([self.entry(first), self.entry(second)])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["created"], response.json()["updated"]), (2, 0))
+
+        response = self.sheet(
+            [self.entry(first, "4.00"), self.entry(second, "0"), self.entry(third)]
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["created"], response.json()["updated"]), (1, 2))
+        self.assertEqual(
+            list(
+                Attendance.objects.filter(date=datetime.date(2026, 10, 5))
+                .order_by("employee_id")
+                .values_list("employee_id", "present", "hours_worked")
+            ),
+            [
+                (first.id, True, Decimal("4.00")),
+                (second.id, False, Decimal("0.00")),
+                (third.id, True, Decimal("8.00")),
+            ],
+        )
+
+    def test_sheet_rejects_duplicate_and_foreign_employees(self):
+        employee = Employee.objects.order_by("id").first()
+        response = self.sheet([self.entry(employee), self.entry(employee, "4.00")])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("entries", response.json())
+
+        outsider = Employee.objects.create(
+            cin="CIN-AUTRE",
+            job_title="Maçon",
+            user=User.objects.create_user(
+                email="employe@autre-btp.ma",
+                password="password123",
+                first_name="Autre",
+                last_name="Employé",
+                role=UserRole.EMPLOYEE,
+                company=CompanyProfile.objects.create(
+                    name="Autre BTP",
+                    address="Fès",
+                    phone="+212600000009",
+                    email="contact@autre-btp.ma",
+                    ice="000000000000002",
+                ),
+            ),
+        )
+        response = self.sheet([self.entry(employee), self.entry(outsider)])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(outsider.id), str(response.json()["entries"]))
+        self.assertFalse(Attendance.objects.filter(date=datetime.date(2026, 10, 5)).exists())
+
+    def test_sheet_requires_a_responsible_hr_admin(self):
+        employee = Employee.objects.order_by("id").first()
+        self.api.force_authenticate(self.tenant.hr_admin)
+        self.assertEqual(self.sheet([self.entry(employee)]).status_code, 200)
+
+        response = self.sheet([self.entry(employee)], chantier=self.other_chantier)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(
+            Attendance.objects.filter(
+                chantier=self.other_chantier, date=datetime.date(2026, 10, 5)
+            ).exists()
+        )
+
+    def test_sheet_clears_analytics_and_timesheet_caches(self):
+        timesheet = self.api.get(
+            "/api/attendances/timesheet/",
+            {"chantier": self.tenant.chantier.id, "month": "2026-10"},
+        )
+        self.assertEqual(timesheet.status_code, 200)
+        october = timesheet_cache_key(self.tenant.chantier.id, 2026, 10)
+        self.assertIsNotNone(cache.get(october))
+        kpi = f"analytics:kpi:{self.tenant.company.id}"
+        cache.set(kpi, {"stale": True})
+
+        self.sheet([self.entry(Employee.objects.order_by("id").first())])
+
+        self.assertIsNone(cache.get(october))
+        self.assertIsNone(cache.get(kpi))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ReminderTaskTests(TestCase):
+    """The reminder tasks stream invoices with their client in a fixed number of queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = create_tenant(invoices=5, lines=1, employees=0, days=0)
+
+    def setUp(self):
+        cache.clear()
+
+    def make_due(self, due_date):
+        Invoice.objects.update(status=InvoiceStatus.COMPLETED, due_date=due_date)
+
+    def count_queries(self, task):
+        with CaptureQueriesContext(connection) as queries:
+            result = task()
+        return len(queries), result
+
+    def test_overdue_reminders_do_not_query_per_invoice(self):
+        self.make_due(datetime.date(2026, 1, 1))
+        small, _ = self.count_queries(send_invoice_reminders)
+
+        cache.clear()
+        add_documents(self.tenant, 20, 1)
+        self.make_due(datetime.date(2026, 1, 1))
+        large, result = self.count_queries(send_invoice_reminders)
+
+        self.assertEqual(small, large)
+        self.assertEqual(result, "25 reminders sent")
+
+    def test_pre_due_reminders_do_not_query_per_invoice(self):
+        in_three_days = timezone.now().date() + datetime.timedelta(days=3)
+        self.make_due(in_three_days)
+        small, _ = self.count_queries(send_invoice_reminders_pre_due)
+
+        add_documents(self.tenant, 20, 1)
+        self.make_due(in_three_days)
+        large, result = self.count_queries(send_invoice_reminders_pre_due)
+
+        self.assertEqual(small, large)
+        self.assertEqual(result, "Sent 25 pre-due reminders.")
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+@mock.patch("api.db_routers.replica_alias", return_value="replica")
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        self.reads = []
+
+        def view(request):
+            self.reads.append(self.router.db_for_read(Invoice))
+            return HttpResponse(status=201 if request.method == "POST" else 200)
+
+        self.view = view
+
+    def call(self, method, path="/api/invoices", token="Bearer a"):
+        extra = {"HTTP_AUTHORIZATION": token} if token else {}
+        ReplicaRoutingMiddleware(self.view)(getattr(self.factory, method)(path, **extra))
+        return self.reads[-1]
+
+    def test_reads_use_primary_outside_use_replica(self, _):
+        self.assertIsNone(self.router.db_for_read(Invoice))
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Invoice), "replica")
+            self.assertEqual(self.router.db_for_write(Invoice), "default")
+
+    def test_falls_back_to_primary_without_replica(self, replica_alias):
+        replica_alias.return_value = None
+        with use_replica():
+            self.assertIsNone(self.router.db_for_read(Invoice))
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaRoutingMiddleware(self.view)
+
+    def test_reads_follow_a_write_to_the_primary(self, _):
+        self.assertEqual(self.call("get"), "replica")
+        self.assertIsNone(self.call("post"))
+
+        self.assertIsNone(self.call("get"))
+        self.assertEqual(self.call("get", token="Bearer b"), "replica")
+        self.assertEqual(self.call("get", token=None), "replica")
+        self.assertEqual(self.call("get", path="/api/dashboard/data"), "replica")
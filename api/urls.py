@@ -28,7 +28,17 @@ from .views import (
     POCreateApiView,
     QuotePatchApiView,
     POPatchApiView,
-    GetEmployeeBasedOnChantier
+    GetEmployeeBasedOnChantier,
+    MetricsView,
+    BackgroundJobDetailView,
+    InvoiceImportApiView,
+    ExportCsvView,
+    ExportXlsxView,
+    DocumentConversionView,
+    RecurringInvoiceTemplateViewSet,
+    SearchView,
+    InvoicePdfView,
+    DownloadView,
 
 )
 
@@ -52,6 +62,11 @@ router.register(
 )
 router.register(r"attendances", AttendanceViewSet, basename="attendances")
 router.register(r"expenses", ExpenseViewSet, basename="expenses")
+router.register(
+    r"recurring-invoices",
+    RecurringInvoiceTemplateViewSet,
+    basename="recurring-invoices",
+)
 
 urlpatterns = [
     path("register/company-owner", CompanyOwnerRegistrationView.as_view()),
@@ -60,11 +75,22 @@ urlpatterns = [
     path("po/", POCreateApiView.as_view()),
     path("quotes/<int:pk>/", QuotePatchApiView.as_view(), name="quote-patch"),
     path("po/<int:pk>/", POPatchApiView.as_view(), name="po-patch"),
+    path("quotes/<int:pk>/convert", DocumentConversionView.as_view(source="quote"), name="quote-convert"),
+    path("po/<int:pk>/convert", DocumentConversionView.as_view(source="purchase_order"), name="po-convert"),
+    path("invoices/import", InvoiceImportApiView.as_view(), name="invoice-import"),
+    path("invoices/convert", DocumentConversionView.as_view(), name="invoice-convert"),
     path("invoices/<int:pk>/", InvoiceDetailApiView.as_view(), name="invoice-detail"),
+    path("invoices/<int:pk>/pdf", InvoicePdfView.as_view(), name="invoice-pdf"),
+    path("downloads/<str:token>", DownloadView.as_view(), name="download"),
     path("dashboard/data", DashboardAnalyticsView.as_view()),
     path("dashboard/executive", ExecutiveDashboardView.as_view()),
     path("dashboard/advanced", AdvancedDashboardView.as_view()),
     path("chat-ai", OpenAiViewSet.as_view()),
+    path("metrics", MetricsView.as_view(), name="metrics"),
+    path("jobs/<uuid:pk>/", BackgroundJobDetailView.as_view(), name="job-detail"),
+    path("search", SearchView.as_view(), name="search"),
+    path("exports/<slug:dataset>.csv", ExportCsvView.as_view(), name="export-csv"),
+    path("exports/<slug:dataset>.xlsx", ExportXlsxView.as_view(), name="export-xlsx"),
     path("profile", UserDetailsUpdateView.as_view(), name="user-profile"),
     path(
         "departments/admins/me",
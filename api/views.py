@@ -20,6 +20,7 @@ from .models import (
     EmployeeEOSB
 )
 from .models import Quote, QuoteItem, PurchaseOrder, POItem
+from .models import BackgroundJob, BackgroundJobKind, RecurringInvoiceTemplate
 from .serializers import (
     CustomTokenObtainPairSerializer,
     CompanyOwnerRegistrationSerializer,
@@ -32,7 +33,11 @@ from .serializers import (
     EmployeeSerializer,
     ChantierAssignmentSerializer,
     ChantierSerializer,
+    ChantierListSerializer,
+    ChantierMiniSerializer,
     AttendanceSerializer,
+    AttendanceEmployeeSerializer,
+    AttendanceSheetSerializer,
     ItemSerializer,
     ExpenseSerializer,
     InvoiceItemSerializer,
@@ -49,7 +54,36 @@ from .serializers import (
     QuoteSerializer,
     QuoteItemSerializer,
     QuotePatchSerializer,
-    POPatchSerializer
+    POPatchSerializer,
+    BackgroundJobSerializer,
+    ExportRangeSerializer,
+    DocumentConversionSerializer,
+    RecurringInvoiceTemplateSerializer,
+    ClientLedgerEntrySerializer,
+    ClientCreditSerializer,
+    SearchQuerySerializer,
+    SearchEntrySerializer,
+    ItemAutocompleteQuerySerializer,
+    ItemAutocompleteSerializer,
+)
+from .filters import (
+    DepartmentFilter,
+    DepartmentAdminFilter,
+    ClientFilter,
+    EmployeeFilter,
+    EmployeeEOSBFilter,
+    EmployeeWorkingContractFilter,
+    ChantierFilter,
+    ChantierAssignmentFilter,
+    AttendanceFilter,
+    ItemFilter,
+    ExpenseFilter,
+    PaymentFilter,
+)
+from .fast_serializers import (
+    InvoiceValuesSerializer,
+    QuoteValuesSerializer,
+    POValuesSerializer,
 )
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework.views import APIView
@@ -64,16 +98,37 @@ from .permissions.roles import (
 )
 from rest_framework.exceptions import NotFound, ValidationError, PermissionDenied
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from .signals import clear_company_analytics, clear_attendance_timesheet
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.template.loader import render_to_string
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.core.files.storage import default_storage
+from django.core.cache import cache
+import datetime
+import hashlib
+import time
+import uuid
 
 import tempfile
 from django.db import transaction
-from num2words import num2words
+from django.db.models import Count, Max, Prefetch, Sum
 from .tasks import generate_invoice_pdf_task, send_thanking_invoice_task,generate_po_pdf_task, generate_quote_pdf_task
-from .services import InvoiceCalculator
+from .tasks import create_document_task, import_invoices_task, export_xlsx_task
+from .tasks import generate_invoice_pdfs_task
+from .downloads import invoice_pdf_name, link_expiry, read_download_token, serve_media_file
+from .exports import EXPORTS
+from .services import InvoiceCalculator, DocumentCreator, DocumentConverter
+from .idempotency import idempotent
+from .db_routers import use_primary
+from .ledger import ClientLedger
+from .search import SearchIndex
+from .catalog import ItemCatalog, catalog_version
+from .pagination import LedgerCursorPagination
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions
@@ -92,20 +147,82 @@ from rest_framework import permissions
 from .analytics.aging import AgingAnalytics
 from .analytics.labor import LaborAnalytics
 from .analytics.tax import TaxAnalytics
+from .analytics.timesheet import AttendanceTimesheet
 from .permissions.roles import IsCompanyOrSuperAdmin
 from django.utils import timezone
 import openai
 from rest_framework.throttling import ScopedRateThrottle, UserRateThrottle
 from rest_framework.parsers import MultiPartParser, FormParser
-from num2words import num2words
 import os
 from decimal import Decimal
 from django.db import transaction
 from rest_framework.generics import get_object_or_404
+from .permissions.base import HasMetricsAccess
+from . import metrics
 
 client = openai.OpenAI(api_key=settings.OPENAI_KEY)
 
 
+class EagerLoadingMixin:
+    """
+    Applies the serializer's select_related/prefetch_related plan for the
+    fields actually requested (see SparseFieldsMixin).
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+
+        if hasattr(serializer_class, "setup_eager_loading"):
+            queryset = serializer_class.setup_eager_loading(queryset, self.request)
+
+        return queryset
+
+
+class CatalogSnapshotMixin:
+    """
+    Serves list() from a per-company snapshot of ``catalog`` (see
+    api/catalog.py): the ETag and Last-Modified come from the collection's
+    version in the cache, so a revalidation gets a 304 and a cache hit gets
+    the stored page, both without a database query. Any write to the
+    collection replaces the version and with it every stored page.
+    """
+
+    catalog = None
+
+    def list(self, request, *args, **kwargs):
+        user = request.user
+        if user.is_superuser or not user.company_id:
+            return super().list(request, *args, **kwargs)
+
+        version = catalog_version(self.catalog, user.company_id)
+        # The page depends on the role (querysets are role-scoped) and the query string
+        variant = hashlib.sha1(
+            f"{user.role}:{request.build_absolute_uri()}".encode()
+        ).hexdigest()[:16]
+        etag = f'"{version["token"]}-{variant}"'
+        headers = {
+            "ETag": etag,
+            "Last-Modified": http_date(version["modified"]),
+            "Cache-Control": "private, no-cache",
+        }
+
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=version["modified"]
+        )
+        if not_modified is not None:
+            for header, value in headers.items():
+                not_modified.headers[header] = value
+            return not_modified
+
+        key = f"catalog_snapshot_{self.catalog}_{user.company_id}_{version['token']}_{variant}"
+        data = cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(key, data, timeout=settings.CATALOG_SNAPSHOT_SECONDS)
+        return Response(data, headers=headers)
+
+
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
  
@@ -148,9 +265,12 @@ class CompanyOwnerRegistrationView(APIView):
             return Response({"message": "Registered successfully", "user_id": user.id}, status=201)
         return Response(serializer.errors, status=400)
 
-class DepartmentViewSet(viewsets.ModelViewSet):
+class DepartmentViewSet(CatalogSnapshotMixin, viewsets.ModelViewSet):
+    catalog = "departments"
     serializer_class = DepartmentSerializer
     permission_classes = [permissions.IsAuthenticated, IsCompanyOrSuperAdmin]
+    filterset_class = DepartmentFilter
+    ordering_fields = ["id", "name"]
 
     def get_queryset(self):
         user = self.request.user
@@ -185,6 +305,8 @@ class CompanyDetailsUpdateView(generics.RetrieveUpdateAPIView):
 class DepartmentAdminViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated, IsCompanyOrSuperAdmin]
     serializer_class = DepartmentAdminSerializer
+    filterset_class = DepartmentAdminFilter
+    ordering_fields = ["id", "email"]
 
     def get_queryset(self):
         user = self.request.user
@@ -236,23 +358,29 @@ class DepartmentAdminRetrieveViewSet(generics.RetrieveAPIView):
 class HrAdminRetreiveDataViewSet(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated, IsCompanyOrSuperAdmin]
     serializer_class = HrAdminRetrieveDataSerializer
+    ordering_fields = ["id"]
 
     def get_queryset(self):
         user = self.request.user
 
+        qs = User.objects.select_related("department", "company")
+
         if user.is_superuser:
-            return User.objects.filter(role = UserRole.HR_ADMIN)
+            return qs.filter(role = UserRole.HR_ADMIN)
         
         if user.role == UserRole.COMPANY_ADMIN:
-            return User.objects.filter(company = user.company, role = UserRole.HR_ADMIN)
+            return qs.filter(company = user.company, role = UserRole.HR_ADMIN)
 
 
         return user.objects.none()
 
 
-class ClientViewSet(viewsets.ModelViewSet):
+class ClientViewSet(CatalogSnapshotMixin, EagerLoadingMixin, viewsets.ModelViewSet):
+    catalog = "clients"
     serializer_class = ClientSerializer
     permission_classes = [permissions.IsAuthenticated, CanManageInvoices]
+    filterset_class = ClientFilter
+    ordering_fields = ["id", "company_name"]
 
     def get_queryset(self):
         user = self.request.user
@@ -296,10 +424,55 @@ class ClientViewSet(viewsets.ModelViewSet):
 
         instance.delete()
 
+    @action(detail=True, methods=["get"])
+    def statement(self, request, pk=None):
+        """
+        Ledger lines for ?start=&end= (cursor-paginated) with the balance
+        carried into the range and the balance at its end.
+        """
+        client = self.get_object()
+        params = ExportRangeSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start, end = params.validated_data.get("start"), params.validated_data.get("end")
+
+        entries = client.ledger_entries.all()
+        if start:
+            entries = entries.filter(entry_date__gte=start)
+        if end:
+            entries = entries.filter(entry_date__lte=end)
+
+        paginator = LedgerCursorPagination()
+        page = paginator.paginate_queryset(entries, request, view=self)
+        serializer = ClientLedgerEntrySerializer(page, many=True)
+        response = paginator.get_paginated_response(serializer.data)
+
+        # Rendered like the balance of each line
+        balance = serializer.child.fields["balance"]
+        response.data["opening_balance"] = balance.to_representation(
+            ClientLedger.balance_before(client.id, start)
+        )
+        response.data["closing_balance"] = balance.to_representation(
+            ClientLedger.balance_at(client.id, end)
+        )
+        return response
+
+    @action(detail=True, methods=["post"])
+    def credits(self, request, pk=None):
+        client = self.get_object()
+        serializer = ClientCreditSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            entry = ClientLedger.post_credit(client, **serializer.validated_data)
+
+        return Response(ClientLedgerEntrySerializer(entry).data, status=status.HTTP_201_CREATED)
+
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+class EmployeeViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = EmployeeSerializer
     permission_classes = [permissions.IsAuthenticated, IsCompanyOrHRAdmin]
+    filterset_class = EmployeeFilter
+    ordering_fields = ["id"]
 
     def get_queryset(self):
         user = self.request.user
@@ -332,15 +505,19 @@ class EmployeeEOSBViewSet(viewsets.ModelViewSet):
     serializer_class = EmployeeEOSBSerializer
     permission_classes = [permissions.IsAuthenticated, IsCompanyOrSuperAdmin]
     parser_classes = [MultiPartParser, FormParser]
+    filterset_class = EmployeeEOSBFilter
+    ordering_fields = ["id", "exit_date"]
 
     def get_queryset(self):
         user = self.request.user
 
+        qs = EmployeeEOSB.objects.select_related("employee__user")
+
         if user.is_superuser:
-            return EmployeeEOSB.objects.all()
+            return qs
 
         if user.role == UserRole.COMPANY_ADMIN:
-            return EmployeeEOSB.objects.filter(employee__user__company = user.company)
+            return qs.filter(employee__user__company = user.company)
 
         return EmployeeEOSB.objects.none()
       
@@ -350,15 +527,19 @@ class EmployeeWorkingContractViewSet(viewsets.ModelViewSet):
     serializer_class = EmployeeWorkingContractSerializer
     permission_classes = [permissions.IsAuthenticated, IsCompanyOrSuperAdmin]
     parser_classes = [MultiPartParser, FormParser]
+    filterset_class = EmployeeWorkingContractFilter
+    ordering_fields = ["id"]
 
     def get_queryset(self):
         user = self.request.user
 
+        qs = EmployeeWorkingContract.objects.select_related("employee__user")
+
         if user.is_superuser:
-            return EmployeeWorkingContract.objects.all()
+            return qs
         
         if user.role == UserRole.COMPANY_ADMIN:
-            return EmployeeWorkingContract.objects.filter(employee__user__company = user.company)
+            return qs.filter(employee__user__company = user.company)
 
         return EmployeeWorkingContract.objects.none()
 
@@ -369,16 +550,34 @@ class ChantierViewSet(viewsets.ModelViewSet):
     serializer_class = ChantierSerializer
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
+    filterset_class = ChantierFilter
+    ordering_fields = ["id", "start_date"]
+
+    def use_compact_list(self):
+        return self.action == "list" and not self.request.query_params.get("expand")
+
+    def get_serializer_class(self):
+        if self.use_compact_list():
+            return ChantierListSerializer
+        return ChantierSerializer
 
     def get_queryset(self):
         user = self.request.user
 
-        qs = Chantier.objects.select_related(
-            "department", "client"
-        ).prefetch_related(
-            "employee_assignments__employee__user", 
-            "responsible" 
-        )
+        qs = Chantier.objects.select_related("department", "client")
+
+        if self.use_compact_list():
+            qs = qs.annotate(
+                employee_count=Count("employee_assignments", distinct=True)
+            ).prefetch_related(
+                Prefetch("responsible", queryset=User.objects.only("id"))
+            )
+        else:
+            qs = qs.prefetch_related(
+                "employee_assignments__employee__user",
+                "responsible__department",
+                "responsible__company",
+            )
 
         if user.is_superuser:
             return qs
@@ -419,6 +618,8 @@ class ChantierViewSet(viewsets.ModelViewSet):
 class ChantierAssignmentViewSet(viewsets.ModelViewSet):
     serializer_class = ChantierAssignmentSerializer
     permission_classes = [permissions.IsAuthenticated, IsCompanyOrSuperAdmin]
+    filterset_class = ChantierAssignmentFilter
+    ordering_fields = ["id"]
 
     def get_queryset(self):
         user = self.request.user
@@ -450,32 +651,126 @@ class ChantierAssignmentViewSet(viewsets.ModelViewSet):
 class AttendanceViewSet(viewsets.ModelViewSet):
     serializer_class = AttendanceSerializer
     permission_classes = [permissions.IsAuthenticated, IsCompanyOrHRAdmin]
+    filterset_class = AttendanceFilter
+    ordering_fields = ["id", "date"]
 
     def get_queryset(self):
         user = self.request.user
+        qs = Attendance.objects.select_related(
+            "employee__user", "chantier__department"
+        )
+
         if user.is_superuser:
-            queryset = Attendance.objects.all()
+            queryset = qs
 
         elif user.role == UserRole.COMPANY_ADMIN:
-            queryset = Attendance.objects.filter(employee__user__company=user.company)
+            queryset = qs.filter(employee__user__company=user.company)
 
         elif user.role == UserRole.HR_ADMIN:
-            queryset = Attendance.objects.filter(chantier__responsible=user)
+            queryset = qs.filter(chantier__responsible=user)
 
         else:
             return Attendance.objects.none()
 
-        date_param = self.request.query_params.get("date")
+        return queryset
 
-        if date_param:
-            queryset = queryset.filter(date=date_param)
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
 
-        return queryset
+        if page is None:
+            return Response(self.get_sideloaded_data(list(queryset)))
 
+        data = self.get_sideloaded_data(page)
+        response = self.get_paginated_response(data.pop("results"))
+        response.data.update(data)
+        return response
+
+    @action(detail=False, methods=["post"], url_path="sheet")
+    def sheet(self, request):
+        serializer = AttendanceSheetSerializer(
+            data=request.data, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        attendances = serializer.save()
+
+        chantier = serializer.validated_data["chantier"]
+        if chantier.department and chantier.department.company_id:
+            # bulk_create() bypasses the post_save invalidation signals
+            clear_company_analytics(chantier.department.company_id)
+        clear_attendance_timesheet(chantier.id, serializer.validated_data["date"])
+
+        return Response(
+            {
+                "chantier": chantier.id,
+                "date": serializer.validated_data["date"],
+                "created": serializer.created_count,
+                "updated": serializer.updated_count,
+                "results": AttendanceSerializer(attendances, many=True).data,
+            },
+            status=status.HTTP_200_OK,
+        )
 
-class ItemViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=["get"], url_path="timesheet")
+    def timesheet(self, request):
+        chantier_id = request.query_params.get("chantier")
+        month_param = request.query_params.get("month")
+
+        if not chantier_id:
+            raise ValidationError({"chantier": "This query parameter is required."})
+
+        if month_param:
+            try:
+                first_day = datetime.datetime.strptime(month_param, "%Y-%m")
+                year, month = first_day.year, first_day.month
+            except ValueError:
+                raise ValidationError({"month": "Expected format YYYY-MM."})
+        else:
+            today = timezone.now().date()
+            year, month = today.year, today.month
+
+        user = request.user
+        chantiers = Chantier.objects.all()
+
+        if user.role == UserRole.HR_ADMIN and not user.is_superuser:
+            chantiers = chantiers.filter(responsible=user)
+        elif not user.is_superuser:
+            chantiers = chantiers.filter(department__company=user.company)
+
+        chantier = get_object_or_404(chantiers, pk=chantier_id)
+
+        return Response(AttendanceTimesheet(chantier, year, month).get_matrix())
+
+    def get_sideloaded_data(self, attendances):
+        """
+        Rows only carry employee/chantier ids; each referenced employee and
+        chantier is serialized once in the side-loaded dictionaries.
+        """
+        employees = {}
+        chantiers = {}
+        for attendance in attendances:
+            employees.setdefault(attendance.employee_id, attendance.employee)
+            chantiers.setdefault(attendance.chantier_id, attendance.chantier)
+
+        return {
+            "results": self.get_serializer(attendances, many=True).data,
+            "employees": {
+                employee_id: AttendanceEmployeeSerializer(employee).data
+                for employee_id, employee in employees.items()
+            },
+            "chantiers": {
+                chantier_id: ChantierMiniSerializer(chantier).data
+                for chantier_id, chantier in chantiers.items()
+            },
+        }
+
+
+class ItemViewSet(CatalogSnapshotMixin, EagerLoadingMixin, viewsets.ModelViewSet):
+    catalog = "items"
     serializer_class = ItemSerializer
     permission_classes = [permissions.IsAuthenticated, CanManageInvoices]
+    filterset_class = ItemFilter
+    ordering_fields = ["id", "name"]
 
     def get_queryset(self):
         user = self.request.user
@@ -492,11 +787,55 @@ class ItemViewSet(viewsets.ModelViewSet):
         user = self.request.user
         serializer.save(company=user.company)
 
+    @action(detail=False, methods=["get"])
+    def autocomplete(self, request):
+        """
+        Top ?limit= items whose code, name or a word of the name starts with
+        ?q=, code matches first; served from ItemCatalog so the invoice
+        editor does not download the whole catalog.
+        """
+        params = ItemAutocompleteQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        items = ItemCatalog.autocomplete(
+            request.user.company_id,
+            params.validated_data["q"],
+            limit=params.validated_data["limit"],
+        )
+        return Response({"results": ItemAutocompleteSerializer(items, many=True).data})
+
+
+class RecurringInvoiceTemplateViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
+    """
+    Monthly or quarterly invoices for a chantier; generate_recurring_invoices_task
+    issues the due ones for every company in one Beat run.
+    """
+
+    serializer_class = RecurringInvoiceTemplateSerializer
+    permission_classes = [permissions.IsAuthenticated, CanManageInvoices]
+    ordering_fields = ["id", "next_run_date"]
+
+    def get_queryset(self):
+        user = self.request.user
 
-class ExpenseViewSet(viewsets.ModelViewSet):
+        if user.is_superuser:
+            return RecurringInvoiceTemplate.objects.all()
+
+        if user.role in [UserRole.COMPANY_ADMIN, UserRole.INVOICING_ADMIN]:
+            return RecurringInvoiceTemplate.objects.filter(client__company=user.company)
+
+        return RecurringInvoiceTemplate.objects.none()
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+
+
+class ExpenseViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = ExpenseSerializer
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
+    filterset_class = ExpenseFilter
+    ordering_fields = ["id", "expense_date"]
     def get_queryset(self):
         user = self.request.user
 
@@ -515,9 +854,11 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         serializer.save()
 
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated, CanManageInvoices]
+    filterset_class = PaymentFilter
+    ordering_fields = ["id", "payment_date"]
 
     def get_queryset(self):
         user = self.request.user
@@ -534,62 +875,62 @@ class PaymentViewSet(viewsets.ModelViewSet):
         return Payment.objects.none()
 
 
-class InvoiceCreateApiView(APIView):
-    permission_classes = [permissions.IsAuthenticated, CanManageInvoices]
+def wants_async(request):
+    """?async=true or an RFC 7240 "Prefer: respond-async" header."""
+    return (
+        request.query_params.get("async", "").lower() in ("1", "true")
+        or "respond-async" in request.headers.get("Prefer", "")
+    )
 
-    
-    @transaction.atomic
-    def post(self, request):
-        serializer = InvoiceCreateSerializer(
-            data=request.data, context={"request": request}
-        )
-        serializer.is_valid(raise_exception=True)
 
-        items_data = serializer.validated_data.pop("items")
-        invoice = serializer.save(created_by=request.user)
+def enqueue_document_job(request, kind):
+    # Validate up front so bad payloads still get a synchronous 400
+    DocumentCreator.validate(kind, request.user, request.data, request)
 
-        for item_data in items_data:
-            InvoiceItem.objects.create(invoice=invoice, **item_data)
+    job = BackgroundJob.objects.create(
+        kind=kind, created_by=request.user, payload=request.data
+    )
+    transaction.on_commit(lambda: create_document_task.delay(str(job.id)))
 
-   
-        totals = InvoiceCalculator.get_totals(invoice)
-        
-        invoice.subtotal = totals["subtotal"]
-        invoice.discount_percentage = totals["discount_percentage"]
-        invoice.discount_amount = totals["discount_amount"]
-        invoice.total_ht = totals["total_ht"]
-        invoice.tax_rate = totals["tax_rate"]
-        invoice.tax_amount = totals["tax_amount"]
-        invoice.total_ttc = totals["total_ttc"]
-        invoice.remaining_balance = totals["total_ttc"]
+    return job_accepted_response(request, job)
 
- 
-        ttc_value = invoice.total_ttc
-        dirhams = int(ttc_value)
-        centimes = int(round((ttc_value - dirhams) * 100))
-        dirhams_words = num2words(dirhams, lang="fr")
 
-        if centimes > 0:
-            legal_text = f"{dirhams_words} Dirhams Et {centimes} Cts TTC"
-        else:
-            legal_text = f"{dirhams_words} Dirhams TTC"
+def job_accepted_response(request, job):
+    """202 with the job and a Location header pointing at its status endpoint."""
+    response = Response(
+        BackgroundJobSerializer(job).data, status=status.HTTP_202_ACCEPTED
+    )
+    response["Location"] = request.build_absolute_uri(
+        reverse("job-detail", kwargs={"pk": job.id})
+    )
+    return response
 
-        invoice.amount_in_words = legal_text.upper()
-        
-    
-        invoice.save()
 
-       
-        transaction.on_commit(lambda: generate_invoice_pdf_task.delay(invoice.id))
-        
-   
-        data = InvoiceSerializer(invoice).data
+class BackgroundJobDetailView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        # Workers update jobs behind the caller's back; skip replica lag
+        with use_primary():
+            job = get_object_or_404(BackgroundJob, pk=pk, created_by=request.user)
+        return Response(BackgroundJobSerializer(job).data)
 
-        pdf_filename = f"facture_{invoice.invoice_number.replace('/', '_')}.pdf"
-        data["download_url"] = request.build_absolute_uri(
-            f"{settings.MEDIA_URL}invoices/{pdf_filename}"
+
+class InvoiceCreateApiView(APIView):
+    permission_classes = [permissions.IsAuthenticated, CanManageInvoices]
+
+    
+    @idempotent("invoice_create")
+    def post(self, request):
+        if wants_async(request):
+            return enqueue_document_job(request, BackgroundJobKind.INVOICE_CREATE)
+
+        invoice = DocumentCreator.create(
+            BackgroundJobKind.INVOICE_CREATE, request.user, request.data, request
         )
+        transaction.on_commit(lambda: generate_invoice_pdf_task.delay(invoice.id))
 
+        data = DocumentCreator.represent(BackgroundJobKind.INVOICE_CREATE, invoice, request)
         return Response(data, status=status.HTTP_201_CREATED)
 
     def get(self, request):
@@ -623,11 +964,15 @@ class InvoiceCreateApiView(APIView):
 
             queryset = queryset.filter(created_at__date=created_at)
 
-        queryset = queryset.select_related("client", "created_by").prefetch_related(
-            "invoice_items"
-        )
+        if InvoiceValuesSerializer.supports(request):
+            serializer = InvoiceValuesSerializer(queryset, context={"request": request})
+            return Response(serializer.data, status=status.HTTP_200_OK)
 
-        serializer = InvoiceSerializer(queryset, many=True)
+        queryset = InvoiceSerializer.setup_eager_loading(queryset, request)
+
+        serializer = InvoiceSerializer(
+            queryset, many=True, context={"request": request}
+        )
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @transaction.atomic
@@ -659,14 +1004,213 @@ class InvoiceCreateApiView(APIView):
         return Response(serializer.data)
 
 
+class InvoiceImportApiView(APIView):
+    """
+    Upload a CSV or XLSX file (multipart field ``file``) of invoice lines;
+    import_invoices_task creates the invoices and the job reports per-row errors.
+    """
+
+    permission_classes = [permissions.IsAuthenticated, CanManageInvoices]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"file": ["A CSV or XLSX file is required."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        file_format = os.path.splitext(upload.name)[1].lower().lstrip(".")
+        if file_format not in ("csv", "xlsx"):
+            return Response(
+                {"file": ["Only .csv and .xlsx files can be imported."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        path = default_storage.save(f"imports/{uuid.uuid4().hex}.{file_format}", upload)
+        job = BackgroundJob.objects.create(
+            kind=BackgroundJobKind.INVOICE_IMPORT,
+            created_by=request.user,
+            payload={"path": path, "format": file_format, "filename": upload.name},
+        )
+        transaction.on_commit(lambda: import_invoices_task.delay(str(job.id)))
+
+        return job_accepted_response(request, job)
+
+
+class DocumentConversionView(APIView):
+    """
+    POST /api/quotes/<pk>/convert, /api/po/<pk>/convert, or /api/invoices/convert
+    with {"quotes": [...], "purchase_orders": [...]} turns the documents into
+    invoices in one transaction; their PDFs are rendered by a single task.
+    """
+
+    permission_classes = [permissions.IsAuthenticated, CanManageInvoices]
+    source = None
+
+    def post(self, request, pk=None):
+        if self.source == "quote":
+            sources = {"quote_ids": [pk]}
+        elif self.source == "purchase_order":
+            sources = {"purchase_order_ids": [pk]}
+        else:
+            serializer = DocumentConversionSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            sources = {
+                "quote_ids": serializer.validated_data["quotes"],
+                "purchase_order_ids": serializer.validated_data["purchase_orders"],
+            }
+
+        with transaction.atomic():
+            invoices = DocumentConverter.convert(request.user, **sources)
+            invoice_ids = [invoice.id for invoice in invoices]
+            transaction.on_commit(lambda: generate_invoice_pdfs_task.delay(invoice_ids))
+
+        invoices = InvoiceSerializer.setup_eager_loading(
+            Invoice.objects.filter(id__in=invoice_ids).order_by("id"), request
+        )
+        data = InvoiceSerializer(invoices, many=True, context={"request": request}).data
+        return Response(data[0] if pk is not None else data, status=status.HTTP_201_CREATED)
+
+
+class SearchView(APIView):
+    """
+    GET /api/search?q=&types=invoice,client&limit= returns the company's
+    invoices, clients, chantiers and items matching every word of ``q``
+    (prefixes included), best matches first, in a single indexed query.
+    """
+
+    permission_classes = [permissions.IsAuthenticated, CanManageInvoices]
+
+    def get(self, request):
+        params = SearchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        entries = SearchIndex.search(
+            request.user.company_id,
+            params.validated_data["q"],
+            kinds=params.validated_data.get("types"),
+            limit=params.validated_data["limit"],
+        )
+        return Response({"results": SearchEntrySerializer(entries, many=True).data})
+
+
+def get_export(dataset):
+    export = EXPORTS.get(dataset)
+    if export is None:
+        raise NotFound(f"Unknown export: {dataset}. Choose from {', '.join(EXPORTS)}.")
+    return export
+
+
+class ExportCsvView(APIView):
+    """
+    GET /api/exports/<dataset>.csv?start=&end= streams the company's rows as
+    CSV straight from the database cursor, so memory stays flat at any size.
+    """
+
+    permission_classes = [permissions.IsAuthenticated, CanManageInvoices]
+
+    def get(self, request, dataset):
+        export = get_export(dataset)
+        params = ExportRangeSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start, end = params.validated_data.get("start"), params.validated_data.get("end")
+
+        response = StreamingHttpResponse(
+            export.stream_csv(request.user.company, start, end),
+            content_type="text/csv; charset=utf-8",
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{export.filename(start, end)}"'
+        )
+        metrics.inc("exports_total", dataset=export.name, format="csv")
+        return response
+
+
+class ExportXlsxView(APIView):
+    """POST /api/exports/<dataset>.xlsx queues export_xlsx_task and returns the job."""
+
+    permission_classes = [permissions.IsAuthenticated, CanManageInvoices]
+
+    def post(self, request, dataset):
+        export = get_export(dataset)
+        params = ExportRangeSerializer(data=request.data or request.query_params)
+        params.is_valid(raise_exception=True)
+
+        job = BackgroundJob.objects.create(
+            kind=BackgroundJobKind.XLSX_EXPORT,
+            created_by=request.user,
+            payload={"dataset": export.name, **params.data},
+        )
+        transaction.on_commit(lambda: export_xlsx_task.delay(str(job.id)))
+        metrics.inc("exports_total", dataset=export.name, format="xlsx")
+
+        return job_accepted_response(request, job)
+
+
+def invoice_etag(request, pk):
+    """
+    ``(company_id, etag)`` of an invoice's detail representation from one
+    aggregate query, or None when it does not exist. The tag covers the
+    invoice, its lines, the expandable relations, the query string and the
+    expiry of the signed download_url, so a cached copy never outlives its link.
+    """
+    state = (
+        Invoice.objects.filter(pk=pk)
+        .annotate(
+            line_count=Count("invoice_items"),
+            last_line=Max("invoice_items__id"),
+            lines_total=Sum("invoice_items__total"),
+        )
+        .values_list(
+            "created_by__company_id",
+            "updated_at",
+            "line_count",
+            "last_line",
+            "lines_total",
+            "client__company_name",
+            "chantier__updated_at",
+            "created_by__updated_at",
+        )
+        .first()
+    )
+    if state is None:
+        return None
+
+    company_id = state[0]
+    clients = catalog_version("clients", company_id)["token"] if company_id else ""
+    digest = hashlib.sha1(
+        repr((state, clients, link_expiry(), request.build_absolute_uri())).encode()
+    ).hexdigest()
+    return company_id, f'"{digest}"'
+
+
 class InvoiceDetailApiView(APIView):
     permission_classes = [permissions.IsAuthenticated, CanManageInvoices]
 
     def get(self, request, pk):
+        # Revalidations are answered from the tag before the invoice and its
+        # lines are loaded
+        tagged = invoice_etag(request, pk)
+        if tagged is None:
+            return Response(
+                {"detail": "Invoice not found"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        company_id, etag = tagged
+        user = request.user
+        if user.is_superuser or company_id == user.company_id:
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                not_modified.headers["ETag"] = etag
+                return not_modified
+
         try:
-            invoice = Invoice.objects.select_related(
-                "client", "created_by"
-            ).prefetch_related("invoice_items").get(pk=pk)
+            invoice = InvoiceSerializer.setup_eager_loading(
+                Invoice.objects.select_related("created_by"), request
+            ).get(pk=pk)
         except Invoice.DoesNotExist:
             return Response(
                 {"detail": "Invoice not found"},
@@ -675,7 +1219,7 @@ class InvoiceDetailApiView(APIView):
 
         # permission safety
         user = request.user
-        if not user.is_superuser and invoice.created_by.company != user.company:
+        if not user.is_superuser and invoice.created_by.company_id != user.company_id:
             return Response(
                 {"detail": "Not allowed"},
                 status=status.HTTP_403_FORBIDDEN,
@@ -684,7 +1228,10 @@ class InvoiceDetailApiView(APIView):
         serializer = InvoiceSerializer(
             invoice, context={"request": request}
         )
-        return Response(serializer.data)
+        return Response(
+            serializer.data,
+            headers={"ETag": etag, "Cache-Control": "private, no-cache"},
+        )
 
     @transaction.atomic
     def patch(self, request, pk):
@@ -718,6 +1265,57 @@ class InvoiceDetailApiView(APIView):
 
 
 
+class InvoicePdfView(APIView):
+    """The invoice PDF for signed-in users; see serve_media_file for caching."""
+
+    permission_classes = [permissions.IsAuthenticated, CanManageInvoices]
+
+    def get(self, request, pk):
+        invoice = (
+            Invoice.objects.filter(pk=pk)
+            .values("created_by__company_id", "invoice_number")
+            .first()
+        )
+        if invoice is None:
+            raise NotFound("Invoice not found")
+
+        user = request.user
+        if not user.is_superuser and invoice["created_by__company_id"] != user.company_id:
+            raise PermissionDenied("Not allowed")
+
+        response = serve_media_file(
+            request,
+            invoice_pdf_name(invoice["invoice_number"]),
+            f"private, max-age={settings.INVOICE_PDF_CACHE_SECONDS}",
+        )
+        if response is None:
+            raise NotFound("The PDF of this invoice has not been generated yet")
+        return response
+
+
+class DownloadView(APIView):
+    """
+    Public download of a file named by a signed, expiring token (see
+    api/downloads.py), e.g. from a reminder email: no login, no database
+    query, and the body is left to the web server when SENDFILE_HEADER is set.
+    """
+
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, token):
+        signed = read_download_token(token)
+        if signed is None:
+            raise NotFound("This download link is invalid or has expired")
+
+        name, expires = signed
+        max_age = max(0, min(int(expires - time.time()), settings.INVOICE_PDF_CACHE_SECONDS))
+        response = serve_media_file(request, name, f"private, max-age={max_age}")
+        if response is None:
+            raise NotFound("This document is not available yet")
+        return response
+
+
 class DashboardAnalyticsView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsCompanyOrSuperAdmin]
     throttle_classes = [UserRateThrottle]
@@ -795,6 +1393,17 @@ class AdvancedDashboardView(APIView):
 
 
 
+class MetricsView(APIView):
+    permission_classes = [HasMetricsAccess]
+    throttle_classes = []
+
+    def get(self, request):
+        return HttpResponse(
+            metrics.registry.render(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+
+
 class OpenAiViewSet(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
@@ -886,57 +1495,26 @@ class OpenAiViewSet(APIView):
 class QuoteCreateApiView(APIView):
     permission_classes = [permissions.IsAuthenticated, CanManageInvoices] 
 
-    @transaction.atomic
+    @idempotent("quote_create")
     def post(self, request):
-        serializer = QuoteCreateSerializer(data=request.data, context={"request": request})
-        serializer.is_valid(raise_exception=True)
-        
-        items_data = serializer.validated_data.pop("items")
-        quote = serializer.save(created_by=request.user)
- 
-        subtotal = 0
-        for item_data in items_data:
-            item = QuoteItem.objects.create(quote=quote, **item_data)
-            subtotal += item.subtotal
-
-
-        retention_rate = Decimal("10.0")
-        discount_amount = subtotal * (retention_rate / Decimal("100"))
-        total_ht = subtotal - discount_amount
-        tax_rate = Decimal("20.0")
-        tax_amount = total_ht * (tax_rate / Decimal("100"))
-        total_ttc = total_ht + tax_amount
-        
- 
-        quote.subtotal = subtotal
-        quote.discount_percentage = retention_rate
-        quote.discount_amount = discount_amount
-        quote.total_ht = total_ht
-        quote.tax_rate = tax_rate
-        quote.tax_amount = tax_amount
-        quote.total_ttc = total_ttc
-        
-
-        dirhams = int(total_ttc)
-        centimes = int(round((total_ttc - dirhams) * 100))
-        dirhams_words = num2words(dirhams, lang="fr")
-        if centimes > 0:
-            legal_text = f"{dirhams_words} Dirhams Et {centimes} Cts TTC"
-        else:
-            legal_text = f"{dirhams_words} Dirhams TTC"
-        quote.amount_in_words = legal_text.upper()
-        
-        quote.save()
-        
+        if wants_async(request):
+            return enqueue_document_job(request, BackgroundJobKind.QUOTE_CREATE)
 
+        quote = DocumentCreator.create(
+            BackgroundJobKind.QUOTE_CREATE, request.user, request.data, request
+        )
         transaction.on_commit(lambda: generate_quote_pdf_task.delay(quote.id))
-        
-        return Response(QuoteSerializer(quote).data, status=status.HTTP_201_CREATED)
+
+        data = DocumentCreator.represent(BackgroundJobKind.QUOTE_CREATE, quote, request)
+        return Response(data, status=status.HTTP_201_CREATED)
 
     def get(self, request):
         user = request.user
         qs = Quote.objects.filter(created_by__company=user.company).order_by('-created_at')
-        return Response(QuoteSerializer(qs, many=True).data)
+        if QuoteValuesSerializer.supports(request):
+            return Response(QuoteValuesSerializer(qs, context={"request": request}).data)
+        qs = QuoteSerializer.setup_eager_loading(qs, request)
+        return Response(QuoteSerializer(qs, many=True, context={"request": request}).data)
 
 
 
@@ -947,56 +1525,26 @@ class QuoteCreateApiView(APIView):
 class POCreateApiView(APIView):
     permission_classes = [permissions.IsAuthenticated, CanManageInvoices]
 
-    @transaction.atomic
+    @idempotent("po_create")
     def post(self, request):
-        serializer = POCreateSerializer(data=request.data, context={"request": request})
-        serializer.is_valid(raise_exception=True)
-        
-        items_data = serializer.validated_data.pop("items")
-        po = serializer.save(created_by=request.user)
-        
-        subtotal = 0
-        for item_data in items_data:
-            item = POItem.objects.create(purchase_order=po, **item_data)
-            subtotal += item.subtotal
-            
-     
-        retention_rate = Decimal("10.0")
-        discount_amount = subtotal * (retention_rate / Decimal("100"))
-        total_ht = subtotal - discount_amount
-        tax_rate = Decimal("20.0")
-        tax_amount = total_ht * (tax_rate / Decimal("100"))
-        total_ttc = total_ht + tax_amount
-        
- 
-        po.subtotal = subtotal
-        po.discount_percentage = retention_rate
-        po.discount_amount = discount_amount
-        po.total_ht = total_ht
-        po.tax_rate = tax_rate
-        po.tax_amount = tax_amount
-        po.total_ttc = total_ttc
-        
+        if wants_async(request):
+            return enqueue_document_job(request, BackgroundJobKind.PO_CREATE)
 
-        dirhams = int(total_ttc)
-        centimes = int(round((total_ttc - dirhams) * 100))
-        dirhams_words = num2words(dirhams, lang="fr")
-        if centimes > 0:
-            legal_text = f"{dirhams_words} Dirhams Et {centimes} Cts TTC"
-        else:
-            legal_text = f"{dirhams_words} Dirhams TTC"
-        po.amount_in_words = legal_text.upper()
-        
-        po.save()
-        
+        po = DocumentCreator.create(
+            BackgroundJobKind.PO_CREATE, request.user, request.data, request
+        )
         transaction.on_commit(lambda: generate_po_pdf_task.delay(po.id))
-        
-        return Response(POSerializer(po).data, status=status.HTTP_201_CREATED)
+
+        data = DocumentCreator.represent(BackgroundJobKind.PO_CREATE, po, request)
+        return Response(data, status=status.HTTP_201_CREATED)
 
     def get(self, request):
         user = request.user
         qs = PurchaseOrder.objects.filter(created_by__company=user.company).order_by('-created_at')
-        return Response(POSerializer(qs, many=True).data)
+        if POValuesSerializer.supports(request):
+            return Response(POValuesSerializer(qs, context={"request": request}).data)
+        qs = POSerializer.setup_eager_loading(qs, request)
+        return Response(POSerializer(qs, many=True, context={"request": request}).data)
 
 
 
@@ -1028,9 +1576,10 @@ class POPatchApiView(APIView):
 
 
 
-class GetEmployeeBasedOnChantier(generics.ListAPIView):
+class GetEmployeeBasedOnChantier(EagerLoadingMixin, generics.ListAPIView):
     serializer_class = EmployeeSerializer
     permission_classes = [permissions.IsAuthenticated, IsCompanyOrHRAdmin]
+    ordering_fields = ["id"]
 
     def get_queryset(self):
         user = self.request.user
@@ -76,6 +76,7 @@ INSTALLED_APPS = [
     "phonenumber_field",
     "django_celery_results",
     "django_celery_beat",
+    "django_filters",
 ]
 
 MIDDLEWARE = [
@@ -87,8 +88,21 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "api.middleware.replica.ReplicaRoutingMiddleware",
 ]
 
+# Opt-in per-request query/latency profiling (see api/middleware/profiling.py)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+PROFILING_QUERY_BUDGET = int(os.getenv("PROFILING_QUERY_BUDGET", 30))
+PROFILING_TIME_BUDGET_MS = int(os.getenv("PROFILING_TIME_BUDGET_MS", 500))
+PROFILING_DUPLICATE_THRESHOLD = int(os.getenv("PROFILING_DUPLICATE_THRESHOLD", 5))
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+PROFILING_SAMPLE_INTERVAL_MS = int(os.getenv("PROFILING_SAMPLE_INTERVAL_MS", 5))
+PROFILING_OUTPUT_DIR = os.getenv("PROFILING_OUTPUT_DIR", BASE_DIR / "profiles")
+
+if PROFILING_ENABLED:
+    MIDDLEWARE.insert(0, "api.middleware.profiling.QueryProfilingMiddleware")
+
 ROOT_URLCONF = "base.urls"
 
 
@@ -98,12 +112,72 @@ WSGI_APPLICATION = "base.wsgi.application"
 
 
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.getenv("DB_NAME", "invoicing"),
+            "USER": os.getenv("DB_USER", "postgres"),
+            "PASSWORD": os.getenv("DB_PASSWORD", ""),
+            "HOST": os.getenv("DB_HOST", "127.0.0.1"),
+            "PORT": os.getenv("DB_PORT", "5432"),
+            # Persistent connections; 0 closes after every request
+            "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 60)),
+            "CONN_HEALTH_CHECKS": True,
+            # Must be True behind PgBouncer in transaction pooling mode
+            "DISABLE_SERVER_SIDE_CURSORS": os.getenv(
+                "DB_DISABLE_SERVER_SIDE_CURSORS", "False"
+            ).lower() == "true",
+            "OPTIONS": {
+                "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", 5)),
+                "options": f"-c statement_timeout={int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 30000))}",
+            },
+        }
     }
-}
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.getenv("DB_NAME", BASE_DIR / "db.sqlite3"),
+            "OPTIONS": {
+                # WAL lets readers run alongside the single writer; IMMEDIATE
+                # takes the write lock up front instead of failing mid-transaction
+                "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;",
+                "transaction_mode": "IMMEDIATE",
+                "timeout": int(os.getenv("DB_TIMEOUT", 20)),
+            },
+        }
+    }
+
+# Optional read replica (see api/db_routers.py). Analytics, list GETs and
+# exports read from it; writes and read-your-writes traffic stay on default.
+REPLICA_DATABASE = "replica"
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 15))
+REPLICA_ALWAYS_PATHS = ["/api/dashboard/"]
+
+if DB_ENGINE == "postgresql" and os.getenv("DB_REPLICA_HOST"):
+    DATABASES[REPLICA_DATABASE] = {
+        **DATABASES["default"],
+        "HOST": os.getenv("DB_REPLICA_HOST"),
+        "PORT": os.getenv("DB_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "USER": os.getenv("DB_REPLICA_USER", DATABASES["default"]["USER"]),
+        "PASSWORD": os.getenv("DB_REPLICA_PASSWORD", DATABASES["default"]["PASSWORD"]),
+        "TEST": {"MIRROR": "default"},
+    }
+elif DB_ENGINE != "postgresql" and os.getenv("DB_REPLICA_NAME"):
+    # A periodically copied SQLite file stands in for a replica locally
+    DATABASES[REPLICA_DATABASE] = {
+        **DATABASES["default"],
+        "NAME": os.getenv("DB_REPLICA_NAME"),
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["api.db_routers.ReplicaRouter"]
+
+# Rows fetched per round trip by QuerySet.iterator() in batch tasks and exports
+DB_ITERATOR_CHUNK_SIZE = int(os.getenv("DB_ITERATOR_CHUNK_SIZE", 500))
 
 
 # Password validation
@@ -186,6 +260,53 @@ CACHES = {
 
 
 
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_STATSD_HOST = os.getenv("METRICS_STATSD_HOST")
+METRICS_STATSD_PORT = int(os.getenv("METRICS_STATSD_PORT", 8125))
+METRICS_STATSD_PREFIX = os.getenv("METRICS_STATSD_PREFIX", "invoicing")
+
+# Stored responses for Idempotency-Key retries (see api/idempotency.py);
+# purge_expired_idempotency_keys can be scheduled in Beat to drop old rows.
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", 24))
+
+# Invoices per bulk_create round in import_invoices_task, and rows reported back
+INVOICE_IMPORT_BATCH_SIZE = int(os.getenv("INVOICE_IMPORT_BATCH_SIZE", 500))
+INVOICE_IMPORT_MAX_ERRORS = int(os.getenv("INVOICE_IMPORT_MAX_ERRORS", 1000))
+
+# Recurring invoice templates issued per transaction by generate_recurring_invoices_task
+RECURRING_INVOICE_BATCH_SIZE = int(os.getenv("RECURRING_INVOICE_BATCH_SIZE", 200))
+
+# Clients rebalanced (and ledger rows written) per query by api/ledger.py
+LEDGER_BATCH_SIZE = int(os.getenv("LEDGER_BATCH_SIZE", 200))
+
+# Rows upserted per query when api/search.py indexes bulk writes
+SEARCH_INDEX_BATCH_SIZE = int(os.getenv("SEARCH_INDEX_BATCH_SIZE", 500))
+
+# Companies whose item autocomplete index each process keeps in memory (api/catalog.py)
+ITEM_CATALOG_MAX_COMPANIES = int(os.getenv("ITEM_CATALOG_MAX_COMPANIES", 100))
+
+# Lifetime of cached item, client and department list pages (replaced on any write anyway)
+CATALOG_SNAPSHOT_SECONDS = int(os.getenv("CATALOG_SNAPSHOT_SECONDS", 60 * 60))
+
+# How long browsers reuse a downloaded invoice PDF before revalidating it
+INVOICE_PDF_CACHE_SECONDS = int(os.getenv("INVOICE_PDF_CACHE_SECONDS", 60 * 60 * 24))
+
+# "X-Accel-Redirect" (nginx) or "X-Sendfile" (Apache) to let the web server send
+# files; empty streams them from Django. nginx maps SENDFILE_URL_PREFIX to
+# MEDIA_ROOT in an internal location.
+SENDFILE_HEADER = os.getenv("SENDFILE_HEADER", "")
+SENDFILE_URL_PREFIX = os.getenv("SENDFILE_URL_PREFIX", "/protected-media/")
+
+# Lifetime of signed download links in API responses and in emails, and the
+# step their expiry is rounded up to so repeat reads give the same URL
+DOWNLOAD_LINK_MAX_AGE = int(os.getenv("DOWNLOAD_LINK_MAX_AGE", 60 * 60 * 24))
+DOWNLOAD_LINK_EMAIL_MAX_AGE = int(os.getenv("DOWNLOAD_LINK_EMAIL_MAX_AGE", 60 * 60 * 24 * 30))
+DOWNLOAD_LINK_ROUNDING = int(os.getenv("DOWNLOAD_LINK_ROUNDING", 60 * 60))
+
+# Origin used for links built outside a request (emails)
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "https://tourtra-app.com")
+
+
 REST_FRAMEWORK = {
 
     "DEFAULT_AUTHENTICATION_CLASSES": (
@@ -195,6 +316,18 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",
     ),
 
+    "DEFAULT_PAGINATION_CLASS": "api.pagination.DefaultCursorPagination",
+    "PAGE_SIZE": 50,
+    "DEFAULT_FILTER_BACKENDS": (
+        "django_filters.rest_framework.DjangoFilterBackend",
+        "rest_framework.filters.OrderingFilter",
+    ),
+
+    "DEFAULT_RENDERER_CLASSES": (
+        "api.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+
     'DEFAULT_THROTTLE_CLASSES': [
         'rest_framework.throttling.AnonRateThrottle',
         'rest_framework.throttling.UserRateThrottle'
@@ -206,4 +339,4 @@ REST_FRAMEWORK = {
         'auth_limit': '5/minute',
     },
     
-}
\ No newline at end of file
+}
\ No newline at end of file